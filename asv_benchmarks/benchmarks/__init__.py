@@ -19,7 +19,7 @@ except ModuleNotFoundError:
 
     _is_pws = True
 
-if "constants" not in pws.__dict__.keys():
+if not hasattr(pws, "constants"):
     del pws
     import pywatershed as pws
 
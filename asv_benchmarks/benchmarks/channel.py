@@ -0,0 +1,161 @@
+import inspect
+
+import numpy as np
+
+from . import _is_pws, parameterized, test_data_dir
+
+if _is_pws:
+    import pywatershed as pws
+else:
+    import pynhm as pws
+
+domains = ["drb_2yr"]
+calc_methods = ["numpy", "numba"]
+channel_routings = ["serial", "level"]
+n_time_steps = 183
+
+# A synthetic network wider than the drb_2yr levels: n_head headwater
+# segments drain in groups of n_group to n_head / n_group segments which drain
+# to the outlet, so the first two levels are routed in parallel.
+n_head = 4096
+n_group = 16
+num_threads = [1, 2, 4, 8]
+
+
+class PRMSChannelRouting:
+    """Benchmark PRMSChannel alone, serial vs level routing"""
+
+    # the control advances in the benchmark, set it up for each sample
+    number = 1
+
+    def setup(self, domain, calc_method, channel_routing):
+        init_args = inspect.signature(pws.PRMSChannel.__init__).parameters
+        if "channel_routing" not in init_args:
+            # asv skips benchmarks raising NotImplementedError in setup
+            raise NotImplementedError("channel_routing not available")
+
+        domain_dir = test_data_dir / domain
+        self.control = pws.Control.load_prms(
+            domain_dir / "nhm.control", warn_unused_options=False
+        )
+        for oo in ["netcdf_output_dir", "netcdf_output_var_names"]:
+            if oo in self.control.options.keys():
+                del self.control.options[oo]
+        self.control.edit_n_time_steps(n_time_steps)
+
+        dis = pws.Parameters.merge(
+            pws.Parameters.from_netcdf(
+                domain_dir / "parameters_dis_hru.nc", encoding=False
+            ),
+            pws.Parameters.from_netcdf(
+                domain_dir / "parameters_dis_seg.nc", encoding=False
+            ),
+        )
+        params = pws.parameters.PrmsParameters.from_netcdf(
+            domain_dir / "parameters_PRMSChannel.nc"
+        )
+        inputs = {
+            key: domain_dir / f"output/{key}.nc"
+            for key in pws.PRMSChannel.get_inputs()
+        }
+        self.channel = pws.PRMSChannel(
+            self.control,
+            dis,
+            params,
+            **inputs,
+            calc_method=calc_method,
+            channel_routing=channel_routing,
+        )
+
+    @parameterized(
+        ["domain", "calc_method", "channel_routing"],
+        (domains, calc_methods, channel_routings),
+    )
+    def time_channel_run(self, domain, calc_method, channel_routing):
+        for istep in range(self.control.n_times):
+            self.control.advance()
+            self.channel.advance()
+            self.channel.calculate(float(istep))
+
+
+def synthetic_channel_parameters() -> "pws.Parameters":
+    n_mid = n_head // n_group
+    nseg = n_head + n_mid + 1
+    tosegment = np.zeros(nseg, dtype=np.int64)
+    # one-based, zero is the outlet
+    tosegment[:n_head] = n_head + 1 + np.arange(n_head) // n_group
+    tosegment[n_head:-1] = nseg
+
+    dims = {"nhru": nseg, "nsegment": nseg}
+    data_vars = {}
+    metadata = {}
+    param_meta = pws.meta.get_params(pws.PRMSChannel.get_parameters())
+    for name, pmeta in param_meta.items():
+        dtype = np.int64 if pmeta["type"] == "I" else np.float64
+        data_vars[name] = np.full(
+            dims[pmeta["dims"][0]], pmeta["default"], dtype=dtype
+        )
+        metadata[name] = {"dims": pmeta["dims"]}
+
+    data_vars["tosegment"] = tosegment
+    data_vars["hru_segment"] = np.arange(1, nseg + 1, dtype=np.int64)
+    return pws.Parameters(
+        dims=dims, data_vars=data_vars, metadata=metadata, validate=False
+    )
+
+
+class PRMSChannelLevelsThreads:
+    """Benchmark PRMSChannel level routing on a synthetic wide network"""
+
+    # the control advances in the benchmark, set it up for each sample
+    number = 1
+
+    def setup(self, channel_routing, threads):
+        import numba as nb
+
+        if "numba_num_threads" not in getattr(
+            pws.base.control, "pws_control_options_avail", []
+        ):
+            # asv skips benchmarks raising NotImplementedError in setup
+            raise NotImplementedError("numba_num_threads not available")
+        if threads > nb.config.NUMBA_NUM_THREADS:
+            raise NotImplementedError(
+                f"numba has only {nb.config.NUMBA_NUM_THREADS} threads"
+            )
+        if channel_routing == "serial" and threads > 1:
+            raise NotImplementedError("serial routing is not threaded")
+
+        start_time = np.datetime64("2000-01-01T00:00:00")
+        time_step = np.timedelta64(24, "h")
+        self.control = pws.Control(
+            start_time,
+            start_time + (n_time_steps - 1) * time_step,
+            time_step,
+            options={
+                "calc_method": "numba",
+                "channel_routing": channel_routing,
+                "numba_num_threads": threads,
+            },
+        )
+        params = synthetic_channel_parameters()
+        nhru = params.dims["nhru"]
+        self.channel = pws.PRMSChannel(
+            self.control,
+            None,
+            params,
+            sroff_vol=np.ones(nhru),
+            ssres_flow_vol=np.ones(nhru),
+            gwres_flow_vol=np.ones(nhru),
+        )
+        # load (or compile) the kernels in setup
+        self.channel._calculate(1.0)
+
+    @parameterized(
+        ["channel_routing", "threads"],
+        (channel_routings, num_threads),
+    )
+    def time_channel_run(self, channel_routing, threads):
+        for istep in range(self.control.n_times):
+            self.control.advance()
+            self.channel.advance()
+            self.channel.calculate(float(istep))
@@ -15,3 +15,17 @@ class Import:
             return "import pywatershed", "import numpy"
         else:
             return "import pynhm", "import numpy"
+
+    def timeraw_import_pywatershed_model(self):
+        # the public names are imported on first access
+        if _is_pws:
+            return "import pywatershed; pywatershed.Model"
+        else:
+            return "import pynhm; pynhm.Model"
+
+    def timeraw_import_meta(self):
+        # the metadata are loaded from their cache after the first import
+        if _is_pws:
+            return "import pywatershed.base.meta"
+        else:
+            return "import pynhm.base.meta"
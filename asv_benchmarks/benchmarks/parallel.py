@@ -0,0 +1,235 @@
+import numpy as np
+
+from . import _is_pws, parameterized, test_data_dir
+
+if _is_pws:
+    import pywatershed as pws
+else:
+    import pynhm as pws
+
+domains = ["drb_2yr", "ucb_2yr"]
+num_threads = [1, 2, 4, 8, 16]
+n_time_steps = 183
+
+
+class PRMSNumbaThreads:
+    """Benchmark the scaling of an NHM model with the numba threads"""
+
+    # the model advances in the benchmark, set it up for each sample
+    number = 1
+
+    def setup(self, domain, threads):
+        import numba as nb
+
+        if "numba_num_threads" not in getattr(
+            pws.base.control, "pws_control_options_avail", []
+        ):
+            # asv skips benchmarks raising NotImplementedError in setup
+            raise NotImplementedError("numba_num_threads not available")
+        if threads > nb.config.NUMBA_NUM_THREADS:
+            raise NotImplementedError(
+                f"numba has only {nb.config.NUMBA_NUM_THREADS} threads"
+            )
+
+        domain_dir = test_data_dir / domain
+        self.control = pws.Control.load_prms(
+            domain_dir / "nhm.control", warn_unused_options=False
+        )
+        for oo in ["netcdf_output_dir", "netcdf_output_var_names"]:
+            if oo in self.control.options.keys():
+                del self.control.options[oo]
+        self.control.options["input_dir"] = domain_dir
+        self.control.options["calc_method"] = "numba"
+        self.control.options["channel_routing"] = "level"
+        self.control.options["numba_num_threads"] = threads
+        # one more time step to load (or compile) the kernels in setup
+        self.control.edit_n_time_steps(n_time_steps + 1)
+
+        params = pws.parameters.PrmsParameters.load(
+            domain_dir / "myparam.param"
+        )
+        self.model = pws.Model(
+            [
+                pws.PRMSSolarGeometry,
+                pws.PRMSAtmosphere,
+                pws.PRMSCanopy,
+                pws.PRMSSnow,
+                pws.PRMSRunoff,
+                pws.PRMSSoilzone,
+                pws.PRMSGroundwater,
+                pws.PRMSChannel,
+            ],
+            control=self.control,
+            parameters=params,
+        )
+        self.model.advance()
+        self.model.calculate()
+
+    def teardown(self, domain, threads):
+        del self.model
+        del self.control
+
+    @parameterized(
+        ["domain", "threads"],
+        (domains, num_threads),
+    )
+    def time_nhm_run(self, domain, threads):
+        for istep in range(n_time_steps):
+            self.model.advance()
+            self.model.calculate()
+
+
+class PRMSPartitions:
+    """Benchmark the scaling of an NHM model with the domain partitions"""
+
+    # the model runs in the benchmark, set it up for each sample
+    number = 1
+    timeout = 1200
+
+    def setup(self, domain, partitions):
+        if not hasattr(pws, "PartitionedModel"):
+            # asv skips benchmarks raising NotImplementedError in setup
+            raise NotImplementedError("PartitionedModel not available")
+
+        domain_dir = test_data_dir / domain
+        control = pws.Control.load_prms(
+            domain_dir / "nhm.control", warn_unused_options=False
+        )
+        for oo in ["netcdf_output_dir", "netcdf_output_var_names"]:
+            if oo in control.options.keys():
+                del control.options[oo]
+        control.options["input_dir"] = domain_dir
+        control.options["calc_method"] = "numba"
+        control.edit_n_time_steps(n_time_steps)
+
+        params = pws.parameters.PrmsParameters.load(
+            domain_dir / "myparam.param"
+        )
+        self.model = pws.PartitionedModel(
+            [
+                pws.PRMSSolarGeometry,
+                pws.PRMSAtmosphere,
+                pws.PRMSCanopy,
+                pws.PRMSSnow,
+                pws.PRMSRunoff,
+                pws.PRMSSoilzone,
+                pws.PRMSGroundwater,
+                pws.PRMSChannel,
+            ],
+            control=control,
+            parameters=params,
+            n_partitions=partitions,
+        )
+
+    def teardown(self, domain, partitions):
+        del self.model
+
+    @parameterized(
+        ["domain", "partitions"],
+        (domains, [1, 2, 4, 8]),
+    )
+    def time_nhm_run(self, domain, partitions):
+        self.model.run()
+
+
+class PRMSEnsemble:
+    """Benchmark a parameter ensemble of an NHM model"""
+
+    # the models run in the benchmark, set them up for each sample
+    number = 1
+    timeout = 1200
+
+    def setup(self, domain, members):
+        if not hasattr(pws, "EnsembleModel"):
+            # asv skips benchmarks raising NotImplementedError in setup
+            raise NotImplementedError("EnsembleModel not available")
+
+        domain_dir = test_data_dir / domain
+        self.controls = []
+        for imodel in range(members + 1):
+            control = pws.Control.load_prms(
+                domain_dir / "nhm.control", warn_unused_options=False
+            )
+            for oo in ["netcdf_output_dir", "netcdf_output_var_names"]:
+                if oo in control.options.keys():
+                    del control.options[oo]
+            control.options["input_dir"] = domain_dir
+            control.options["calc_method"] = "numba"
+            control.edit_n_time_steps(n_time_steps)
+            self.controls.append(control)
+
+        params = pws.parameters.PrmsParameters.load(
+            domain_dir / "myparam.param"
+        )
+        self.params_list = []
+        for factor in np.linspace(0.8, 1.2, members):
+            params_dd = params.to_dd()
+            params_dd.data_vars["soil_moist_max"] *= factor
+            self.params_list.append(
+                pws.parameters.PrmsParameters.from_dict(params_dd.data)
+            )
+        self.processes = [
+            pws.PRMSSolarGeometry,
+            pws.PRMSAtmosphere,
+            pws.PRMSCanopy,
+            pws.PRMSSnow,
+            pws.PRMSRunoff,
+            pws.PRMSSoilzone,
+            pws.PRMSGroundwater,
+            pws.PRMSChannel,
+        ]
+
+    def teardown(self, domain, members):
+        del self.controls
+        del self.params_list
+
+    @parameterized(
+        ["domain", "members"],
+        (domains, [1, 4, 16]),
+    )
+    def time_ensemble_run(self, domain, members):
+        model = pws.EnsembleModel(
+            self.processes,
+            control=self.controls[0],
+            parameters_list=self.params_list,
+        )
+        model.run()
+
+    @parameterized(
+        ["domain", "members"],
+        (domains, [1, 4, 16]),
+    )
+    def time_member_runs(self, domain, members):
+        for control, params in zip(self.controls[1:], self.params_list):
+            model = pws.Model(
+                self.processes, control=control, parameters=params
+            )
+            model.run()
+
+    @parameterized(
+        ["domain", "members"],
+        (domains, [1, 4, 16]),
+    )
+    def time_pool_runs(self, domain, members):
+        if not hasattr(pws, "run_ensemble"):
+            raise NotImplementedError("run_ensemble not available")
+        model_dict = {
+            "control": self.controls[0],
+            **{
+                proc.__name__: {
+                    "class": proc,
+                    "parameters": self.params_list[0],
+                }
+                for proc in self.processes
+            },
+            "model_order": [proc.__name__ for proc in self.processes],
+        }
+        members = [
+            {
+                "parameters": {
+                    "soil_moist_max": params.get_param_values("soil_moist_max")
+                }
+            }
+            for params in self.params_list
+        ]
+        pws.run_ensemble(model_dict, members)
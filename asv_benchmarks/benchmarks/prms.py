@@ -15,8 +15,16 @@ else:
 #      it is released.
 
 domains = ["hru_1", "drb_2yr", "ucb_2yr"]
-outputs = [None, "separate", "together"]
+outputs = [
+    None,
+    "separate",
+    "together",
+    "separate_buffered",
+    "together_buffered",
+]
 n_time_steps = 183
+# time steps buffered per variable by the "*_buffered" outputs
+buffer_n_times = 30
 
 model_tests = {
     "solar": (pws.PRMSSolarGeometry,),
@@ -121,7 +129,15 @@ class PRMSModels:
         self,
         domain: str = None,
         processes: tuple = None,
-        write_output: Union[bool, Literal["separate", "together"]] = None,
+        write_output: Union[
+            bool,
+            Literal[
+                "separate",
+                "together",
+                "separate_buffered",
+                "together_buffered",
+            ],
+        ] = None,
     ):
         # seem to need to load control inside the model setup run bc
         # results are strange/inconsistent
@@ -164,9 +180,13 @@ class PRMSModels:
             )
 
         if write_output is not None:
+            output_kwargs = {}
+            if write_output.endswith("_buffered"):
+                output_kwargs["buffer_n_times"] = buffer_n_times
             model.initialize_netcdf(
                 output_dir=self.tag_dir,
-                separate_files=(write_output == "separate"),
+                separate_files=write_output.startswith("separate"),
+                **output_kwargs,
             )
         model.run(finalize=True)
         del model
@@ -184,7 +204,15 @@ class PRMSModels:
         self,
         domain: str,
         procs: str,
-        output: Union[None, Literal["separate", "together"]],
+        output: Union[
+            None,
+            Literal[
+                "separate",
+                "together",
+                "separate_buffered",
+                "together_buffered",
+            ],
+        ],
     ):
         print(
             "\nPRMSModels args: \n",
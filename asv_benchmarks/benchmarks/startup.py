@@ -0,0 +1,56 @@
+from . import _is_pws, test_data_dir
+
+if _is_pws:
+    import pywatershed as pws
+else:
+    import pynhm as pws
+
+domain = "hru_1"
+
+# A fresh interpreter: the time to first step including the loading (or
+# compiling) of the numba kernels.
+startup_code = f"""
+import pywatershed as pws
+
+domain_dir = "{test_data_dir / domain}"
+control = pws.Control.load_prms(
+    domain_dir + "/nhm.control", warn_unused_options=False
+)
+for oo in ["netcdf_output_dir", "netcdf_output_var_names"]:
+    control.options.pop(oo, None)
+control.edit_n_time_steps(1)
+control.options["calc_method"] = "numba"
+control.options["input_dir"] = domain_dir
+params = pws.parameters.PrmsParameters.load(domain_dir + "/myparam.param")
+model = pws.Model(
+    [
+        pws.PRMSSolarGeometry,
+        pws.PRMSAtmosphere,
+        pws.PRMSCanopy,
+        pws.PRMSSnow,
+        pws.PRMSRunoff,
+        pws.PRMSSoilzone,
+        pws.PRMSGroundwater,
+        pws.PRMSChannel,
+    ],
+    control=control,
+    parameters=params,
+)
+model.run(finalize=True)
+"""
+
+
+class Startup:
+    """Benchmark the startup of a model in a new Python process"""
+
+    timeout = 600
+
+    def setup(self):
+        if not hasattr(pws, "precompile"):
+            # asv skips benchmarks raising NotImplementedError in setup
+            raise NotImplementedError("precompile not available")
+        # the numba kernels are loaded from the cache in the benchmark
+        pws.precompile()
+
+    def timeraw_startup_nhm_numba(self):
+        return startup_code
@@ -1,6 +1,9 @@
 import pathlib as pl
 
+import pytest
+
 import pywatershed as pws
+from pywatershed.parameters import PrmsParameters
 
 test_data_dir = pl.Path("../test_data")
 
@@ -165,3 +168,73 @@ def pytest_generate_tests(metafunc):
         metafunc.parametrize(
             "simulation", simulations.values(), ids=simulations.keys()
         )
+
+
+def nhm_processes(control, channel: bool = True) -> list:
+    """The NHM processes of the control of a simulation.
+
+    The processes with or without depression storage follow the dprst_flag
+    option, PRMSChannel is last when channel is True and the simulation has
+    a stream network.
+    """
+    if control.options.get("dprst_flag", False):
+        processes = [pws.PRMSRunoff, pws.PRMSSoilzone, pws.PRMSGroundwater]
+    else:
+        processes = [
+            pws.PRMSRunoffNoDprst,
+            pws.PRMSSoilzoneNoDprst,
+            pws.PRMSGroundwaterNoDprst,
+        ]
+    processes = [
+        pws.PRMSSolarGeometry,
+        pws.PRMSAtmosphere,
+        pws.PRMSCanopy,
+        pws.PRMSSnow,
+        *processes,
+    ]
+    if channel and control.options["streamflow_module"] != "strmflow":
+        processes += [pws.PRMSChannel]
+    return processes
+
+
+@pytest.fixture(scope="function")
+def load_control(simulation, request):
+    """A function loading a new control of the simulation.
+
+    The control reads its inputs from the simulation directory, has no NetCDF
+    output and runs the n_time_steps of the test module (if any) unless
+    given. The keyword arguments of the function are control options.
+    """
+
+    def load(n_time_steps: int = None, **options):
+        control = pws.Control.load_prms(
+            simulation["control_file"], warn_unused_options=False
+        )
+        if n_time_steps is None:
+            n_time_steps = getattr(request.module, "n_time_steps", None)
+        if n_time_steps is not None:
+            control.edit_n_time_steps(n_time_steps)
+        control.options["input_dir"] = simulation["dir"]
+        control.options.update(options)
+        del control.options["netcdf_output_var_names"]
+        del control.options["netcdf_output_dir"]
+        return control
+
+    return load
+
+
+@pytest.fixture(scope="function")
+def control(load_control, request):
+    """The control of load_control, with the options of the parameter of an
+    indirect parametrization."""
+    return load_control(**getattr(request, "param", {}))
+
+
+@pytest.fixture(scope="function")
+def params(simulation):
+    control = pws.Control.load_prms(
+        simulation["control_file"], warn_unused_options=False
+    )
+    return PrmsParameters.load(
+        simulation["dir"] / control.options["parameter_file"]
+    )
@@ -1,6 +1,8 @@
 import numpy as np
 import pytest
+from conftest import nhm_processes
 
+import pywatershed as pws
 from pywatershed.base.budget import Budget
 from pywatershed.base.control import Control
 
@@ -142,3 +144,198 @@ def test_budget(control_simple):
     print(budget)
 
     return
+
+
+@pytest.mark.domainless
+@pytest.mark.filterwarnings("ignore:Metadata unavailable")
+def test_budget_calc_methods():
+    nhru = 50
+    rng = np.random.default_rng(0)
+    # mixed precision terms, as with float_precision float32
+    terms = {
+        comp: {
+            f"{comp}_{ii}": np.zeros(
+                [nhru], dtype=np.float32 if ii else np.float64
+            )
+            for ii in range(3)
+        }
+        for comp in ["inputs", "outputs", "storage_changes"]
+    }
+    terms_keys = {key: list(val.keys()) for key, val in terms.items()}
+
+    budgets = {}
+    controls = {}
+    for calc_method in ["numpy", "numba"]:
+        controls[calc_method] = Control(**time_dict)
+        budgets[calc_method] = Budget(
+            controls[calc_method],
+            **terms_keys,
+            description=calc_method,
+            calc_method=calc_method,
+            verbose=False,
+        )
+        budgets[calc_method].set(terms)
+
+    for istep in range(4):
+        for comp in terms.values():
+            for values in comp.values():
+                values[:] = rng.random(nhru)
+        # balance the budget with the first storage change
+        storage_change = terms["storage_changes"]["storage_changes_0"]
+        storage_change[:] = 0.0
+        storage_change[:] = (
+            sum(terms["inputs"].values())
+            - sum(terms["outputs"].values())
+            - sum(terms["storage_changes"].values())
+        )
+        if istep == 3:
+            # an imbalance, diagnosed by both
+            storage_change[7] += 1.0
+
+        for calc_method, budget in budgets.items():
+            controls[calc_method].advance()
+            budget.advance()
+            if istep == 3:
+                with pytest.warns(UserWarning, match=r"\(array\(\[7\]\),\)"):
+                    budget.calculate()
+            else:
+                budget.calculate()
+
+        assert budgets["numpy"]._zero_sum == (istep < 3)
+        assert budgets["numba"]._zero_sum == (istep < 3)
+        np.testing.assert_array_equal(
+            budgets["numpy"].balance, budgets["numba"].balance
+        )
+        for comp in terms.keys():
+            np.testing.assert_array_equal(
+                budgets["numpy"]._accumulations_sum[comp],
+                budgets["numba"]._accumulations_sum[comp],
+            )
+            for var in terms[comp].keys():
+                accumulation = budgets["numba"].accumulations[comp][var]
+                assert accumulation.dtype == np.float64
+                np.testing.assert_array_equal(
+                    budgets["numpy"].accumulations[comp][var], accumulation
+                )
+
+    for budget in budgets.values():
+        budget.reset_accumulations()
+        for comp in terms.keys():
+            assert (budget._accumulations_sum[comp] == 0).all()
+            for var in terms[comp].keys():
+                assert (budget.accumulations[comp][var] == 0).all()
+
+    return
+
+
+@pytest.mark.domainless
+@pytest.mark.filterwarnings("ignore:Metadata unavailable")
+@pytest.mark.parametrize("calc_method", ["numpy", "numba"])
+def test_budget_check_interval(calc_method):
+    nhru = 5
+    terms = {
+        "inputs": {"in1": np.ones([nhru])},
+        "outputs": {"out1": np.zeros([nhru])},
+        "storage_changes": {"stor1": np.ones([nhru])},
+    }
+    terms_keys = {key: list(val.keys()) for key, val in terms.items()}
+    control = Control(
+        np.datetime64("1979-01-01T00:00:00"),
+        np.datetime64("1979-01-31T00:00:00"),
+        np.timedelta64(1, "D"),
+    )
+    budget = Budget(
+        control,
+        **terms_keys,
+        description="interval_test",
+        calc_method=calc_method,
+        check_interval=3,
+        verbose=False,
+    )
+    budget.set(terms)
+
+    def step():
+        control.advance()
+        budget.advance()
+        budget.calculate()
+
+    # an imbalance at HRU 2 on the second time step is only reported at the
+    # end of the window
+    step()
+    terms["storage_changes"]["stor1"][2] = 0.4
+    step()
+    terms["storage_changes"]["stor1"][2] = 1.0
+    assert len(budget.check_log) == 0
+    with pytest.warns(UserWarning, match="3 time steps from 1979-01-01"):
+        step()
+
+    assert len(budget.check_log) == 1
+    record = budget.check_log[0]
+    assert record["start_time"] == np.datetime64("1979-01-01T00:00:00")
+    assert record["end_time"] == np.datetime64("1979-01-03T00:00:00")
+    assert record["n_time_steps"] == 3
+    np.testing.assert_array_equal(record["locations"], [2])
+    # the mean residual over the window
+    np.testing.assert_allclose(record["residuals"], [0.6 / 3])
+    np.testing.assert_allclose(record["max_abs_residual"], 0.6 / 3)
+    assert not budget._zero_sum
+
+    # balanced windows are logged without locations, the last (partial)
+    # window is checked by reset_accumulations and finalize
+    for istep in range(4):
+        step()
+    assert len(budget.check_log) == 2
+    budget.reset_accumulations()
+    assert len(budget.check_log) == 3
+    assert budget.check_log[-1]["n_time_steps"] == 1
+    step()
+    budget.finalize()
+    assert [rr["n_time_steps"] for rr in budget.check_log] == [3, 3, 1, 1]
+    for record in budget.check_log[1:]:
+        assert record["locations"].size == 0
+        assert record["max_abs_residual"] < 1e-12
+    assert budget._zero_sum
+
+    budget.imbalance_fatal = True
+    terms["storage_changes"]["stor1"][0] = 0.0
+    step()
+    with pytest.raises(ValueError, match="locations: \\[0\\]"):
+        budget.check_window()
+
+    with pytest.warns(UserWarning, match="check_interval must be"):
+        budget = Budget(control, **terms_keys, check_interval=0)
+    assert budget.check_interval == 1
+    return
+
+
+@pytest.mark.domain
+def test_model_budget_check_interval(load_control, params):
+    accumulations = {}
+    for check_interval in [1, 7]:
+        control = load_control(
+            20, budget_type="error", budget_check_interval=check_interval
+        )
+        processes = nhm_processes(control)[:4]
+        model = pws.Model(processes, control=control, parameters=params)
+        model.run()
+
+        for name in ["PRMSCanopy", "PRMSSnow"]:
+            budget = model.processes[name].budget
+            assert budget.check_interval == check_interval
+            accumulations[(name, check_interval)] = budget.accumulations
+            if check_interval == 1:
+                assert len(budget.check_log) == 0
+                continue
+            # the last window is checked when the model finalizes
+            n_steps = [record["n_time_steps"] for record in budget.check_log]
+            assert n_steps == [7, 7, 6]
+            for record in budget.check_log:
+                assert record["locations"].size == 0
+
+    for name in ["PRMSCanopy", "PRMSSnow"]:
+        for component, values in accumulations[(name, 1)].items():
+            for var in values.keys():
+                np.testing.assert_array_equal(
+                    values[var], accumulations[(name, 7)][component][var]
+                )
+    return
@@ -7,7 +7,11 @@ from utils import assert_or_print
 
 from pywatershed import Control
 from pywatershed.parameters import PrmsParameters
-from pywatershed.utils.cbh_utils import cbh_file_to_netcdf, cbh_files_to_df
+from pywatershed.utils.cbh_utils import (
+    cbh_file_to_netcdf,
+    cbh_files_to_df,
+    cbh_files_to_netcdf,
+)
 
 var_cases = ["prcp", "rhavg", "tmax", "tmin"]
 
@@ -131,3 +135,46 @@ def test_cbh_file_to_netcdf(simulation, params, tmp_path):
     )
 
     return
+
+
+@pytest.mark.domain
+def test_cbh_file_to_netcdf_blocks(simulation, params, tmp_path):
+    # streaming in blocks of time writes the same file as reading it whole
+    cbh_file = simulation["dir"] / "tmax.cbh"
+    nc_files = {}
+    for block_n_times in [None, 100, 7]:
+        nc_files[block_n_times] = tmp_path / f"tmax_{block_n_times}.nc"
+        cbh_file_to_netcdf(
+            cbh_file,
+            params,
+            nc_files[block_n_times],
+            block_n_times=block_n_times,
+        )
+
+    with xr.open_dataset(nc_files[None]) as ans:
+        for block_n_times in [100, 7]:
+            with xr.open_dataset(nc_files[block_n_times]) as res:
+                xr.testing.assert_identical(res, ans)
+    return
+
+
+@pytest.mark.domain
+def test_cbh_files_to_netcdf(simulation, params, tmp_path):
+    names = ["prcp", "tmax", "tmin"]
+    input_files = {name: simulation["dir"] / f"{name}.cbh" for name in names}
+    nc_files = {name: tmp_path / f"{name}.nc" for name in names}
+    written = cbh_files_to_netcdf(
+        input_files, params, nc_files, max_workers=2, block_n_times=200
+    )
+    assert written == list(nc_files.values())
+
+    for name in names:
+        ans_file = tmp_path / f"{name}_ans.nc"
+        cbh_file_to_netcdf(input_files[name], params, ans_file)
+        with xr.open_dataset(ans_file) as ans:
+            with xr.open_dataset(nc_files[name]) as res:
+                xr.testing.assert_identical(res, ans)
+
+    with pytest.raises(ValueError, match="same keys"):
+        cbh_files_to_netcdf(input_files, params, {"prcp": nc_files["prcp"]})
+    return
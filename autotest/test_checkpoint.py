@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+import xarray as xr
+from conftest import nhm_processes
+
+import pywatershed as pws
+from pywatershed.base.timeseries import TimeseriesArray
+
+n_time_steps = 20
+n_checkpoint = 9
+output_vars = ["soil_moist", "gwres_flow", "pkwater_equiv", "seg_outflow"]
+budget_type = "error"
+
+
+@pytest.mark.domain
+@pytest.mark.parametrize("n_time_chunk", [0, 7], ids=["full", "chunked"])
+def test_checkpoint(load_control, params, n_time_chunk, tmp_path):
+    control = load_control(n_time_chunk=n_time_chunk, budget_type=budget_type)
+    processes = nhm_processes(control)
+    model = pws.Model(processes, control=control, parameters=params)
+    model.run(netcdf_dir=tmp_path / "continuous", output_vars=output_vars)
+
+    control = load_control(n_time_chunk=n_time_chunk, budget_type=budget_type)
+    first = pws.Model(processes, control=control, parameters=params)
+    for istep in range(n_checkpoint):
+        first.advance()
+        first.calculate()
+    checkpoint_file = tmp_path / "checkpoint.npz"
+    first.checkpoint(checkpoint_file)
+    first.finalize()
+
+    restart = pws.Model.from_checkpoint(
+        checkpoint_file,
+        processes,
+        control=load_control(
+            n_time_chunk=n_time_chunk, budget_type=budget_type
+        ),
+        parameters=params,
+    )
+    assert restart.control.start_time == model.control.start_time + (
+        n_checkpoint * model.control.time_step
+    )
+    assert restart.control.end_time == model.control.end_time
+    restart.run(netcdf_dir=tmp_path / "restart", output_vars=output_vars)
+
+    for proc_name, proc in model.processes.items():
+        restart_proc = restart.processes[proc_name]
+        for var in proc.get_variables():
+            values = proc[var]
+            if isinstance(values, TimeseriesArray):
+                values = values.current
+                restart_values = restart_proc[var].current
+            else:
+                restart_values = restart_proc[var]
+            np.testing.assert_array_equal(
+                restart_values, values, err_msg=f"{proc_name}: {var}"
+            )
+        if getattr(proc, "budget", None) is not None:
+            for component in proc.budget.components:
+                for var, values in proc.budget._accumulations[
+                    component
+                ].items():
+                    np.testing.assert_array_equal(
+                        restart_proc.budget._accumulations[component][var],
+                        values,
+                        err_msg=f"{proc_name}: {component} {var}",
+                    )
+
+    for var in output_vars:
+        ans_file = tmp_path / "continuous" / f"{var}.nc"
+        if not ans_file.exists():
+            continue
+        with xr.open_dataarray(ans_file) as ans:
+            with xr.open_dataarray(tmp_path / "restart" / f"{var}.nc") as res:
+                assert res.sizes["time"] == n_time_steps - n_checkpoint
+                np.testing.assert_array_equal(
+                    res, ans[n_checkpoint:], err_msg=var
+                )
+    return
+
+
+@pytest.mark.domain
+def test_checkpoint_time_step(load_control, params, tmp_path):
+    control = load_control(n_time_chunk=0, budget_type=budget_type)
+    processes = nhm_processes(control)[:2]
+    model = pws.Model(processes, control=control, parameters=params)
+    model.advance()
+    model.calculate()
+    model.checkpoint(tmp_path / "checkpoint.npz")
+
+    control = load_control(n_time_chunk=0, budget_type=budget_type)
+    control._time_step = 2 * control.time_step
+    with pytest.raises(ValueError, match="time step"):
+        pws.Model.from_checkpoint(
+            tmp_path / "checkpoint.npz",
+            processes,
+            control=control,
+            parameters=params,
+        )
+    return
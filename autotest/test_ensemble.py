@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+import xarray as xr
+from conftest import nhm_processes
+
+import pywatershed as pws
+from pywatershed.parameters import PrmsParameters
+
+n_time_steps = 10
+output_vars = ["soil_moist", "gwres_flow", "snowcov_area"]
+
+
+def model_dict(control, params):
+    processes = nhm_processes(control, channel=False)
+    return {
+        "control": control,
+        **{
+            proc.__name__: {"class": proc, "parameters": params}
+            for proc in processes
+        },
+        "model_order": [proc.__name__ for proc in processes],
+    }
+
+
+@pytest.mark.domain
+def test_run_ensemble(load_control, control, params, tmp_path):
+    soil_moist_max = params.get_param_values("soil_moist_max")
+    members = [
+        {},
+        {"parameters": {"soil_moist_max": soil_moist_max * 1.2}},
+        {"control": {"calc_method": "numpy"}},
+        {"model_order": model_dict(control, params)["model_order"][:4]},
+    ]
+    output_file = tmp_path / "ensemble.nc"
+    reports = pws.run_ensemble(
+        model_dict(control, params),
+        members,
+        output_vars=output_vars,
+        output_file=output_file,
+        max_workers=2,
+    )
+    for report in reports:
+        assert report["error"] is None
+        assert report["attempts"] == 1
+        assert report["run_time"] > 0
+
+    ensemble = xr.open_dataset(output_file)
+    np.testing.assert_array_equal(ensemble.member, np.arange(len(members)))
+    for imember, member in enumerate(members):
+        member_control = load_control()
+        member_control.options.update(member.get("control", {}))
+        member_params = params
+        if "parameters" in member.keys():
+            params_dd = params.to_dd()
+            params_dd.data_vars.update(member["parameters"])
+            member_params = PrmsParameters.from_dict(params_dd.data)
+        member_dict = model_dict(member_control, member_params)
+        if "model_order" in member.keys():
+            for proc_name in member_dict["model_order"]:
+                if proc_name not in member["model_order"]:
+                    del member_dict[proc_name]
+            member_dict["model_order"] = member["model_order"]
+
+        model = pws.Model(member_dict)
+        member_dir = tmp_path / f"member_{imember}"
+        model.run(netcdf_dir=member_dir, output_vars=output_vars)
+        for var in output_vars:
+            if not (member_dir / f"{var}.nc").exists():
+                assert np.isnan(ensemble[var][:, imember]).all()
+                continue
+            with xr.open_dataarray(member_dir / f"{var}.nc") as ans:
+                np.testing.assert_allclose(
+                    ensemble[var][:, imember],
+                    ans,
+                    rtol=1e-10,
+                    atol=1e-12,
+                    err_msg=f"member {imember}: {var}",
+                )
+
+    ensemble.close()
+    return
+
+
+@pytest.mark.domain
+def test_run_ensemble_failure(control, params, tmp_path):
+    members = [{}, {"parameters": {"soil_moist_max": np.zeros(3)}}]
+    output_file = tmp_path / "ensemble.nc"
+    with pytest.warns(UserWarning, match=r"members \[1\] failed"):
+        reports = pws.run_ensemble(
+            model_dict(control, params),
+            members,
+            output_vars=output_vars,
+            output_file=output_file,
+            max_workers=1,
+            n_retries=1,
+        )
+    assert reports[0]["error"] is None
+    assert reports[1]["attempts"] == 2
+    assert "soil_moist_max" in reports[1]["error"]
+    with xr.open_dataset(output_file) as ensemble:
+        np.testing.assert_array_equal(ensemble.member, [0])
+
+    with pytest.raises(ValueError, match="unknown keys"):
+        pws.run_ensemble(model_dict(control, params), [{"param": {}}])
+    with pytest.raises(ValueError, match="unknown parameters"):
+        pws.run_ensemble(
+            model_dict(control, params), [{"parameters": {"no_param": 1}}]
+        )
+    return
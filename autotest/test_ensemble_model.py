@@ -0,0 +1,154 @@
+import numpy as np
+import pytest
+import xarray as xr
+from conftest import nhm_processes
+
+import pywatershed as pws
+from pywatershed.base.ensemble_model import stack_parameters
+from pywatershed.parameters import PrmsParameters
+
+n_time_steps = 20
+member_factors = {
+    "soil_moist_max": [1.0, 1.2, 0.8],
+    "gwflow_coef": [1.0, 0.5, 1.5],
+}
+
+
+@pytest.fixture(scope="function")
+def params_list(params):
+    params_list = []
+    for imember in range(3):
+        params_dd = params.to_dd()
+        for param, factors in member_factors.items():
+            params_dd.data_vars[param] *= factors[imember]
+        params_list.append(PrmsParameters.from_dict(params_dd.data))
+    return params_list
+
+
+@pytest.mark.domain
+def test_stack_parameters(params_list):
+    n_members = len(params_list)
+    params = params_list[0]
+    stacked = stack_parameters(params_list)
+    for dim in ["nhru", "nsegment"]:
+        if dim in params.dims:
+            assert stacked.dims[dim] == n_members * params.dims[dim]
+    assert stacked.dims["nmonth"] == params.dims["nmonth"]
+
+    np.testing.assert_equal(
+        stacked.get_param_values("soil_moist_max"),
+        np.concatenate(
+            [pp.get_param_values("soil_moist_max") for pp in params_list]
+        ),
+    )
+    np.testing.assert_equal(
+        stacked.get_param_values("tmax_cbh_adj"),
+        np.tile(params.get_param_values("tmax_cbh_adj"), (1, n_members)),
+    )
+    np.testing.assert_equal(
+        stacked.coords["nhm_id"], np.tile(params.coords["nhm_id"], n_members)
+    )
+
+    # the segments of each member drain to the segments of the member
+    if "nsegment" in params.dims:
+        nseg = params.dims["nsegment"]
+        tosegment = stacked.get_param_values("tosegment").reshape(
+            n_members, nseg
+        )
+        for imember in range(n_members):
+            to = tosegment[imember]
+            assert np.all((to <= 0) | (to > imember * nseg))
+            assert np.all(to <= (imember + 1) * nseg)
+            to_member = np.where(to > 0, to - imember * nseg, to)
+            np.testing.assert_equal(
+                to_member, params.get_param_values("tosegment")
+            )
+
+    # shared parameters must be equal
+    params_dd = params.to_dd()
+    params_dd.data_vars["melt_temp"] = params_dd.data_vars["melt_temp"] + 1.0
+    with pytest.raises(ValueError, match="melt_temp"):
+        stack_parameters([params, PrmsParameters.from_dict(params_dd.data)])
+
+
+@pytest.mark.domain
+def test_ensemble_model(load_control, control, params_list, tmp_path):
+    processes = nhm_processes(control)
+    output_vars = ["soil_moist", "gwres_flow", "seg_outflow"]
+
+    ensemble = pws.EnsembleModel(
+        processes, control=control, parameters_list=params_list
+    )
+    ensemble.run(netcdf_dir=tmp_path / "ensemble", output_vars=output_vars)
+
+    for imember, params in enumerate(params_list):
+        model = pws.Model(processes, control=load_control(), parameters=params)
+        member_dir = tmp_path / f"member_{imember}"
+        model.run(netcdf_dir=member_dir, output_vars=output_vars)
+
+        for var in output_vars:
+            ans_file = member_dir / f"{var}.nc"
+            if not ans_file.exists():
+                continue
+            with xr.open_dataarray(ans_file) as ans:
+                with xr.open_dataarray(
+                    tmp_path / "ensemble" / ans_file.name
+                ) as res:
+                    assert res.dims == ("time", "member", ans.dims[1])
+                    np.testing.assert_array_equal(
+                        res[ans.dims[1]], ans[ans.dims[1]]
+                    )
+                    np.testing.assert_allclose(
+                        res[:, imember],
+                        ans,
+                        rtol=1e-10,
+                        atol=1e-12,
+                        err_msg=var,
+                    )
+
+            proc = [
+                pp
+                for pp in model.processes.values()
+                if var in pp.get_variables()
+            ][0]
+            np.testing.assert_allclose(
+                ensemble.get_member_values(var)[imember],
+                proc[var],
+                rtol=1e-10,
+                atol=1e-12,
+                err_msg=var,
+            )
+    return
+
+
+@pytest.mark.domain
+def test_ensemble_soltab(load_control, params, params_list, monkeypatch):
+    n_hrus = []
+    compute_soltab = pws.PRMSSolarGeometry.compute_soltab
+
+    def count_hrus(slopes, *args):
+        n_hrus.append(len(slopes))
+        return compute_soltab(slopes, *args)
+
+    monkeypatch.setattr(
+        pws.PRMSSolarGeometry, "compute_soltab", staticmethod(count_hrus)
+    )
+
+    member = pws.PRMSSolarGeometry(load_control(), None, params)
+    member._calculate_all_time()
+    assert n_hrus[0] <= params.dims["nhru"]
+
+    # the members share their solar tables
+    ensemble = pws.EnsembleModel(
+        [pws.PRMSSolarGeometry],
+        control=load_control(),
+        parameters_list=params_list,
+    )
+    ensemble.advance()
+    assert n_hrus == 4 * n_hrus[:1]
+    for var in pws.PRMSSolarGeometry.get_variables():
+        np.testing.assert_array_equal(
+            ensemble.processes["PRMSSolarGeometry"][var].data,
+            np.tile(member[var].data, (1, len(params_list))),
+        )
+    return
@@ -0,0 +1,130 @@
+import warnings
+
+import numpy as np
+import pytest
+from conftest import nhm_processes
+
+import pywatershed as pws
+from pywatershed.base.adapter import adapter_factory
+from pywatershed.base.process import float_precision_type
+
+# Single precision flips some of the thresholds of the processes (e.g. the
+# snow and rain mixtures of PRMSSnow) compared to double precision so the
+# values at individual HRUs diverge over time (and fluxes such as snowmelt
+# shift by a time step), as for the PRMS mixed precision build. The domain
+# means of the storages and the cumulative domain means of the fluxes are
+# compared to the double precision PRMS reference, relative to the maximum
+# of the reference. (Over drb_2yr the domain means of the PRMS mixed
+# precision build are within 2.0e-2, float32 within 1.0e-2).
+rtol_domain_mean = 1.0e-2
+storage_vars = [
+    "pkwater_equiv",
+    "dprst_stor_hru",
+    "soil_moist",
+    "ssres_stor",
+    "gwres_stor",
+]
+flux_vars = [
+    "net_ppt",
+    "snowmelt",
+    "sroff",
+    "infil",
+    "hru_actet",
+    "recharge",
+    "gwres_flow",
+    "seg_outflow",
+]
+
+
+@pytest.mark.domainless
+def test_float_precision_type():
+    control = pws.Control(
+        np.datetime64("2000-01-01"),
+        np.datetime64("2000-01-02"),
+        np.timedelta64(24, "h"),
+    )
+    assert float_precision_type(control) is np.float64
+    control.options["float_precision"] = "float32"
+    assert float_precision_type(control) is np.float32
+    control.options["float_precision"] = "float16"
+    with pytest.warns(UserWarning, match="Invalid float_precision"):
+        assert float_precision_type(control) is np.float64
+
+
+@pytest.mark.domain
+def test_float32_model(simulation, load_control, params):
+    control = load_control(
+        calc_method="numba", float_precision="float32", budget_type="warn"
+    )
+    model = pws.Model(
+        nhm_processes(control), control=control, parameters=params
+    )
+
+    # the state is allocated in float32, except for the channel routing and
+    # the variables with double precision metadata
+    def expected_type(var, float_type):
+        if pws.meta.find_variables(var)[var].get("precision") == "double":
+            return np.float64
+        return float_type
+
+    for name, process in model.processes.items():
+        float_type = np.float64 if name == "PRMSChannel" else np.float32
+        for var in process.get_variables():
+            values = np.asarray(getattr(process[var], "data", process[var]))
+            if np.issubdtype(values.dtype, np.floating):
+                assert values.dtype == expected_type(var, float_type), var
+        for var in process.inputs:
+            if np.issubdtype(process[var].dtype, np.floating):
+                assert process[var].dtype == expected_type(var, np.float32)
+    assert model.processes["PRMSSnow"].pkwater_equiv.dtype == np.float64
+    assert model.processes["PRMSSnow"].snowmelt.dtype == np.float32
+
+    owners = {}
+    for process in model.processes.values():
+        for var in process.get_variables():
+            if var in storage_vars + flux_vars:
+                owners[var] = process
+
+    answers = {}
+    for var in owners.keys():
+        nc_path = simulation["output_dir"] / f"{var}.nc"
+        if nc_path.exists():
+            answers[var] = adapter_factory(
+                nc_path, variable_name=var, control=control
+            )
+
+    results = {var: [] for var in answers.keys()}
+    means = {var: [] for var in answers.keys()}
+    with warnings.catch_warnings():
+        # the budgets are checked at their (double precision) tolerances
+        warnings.simplefilter("ignore", UserWarning)
+        for istep in range(control.n_times):
+            model.advance()
+            model.calculate()
+            for var, answer in answers.items():
+                answer.advance()
+                results[var].append(owners[var][var].mean(dtype=np.float64))
+                means[var].append(answer.current.mean())
+
+    for var in answers.keys():
+        if var in flux_vars:
+            results[var] = np.cumsum(results[var])
+            means[var] = np.cumsum(means[var])
+        np.testing.assert_allclose(
+            results[var],
+            means[var],
+            rtol=0.0,
+            atol=rtol_domain_mean * np.abs(means[var]).max(),
+            err_msg=var,
+        )
+
+    # budgets accumulate in float64
+    for process in model.processes.values():
+        budget = getattr(process, "budget", None)
+        if budget is None:
+            continue
+        for component in budget.accumulations.values():
+            for accumulation in component.values():
+                assert accumulation.dtype == np.float64
+
+    return
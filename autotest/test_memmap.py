@@ -0,0 +1,165 @@
+import os
+import shutil
+from copy import deepcopy
+
+import numpy as np
+import pytest
+from utils_compare import compare_in_memory
+
+from pywatershed import Control, Model, Parameters, PRMSGroundwater
+from pywatershed.base.adapter import AdapterMemmap, adapter_factory
+from pywatershed.base.data_model import DatasetDict
+from pywatershed.hydrology.prms_groundwater_no_dprst import (
+    PRMSGroundwaterNoDprst,
+)
+from pywatershed.parameters import PrmsParameters
+from pywatershed.utils import (
+    MemmapRead,
+    cbh_file_to_memmap,
+    netcdf_to_memmap,
+)
+
+
+@pytest.fixture(scope="function")
+def control(simulation):
+    return Control.load_prms(
+        simulation["control_file"], warn_unused_options=False
+    )
+
+
+@pytest.mark.domain
+@pytest.mark.parametrize("variable", ["gwres_stor", "soltab_potsw"])
+def test_adapter_memmap(simulation, control, variable, tmp_path):
+    nc_pth = simulation["output_dir"] / f"{variable}.nc"
+    npy_files = netcdf_to_memmap(nc_pth, tmp_path, n_times_chunk=100)
+    assert npy_files == [tmp_path / f"{variable}.npy"]
+
+    ans = adapter_factory(nc_pth, variable_name=variable, control=control)
+    result = adapter_factory(
+        npy_files[0], variable_name=variable, control=control
+    )
+    assert isinstance(result, AdapterMemmap)
+    assert (result.time == ans.time).all()
+    assert isinstance(result.data, np.memmap)
+    np.testing.assert_equal(result.data, np.ma.getdata(ans.data))
+
+    for istep in range(control.n_times):
+        control.advance()
+        ans.advance()
+        result.advance()
+        assert (ans.current == result.current).all()
+
+
+@pytest.mark.domain
+def test_memmap_writers(simulation, control, tmp_path):
+    variable = "prcp"
+    nc_pth = simulation["dir"] / f"{variable}.nc"
+    cbh_pth = simulation["dir"] / f"{variable}.cbh"
+    params = PrmsParameters.load(
+        simulation["dir"] / control.options["parameter_file"]
+    )
+    ans = MemmapRead(netcdf_to_memmap(nc_pth, tmp_path / "nc")[0])
+
+    cbh_files = cbh_file_to_memmap(cbh_pth, params, tmp_path / "cbh")
+    dd_files = DatasetDict.from_netcdf(nc_pth).to_memmap(tmp_path / "dd")
+
+    for npy_file in [cbh_files[0], dd_files[0]]:
+        result = MemmapRead(npy_file)
+        assert result.variable == variable
+        assert result.dims == ans.dims
+        assert (result.times == ans.times).all()
+        np.testing.assert_allclose(result.data, ans.data)
+
+
+@pytest.mark.domain
+def test_process_memmap_inputs(simulation, control, tmp_path):
+    if (
+        "dprst_flag" in control.options.keys()
+        and control.options["dprst_flag"]
+    ):
+        Groundwater = PRMSGroundwater
+    else:
+        Groundwater = PRMSGroundwaterNoDprst
+
+    output_dir = simulation["output_dir"]
+    discretization = Parameters.from_netcdf(
+        simulation["dir"] / "parameters_dis_hru.nc", encoding=False
+    )
+    parameters = PrmsParameters.from_netcdf(
+        simulation["dir"] / "parameters_PRMSGroundwater.nc"
+    )
+
+    input_variables = {}
+    for key in Groundwater.get_inputs():
+        nc_path = output_dir / f"{key}.nc"
+        if not nc_path.exists():
+            input_variables[key] = None
+            continue
+        input_variables[key] = netcdf_to_memmap(nc_path, tmp_path)[0]
+
+    gw = Groundwater(
+        control,
+        discretization,
+        parameters,
+        **input_variables,
+        budget_type="error",
+    )
+
+    answers = {}
+    for var in Groundwater.get_variables():
+        answers[var] = adapter_factory(
+            output_dir / f"{var}.nc", variable_name=var, control=control
+        )
+
+    for istep in range(control.n_times):
+        control.advance()
+        gw.advance()
+        gw.calculate(float(istep))
+        compare_in_memory(gw, answers, atol=1.0e-13, rtol=1.0e-13)
+
+    gw.finalize()
+
+
+@pytest.mark.domain
+def test_model_memmap_inputs(simulation, control, tmp_path):
+    if (
+        "dprst_flag" in control.options.keys()
+        and control.options["dprst_flag"]
+    ):
+        Groundwater = PRMSGroundwater
+    else:
+        Groundwater = PRMSGroundwaterNoDprst
+
+    for oo in ["netcdf_output_dir", "netcdf_output_var_names"]:
+        if oo in control.options.keys():
+            del control.options[oo]
+    control.options["input_dir"] = tmp_path
+    params = PrmsParameters.load(simulation["dir"] / "myparam.param")
+    for key in Groundwater.get_inputs():
+        nc_path = simulation["output_dir"] / f"{key}.nc"
+        if nc_path.exists():
+            shutil.copy(nc_path, tmp_path / nc_path.name)
+            netcdf_to_memmap(tmp_path / nc_path.name, tmp_path)
+
+    def input_adapter_types(input_memmap):
+        control_run = deepcopy(control)
+        control_run.options["input_memmap"] = input_memmap
+        model = Model([Groundwater], control=control_run, parameters=params)
+        model.advance()
+        return {
+            key: type(adapter)
+            for key, adapter in model._file_input_adapters.items()
+        }
+
+    # netcdf files unless the option is set
+    assert AdapterMemmap not in input_adapter_types(False).values()
+    assert set(input_adapter_types(True).values()) == {AdapterMemmap}
+
+    # a netcdf file newer than its store is read instead of the store
+    nc_path = tmp_path / "soil_to_gw.nc"
+    sidecar_mtime = (tmp_path / "soil_to_gw.json").stat().st_mtime
+    os.utime(nc_path, (sidecar_mtime + 10, sidecar_mtime + 10))
+    with pytest.warns(UserWarning, match="newer than the memmap store"):
+        adapter_types = input_adapter_types(True)
+    assert adapter_types["soil_to_gw"] is not AdapterMemmap
+    assert adapter_types["ssr_to_gw"] is AdapterMemmap
@@ -1,3 +1,5 @@
+import pickle
+
 import pytest
 
 from pywatershed.base import meta
@@ -32,3 +34,59 @@ def test_get_in_list():
     # assert set(gw_param_meta.keys()) == set(gw_params)
 
     return
+
+
+@pytest.mark.domainless
+def test_load_metadata_cache(tmp_path, monkeypatch):
+    cache_file = tmp_path / "__pycache__/metadata.pickle"
+    monkeypatch.setattr(meta, "cache_file", cache_file)
+
+    ans = meta.load_metadata(use_cache=False)
+    assert not cache_file.exists()
+
+    # the first load writes the cache which is used by the second
+    assert meta.load_metadata() == ans
+    assert cache_file.exists()
+    mtime = cache_file.stat().st_mtime_ns
+    assert meta.load_metadata() == ans
+    assert cache_file.stat().st_mtime_ns == mtime
+
+    # a stale cache is rewritten
+    monkeypatch.setattr(meta, "_cache_key", lambda: ("stale",))
+    assert meta.load_metadata() == ans
+    with cache_file.open("rb") as file_stream:
+        assert pickle.load(file_stream)["key"] == ("stale",)
+
+    # a failed write leaves no temporary file
+    def fail_replace(src, dst):
+        raise OSError("read-only")
+
+    monkeypatch.setattr(meta, "_cache_key", lambda: ("failed",))
+    monkeypatch.setattr(meta.os, "replace", fail_replace)
+    assert meta.load_metadata() == ans
+    assert sorted(cache_file.parent.iterdir()) == [cache_file]
+    return
+
+
+@pytest.mark.domainless
+def test_lazy_import():
+    import subprocess
+    import sys
+
+    code = (
+        "import sys; import pywatershed as pws; "
+        "assert 'numba' not in sys.modules; "
+        "assert 'pywatershed.base.meta' not in sys.modules; "
+        "assert pws.Model is pws.base.model.Model; "
+        "assert pws.meta is sys.modules['pywatershed.base.meta']"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+    # each subpackage can be the first one imported
+    for subpackage in ("base", "hydrology", "parameters", "utils"):
+        code = (
+            f"import pywatershed.{subpackage}; import pywatershed as pws; "
+            "pws.Model; pws.base.meta; pws.parameters.PrmsParameters"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
+    return
@@ -359,3 +359,111 @@ def test_separate_together_var_list(
 
             del ds
     return
+
+
+@pytest.mark.domain
+@pytest.mark.parametrize("separate", [True, False], ids=["sep", "together"])
+def test_buffered_output(simulation, control, params, tmp_path, separate):
+    # buffered (background) writes must give the same files as per-step
+    # writes. The buffer length does not divide n_time_steps so the partial
+    # final block is flushed on finalize.
+    model_procs = [
+        pywatershed.PRMSSolarGeometry,
+        pywatershed.PRMSAtmosphere,
+        pywatershed.PRMSCanopy,
+        pywatershed.PRMSChannel,
+    ]
+    if control.options["streamflow_module"] == "strmflow":
+        _ = model_procs.remove(pywatershed.PRMSChannel)
+
+    domain_output_dir = simulation["output_dir"]
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    control.options["input_dir"] = input_dir
+    control.options["netcdf_output_separate_files"] = separate
+    for ff in domain_output_dir.resolve().glob("*.nc"):
+        shutil.copy(ff, input_dir / ff.name)
+    for ff in domain_output_dir.parent.resolve().glob("*.nc"):
+        shutil.copy(ff, input_dir / ff.name)
+
+    output_dirs = {}
+    for buffer_n_times in [None, 3]:
+        output_dir = tmp_path / f"output_{buffer_n_times}"
+        output_dirs[buffer_n_times] = output_dir
+        control_run = deepcopy(control)
+        control_run.options["netcdf_output_dir"] = output_dir
+        control_run.options["netcdf_output_buffer_n_times"] = buffer_n_times
+        model = Model(model_procs, control=control_run, parameters=params)
+        model.run()
+
+    nc_files = sorted(output_dirs[None].glob("*.nc"))
+    assert len(nc_files)
+    for nc_file in nc_files:
+        ans = xr.open_dataset(nc_file, decode_timedelta=False)
+        result = xr.open_dataset(
+            output_dirs[3] / nc_file.name, decode_timedelta=False
+        )
+        xr.testing.assert_equal(ans, result)
+        del ans, result
+
+    return
+
+
+@pytest.mark.domain
+def test_model_timed(simulation, control, params, tmp_path):
+    # timed runs of the step plan must give the same output files as the
+    # default run for the full NHM, where processes use the previous values
+    # of processes after them (e.g. PRMSRunoff uses soil_rechr_prev of
+    # PRMSSoilzone)
+    if control.options.get("dprst_flag", False):
+        model_procs = [
+            pywatershed.PRMSRunoff,
+            pywatershed.PRMSSoilzone,
+            pywatershed.PRMSGroundwater,
+        ]
+    else:
+        model_procs = [
+            pywatershed.PRMSRunoffNoDprst,
+            pywatershed.PRMSSoilzoneNoDprst,
+            pywatershed.PRMSGroundwaterNoDprst,
+        ]
+    model_procs = [
+        pywatershed.PRMSSolarGeometry,
+        pywatershed.PRMSAtmosphere,
+        pywatershed.PRMSCanopy,
+        pywatershed.PRMSSnow,
+        *model_procs,
+        pywatershed.PRMSChannel,
+    ]
+    if control.options["streamflow_module"] == "strmflow":
+        _ = model_procs.remove(pywatershed.PRMSChannel)
+
+    domain_output_dir = simulation["output_dir"]
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    control.options["input_dir"] = input_dir
+    for ff in domain_output_dir.resolve().glob("*.nc"):
+        shutil.copy(ff, input_dir / ff.name)
+    for ff in domain_output_dir.parent.resolve().glob("*.nc"):
+        shutil.copy(ff, input_dir / ff.name)
+
+    output_dirs = {}
+    for timings in [False, True]:
+        output_dir = tmp_path / f"output_{timings}"
+        output_dirs[timings] = output_dir
+        control_run = deepcopy(control)
+        control_run.options["netcdf_output_dir"] = output_dir
+        model = Model(model_procs, control=control_run, parameters=params)
+        model.run(timings=timings)
+
+    nc_files = sorted(output_dirs[False].glob("*.nc"))
+    assert len(nc_files)
+    for nc_file in nc_files:
+        ans = xr.open_dataset(nc_file, decode_timedelta=False)
+        result = xr.open_dataset(
+            output_dirs[True] / nc_file.name, decode_timedelta=False
+        )
+        xr.testing.assert_equal(ans, result)
+        del ans, result
+
+    return
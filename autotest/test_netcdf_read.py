@@ -1,6 +1,8 @@
 import pytest
 
-from pywatershed.utils.netcdf_utils import NetCdfRead
+from pywatershed.base.adapter import AdapterNetcdfPrefetch, adapter_factory
+from pywatershed.base.control import Control
+from pywatershed.utils.netcdf_utils import NetCdfRead, netcdf_read_pool
 
 
 @pytest.mark.domain
@@ -22,3 +24,93 @@ def test_netcdf(simulation):
     shape = (ntimes, nhru)
     arr = nc_data.get_data(variable)
     assert arr.shape == shape, f"shape is {arr.shape} but should be {shape}"
+
+
+@pytest.mark.domain
+@pytest.mark.parametrize("load_n_time_batches", [1, 3, 7])
+def test_netcdf_prefetch(simulation, load_n_time_batches):
+    variable = "gwres_stor"
+    output_dir = simulation["output_dir"]
+    nc_pth = output_dir / f"{variable}.nc"
+
+    nc_ans = NetCdfRead(nc_pth)
+    nc_data = NetCdfRead(
+        nc_pth, load_n_time_batches=load_n_time_batches, prefetch=True
+    )
+    for idx in range(nc_ans.ntimes):
+        assert (nc_ans.advance(variable) == nc_data.advance(variable)).all()
+
+    nc_data.close()
+    nc_ans.close()
+
+
+@pytest.mark.domain
+def test_adapter_prefetch(simulation):
+    variable = "gwres_stor"
+    nc_pth = simulation["output_dir"] / f"{variable}.nc"
+    control = Control.load_prms(
+        simulation["control_file"], warn_unused_options=False
+    )
+
+    ans = adapter_factory(nc_pth, variable_name=variable, control=control)
+    result = adapter_factory(
+        nc_pth,
+        variable_name=variable,
+        control=control,
+        load_n_time_batches=5,
+        prefetch=True,
+    )
+    assert isinstance(result, AdapterNetcdfPrefetch)
+
+    for istep in range(control.n_times):
+        control.advance()
+        ans.advance()
+        result.advance()
+        assert (ans.current == result.current).all()
+
+
+@pytest.mark.domain
+def test_adapter_shared_reader(simulation):
+    variables = ["gwres_stor", "gwres_flow"]
+    nc_pths = [simulation["output_dir"] / f"{vv}.nc" for vv in variables]
+    control = Control.load_prms(
+        simulation["control_file"], warn_unused_options=False
+    )
+
+    n_pool = len(netcdf_read_pool)
+    adapters = [
+        adapter_factory(pth, variable_name=vv, control=control)
+        for pth, vv in zip(nc_pths, variables)
+    ]
+    # a second consumer of the first file shares its reader
+    adapters += [
+        adapter_factory(
+            nc_pths[0], variable_name=variables[0], control=control
+        )
+    ]
+    reader = adapters[0]._nc_read
+    assert adapters[2]._nc_read is reader
+    assert adapters[1]._nc_read is not reader
+    assert netcdf_read_pool.n_refs(reader) == 2
+    assert len(netcdf_read_pool) == n_pool + 2
+
+    answers = {vv: NetCdfRead(pth) for pth, vv in zip(nc_pths, variables)}
+    for istep in range(control.n_times):
+        control.advance()
+        for adapter in adapters:
+            adapter.advance()
+        for vv, ans in answers.items():
+            ans_vv = ans.advance(vv)
+            for adapter in adapters:
+                if adapter._variable == vv:
+                    assert (adapter.current == ans_vv).all()
+
+    adapters[2].close()
+    assert netcdf_read_pool.n_refs(reader) == 1
+    assert reader.dataset.isopen()
+    adapters[0].close()
+    adapters[0].close()
+    assert netcdf_read_pool.n_refs(reader) == 0
+    assert not reader.dataset.isopen()
+    adapters[1].close()
+    assert len(netcdf_read_pool) == n_pool
@@ -0,0 +1,112 @@
+import warnings
+
+import numba as nb
+import numpy as np
+import pytest
+from conftest import nhm_processes
+from numba.core.caching import NullCache
+
+from pywatershed import (
+    Model,
+    PRMSAtmosphere,
+    PRMSCanopy,
+    PRMSGroundwater,
+    PRMSSolarGeometry,
+    precompile,
+)
+from pywatershed.constants import numba_num_threads
+from pywatershed.utils import numba_utils
+from pywatershed.utils.numba_utils import get_num_threads, jit_kernel
+
+
+def add_one(arr):
+    return arr + 1
+
+
+def test_jit_kernel():
+    kernel = jit_kernel(add_one)
+    assert jit_kernel(add_one) is kernel
+    assert not isinstance(kernel._cache, NullCache)
+    np.testing.assert_equal(kernel(np.zeros(3)), np.ones(3))
+
+    kernel_nocache = jit_kernel(add_one, cache=False)
+    assert kernel_nocache is not kernel
+    assert isinstance(kernel_nocache._cache, NullCache)
+
+    # the parallel kernel has its own cache entries
+    kernel_parallel = jit_kernel(add_one, parallel=True)
+    assert kernel_parallel is not kernel
+    assert kernel_parallel.py_func.__qualname__ == "add_one_parallel"
+    np.testing.assert_equal(kernel_parallel(np.zeros(3)), np.ones(3))
+
+
+def float_dtypes(signature):
+    return {
+        arg.dtype
+        for arg in signature
+        if isinstance(arg, nb.types.Array)
+        and isinstance(arg.dtype, nb.types.Float)
+    }
+
+
+def test_precompile():
+    precompile([PRMSCanopy, PRMSGroundwater])
+    compiled = {
+        key[0].__qualname__: dispatcher
+        for key, dispatcher in numba_utils._kernels.items()
+    }
+    # the kernels are shared by the tests of this session, which may have
+    # compiled other signatures (e.g. float32), so only the float64
+    # signature of precompile is checked
+    for name in [
+        "PRMSCanopy._calculate_numpy",
+        "PRMSGroundwater._calculate_numpy",
+    ]:
+        assert {nb.float64} in [
+            float_dtypes(signature) for signature in compiled[name].signatures
+        ]
+
+
+def test_get_num_threads():
+    assert get_num_threads(1, "PRMSSnow") == 1
+    assert get_num_threads({"PRMSSnow": 1}, "PRMSSnow") == 1
+    # not in the dictionary: the NUMBA_NUM_THREADS environment variable
+    assert get_num_threads({"PRMSSnow": 1}, "PRMSCanopy") == (
+        numba_num_threads
+    )
+    with pytest.warns(RuntimeWarning):
+        get_num_threads(nb.config.NUMBA_NUM_THREADS + 1, "PRMSSnow")
+
+
+@pytest.mark.domain
+def test_parallel_matches_serial(load_control, params):
+    n_time_steps = 30
+    models = {}
+    for num_threads in (1, 2):
+        control = load_control(
+            n_time_steps,
+            calc_method="numba",
+            channel_routing="level",
+            numba_num_threads=num_threads,
+        )
+        processes = nhm_processes(control)
+        with warnings.catch_warnings():
+            # more threads than numba has
+            warnings.simplefilter("ignore", RuntimeWarning)
+            models[num_threads] = Model(
+                processes, control=control, parameters=params
+            )
+
+    for istep in range(n_time_steps):
+        for model in models.values():
+            model.advance()
+            model.calculate()
+
+        for name, process in models[1].processes.items():
+            if isinstance(process, (PRMSSolarGeometry, PRMSAtmosphere)):
+                # no numba kernels
+                continue
+            for var in process.get_variables():
+                np.testing.assert_array_equal(
+                    models[2].processes[name][var], process[var]
+                )
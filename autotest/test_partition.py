@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+import xarray as xr
+from conftest import nhm_processes
+
+import pywatershed as pws
+from pywatershed.base.partition import partition_hrus, subset_hrus
+
+n_time_steps = 20
+n_time_block = 7
+
+
+@pytest.fixture(scope="function", autouse=True)
+def stream_network(control):
+    if control.options["streamflow_module"] == "strmflow":
+        pytest.skip("no stream network")
+
+
+@pytest.mark.domain
+@pytest.mark.parametrize("n_partitions", [1, 3, 8])
+def test_partition_hrus(params, n_partitions):
+    nhru = params.dims["nhru"]
+    partitions = partition_hrus(params, n_partitions)
+    assert len(partitions) <= n_partitions
+    hrus = np.concatenate(partitions)
+    assert np.array_equal(np.sort(hrus), np.arange(nhru))
+
+    # the HRUs of a segment are in one partition
+    hru_segment = params.get_param_values("hru_segment")
+    for hru_inds in partitions:
+        segments = set(hru_segment[hru_inds]).difference([0])
+        others = np.setdiff1d(np.arange(nhru), hru_inds)
+        assert not segments.intersection(hru_segment[others])
+
+    # balanced up to the size of the sub-basins
+    sizes = [len(hru_inds) for hru_inds in partitions]
+    if len(partitions) == n_partitions and n_partitions > 1:
+        assert max(sizes) < 2 * nhru / n_partitions
+
+    params_part = subset_hrus(params, partitions[-1])
+    assert params_part.dims["nhru"] == len(partitions[-1])
+    assert np.array_equal(
+        params_part.coords["nhm_id"],
+        params.coords["nhm_id"][partitions[-1]],
+    )
+    np.testing.assert_equal(
+        params_part.get_param_values("tmax_cbh_adj"),
+        params.get_param_values("tmax_cbh_adj")[:, partitions[-1]],
+    )
+
+
+@pytest.mark.domain
+def test_partitioned_model(load_control, control, params, tmp_path):
+    processes = nhm_processes(control)
+    output_vars = ["seg_outflow", "sroff"]
+
+    model = pws.Model(processes, control=control, parameters=params)
+    model.run(netcdf_dir=tmp_path / "model", output_vars=output_vars)
+
+    model_part = pws.PartitionedModel(
+        processes,
+        control=load_control(),
+        parameters=params,
+        n_partitions=3,
+        n_time_block=n_time_block,
+    )
+    model_part.run(netcdf_dir=tmp_path / "part", output_vars=output_vars)
+
+    # the routing over all the partitions
+    for var in model.processes["PRMSChannel"].get_variables():
+        np.testing.assert_allclose(
+            model_part.processes["PRMSChannel"][var],
+            model.processes["PRMSChannel"][var],
+            rtol=1e-10,
+            atol=1e-12,
+            err_msg=var,
+        )
+
+    with xr.open_dataarray(tmp_path / "model" / "seg_outflow.nc") as ans:
+        with xr.open_dataarray(tmp_path / "part" / "seg_outflow.nc") as res:
+            np.testing.assert_allclose(res, ans, rtol=1e-10, atol=1e-12)
+
+    # the outputs of the partitions
+    with xr.open_dataarray(tmp_path / "model" / "sroff.nc") as ans:
+        for ipart, hru_inds in enumerate(model_part.partitions):
+            part_file = tmp_path / "part" / f"partition_{ipart}" / "sroff.nc"
+            with xr.open_dataarray(part_file) as res:
+                np.testing.assert_array_equal(res.nhm_id, ans.nhm_id[hru_inds])
+                np.testing.assert_allclose(
+                    res, ans[:, hru_inds], rtol=1e-10, atol=1e-12
+                )
+    return
+
+
+@pytest.mark.domain
+def test_partitioned_model_failure(control, params, tmp_path):
+    # the partitions do not find their input files
+    control.options["input_dir"] = tmp_path
+    model = pws.PartitionedModel(
+        nhm_processes(control),
+        control=control,
+        parameters=params,
+        n_partitions=2,
+    )
+    with pytest.raises(RuntimeError, match="partitions failed"):
+        model.run()
@@ -83,3 +83,32 @@ def test_multiple_csv_to_netcdf(simulation, tmp_path):
     csv.to_netcdf(nc_file)
     compare_netcdf(csv, nc_file)
     return
+
+
+@pytest.mark.domain
+def test_csv_variable_data(simulation):
+    paths = [simulation["output_dir"] / f"{var}.csv" for var in csv_test_vars]
+    csv = CsvFile(max_workers=1)
+    csv_threads = CsvFile(max_workers=len(paths))
+    for path in paths:
+        csv.add_path(path)
+        csv_threads.add_path(path)
+
+    df = pd.read_csv(paths[0], skipinitialspace=True)
+    assert csv.dates.dtype == np.dtype("datetime64[ns]")
+    np.testing.assert_array_equal(csv.dates, pd.to_datetime(df["Date"]).values)
+    np.testing.assert_array_equal(
+        csv.data["date"].astype("datetime64[ns]"), csv.dates
+    )
+
+    for variable in csv_test_vars:
+        values = csv.get_variable_data(variable)
+        assert values.shape == (len(csv.dates), len(csv.nhm_id))
+        for idx, hru in enumerate(csv.nhm_id):
+            np.testing.assert_array_equal(
+                values[:, idx], csv.data[f"{variable}_{hru}"]
+            )
+        np.testing.assert_array_equal(
+            values, csv_threads.get_variable_data(variable)
+        )
+    return
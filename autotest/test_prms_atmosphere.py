@@ -2,6 +2,7 @@ from warnings import warn
 
 import numpy as np
 import pytest
+import xarray as xr
 from utils_compare import compare_in_memory, compare_netcdfs
 
 from pywatershed.atmosphere.prms_atmosphere import PRMSAtmosphere
@@ -155,3 +156,54 @@ def test_compare_prms(
         )
 
     return
+
+
+@pytest.mark.domain
+@pytest.mark.parametrize("n_time_chunk", [100, 366])
+def test_n_time_chunk(
+    simulation, control, discretization, n_time_chunk, tmp_path
+):
+    parameters = PrmsParameters.from_netcdf(
+        simulation["dir"] / "parameters_PRMSAtmosphere.nc"
+    )
+    input_variables = {}
+    for key in PRMSAtmosphere.get_inputs():
+        if "soltab" in key:
+            input_variables[key] = simulation["output_dir"] / f"{key}.nc"
+        else:
+            input_variables[key] = simulation["dir"] / f"{key}.nc"
+
+    atms = {}
+    for chunk in [None, n_time_chunk]:
+        atms[chunk] = PRMSAtmosphere(
+            control=control,
+            discretization=discretization,
+            parameters=parameters,
+            **input_variables,
+            n_time_chunk=chunk,
+        )
+        (tmp_path / str(chunk)).mkdir()
+        atms[chunk].initialize_netcdf(output_dir=tmp_path / str(chunk))
+
+    assert atms[n_time_chunk].tmaxf.data.shape[0] == n_time_chunk
+    for istep in range(control.n_times):
+        control.advance()
+        for atm in atms.values():
+            atm.advance()
+            atm.calculate(1.0)
+            atm.output()
+
+        for var in PRMSAtmosphere.get_variables():
+            np.testing.assert_equal(
+                atms[None][var].current, atms[n_time_chunk][var].current
+            )
+        for var in PRMSAtmosphere.get_inputs():
+            np.testing.assert_equal(atms[None][var], atms[n_time_chunk][var])
+
+    for atm in atms.values():
+        atm.finalize()
+
+    for var in PRMSAtmosphere.get_variables():
+        ans = xr.open_dataarray(tmp_path / "None" / f"{var}.nc")
+        result = xr.open_dataarray(tmp_path / str(n_time_chunk) / f"{var}.nc")
+        xr.testing.assert_equal(ans, result)
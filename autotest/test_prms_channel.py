@@ -1,11 +1,13 @@
 import pathlib as pl
 
+import numpy as np
 import pytest
 from utils_compare import compare_in_memory, compare_netcdfs
 
 from pywatershed.base.adapter import adapter_factory
 from pywatershed.base.control import Control
 from pywatershed.base.parameters import Parameters
+from pywatershed.hydrology import prms_channel
 from pywatershed.hydrology.prms_channel import PRMSChannel, has_prmschannel_f
 from pywatershed.parameters import PrmsParameters
 
@@ -118,3 +120,94 @@ def test_compare_prms(
         )
 
     return
+
+
+@pytest.mark.domain
+@pytest.mark.parametrize("calc_method", ("numpy", "numba"))
+def test_channel_routing_levels(
+    simulation, control, discretization, parameters, calc_method, monkeypatch
+):
+    if calc_method == "numba":
+        # route levels of at least 8 segments in parallel, the rest serially
+        control.options["numba_num_threads"] = 2
+        monkeypatch.setattr(prms_channel, "level_parallel_min_segments", 8)
+
+    output_dir = simulation["output_dir"]
+    input_variables = {}
+    for key in PRMSChannel.get_inputs():
+        input_variables[key] = output_dir / f"{key}.nc"
+
+    channels = {}
+    for routing in ("serial", "level"):
+        channels[routing] = PRMSChannel(
+            control,
+            discretization,
+            parameters,
+            **input_variables,
+            budget_type="error",
+            calc_method=calc_method,
+            channel_routing=routing,
+        )
+
+    # every segment is in exactly one level, after its upstream segments
+    level = channels["level"]
+    assert (np.sort(level._level_segs) == np.arange(level.nsegment)).all()
+    seg_level = np.zeros(level.nsegment, dtype=int)
+    for ilev in range(len(level._level_ptr) - 1):
+        seg_level[
+            level._level_segs[
+                level._level_ptr[ilev] : level._level_ptr[ilev + 1]
+            ]
+        ] = ilev
+    has_down = level._tosegment >= 0
+    assert (seg_level[has_down] < seg_level[level._tosegment[has_down]]).all()
+
+    n_steps = 60
+    for istep in range(n_steps):
+        control.advance()
+        for channel in channels.values():
+            channel.advance()
+            channel.calculate(float(istep))
+
+        for var in PRMSChannel.get_variables():
+            np.testing.assert_equal(
+                channels["level"][var], channels["serial"][var]
+            )
+
+    return
+
+
+def test_lateral_inflow():
+    # the numpy operator and the loop (numba) kernel agree, and the fluxes
+    # of HRUs not routed to a segment are discarded
+    rng = np.random.default_rng(0)
+    nhru = 50
+    nseg = 7
+    hru_segment = rng.integers(-1, nseg, nhru)
+    hru_routed = np.where(hru_segment >= 0)[0].astype("int64")
+    hru_routed_segment = hru_segment[hru_routed].astype("int64")
+    vols = [rng.random(nhru) for ii in range(3)]
+    s_per_time = 86400.0
+
+    results = []
+    for kernel in [
+        PRMSChannel._lateral_inflow_numpy,
+        PRMSChannel._lateral_inflow_loop,
+    ]:
+        outs = [np.ones(nhru) for ii in range(3)] + [np.ones(nseg)]
+        kernel(hru_routed, hru_routed_segment, *vols, s_per_time, *outs)
+        results += [outs]
+
+    for res, ans in zip(results[0], results[1]):
+        np.testing.assert_equal(res, ans)
+
+    unrouted = hru_segment < 0
+    for ii in range(3):
+        assert (results[0][ii][unrouted] == 0.0).all()
+        np.testing.assert_equal(results[0][ii][~unrouted], vols[ii][~unrouted])
+
+    lateral = sum(vols) / s_per_time
+    ans = np.zeros(nseg)
+    for iseg in range(nseg):
+        ans[iseg] = lateral[hru_segment == iseg].sum()
+    np.testing.assert_allclose(results[0][3], ans, rtol=1.0e-14)
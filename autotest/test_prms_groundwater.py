@@ -1,6 +1,8 @@
 import pathlib as pl
 
+import numpy as np
 import pytest
+from numba.core.caching import NullCache
 from utils_compare import compare_in_memory, compare_netcdfs
 
 from pywatershed import Control, Parameters, PRMSGroundwater
@@ -131,3 +133,57 @@ def test_compare_prms(
         )
 
     return
+
+
+@pytest.mark.domain
+@pytest.mark.parametrize("calc_method", calc_methods)
+@pytest.mark.parametrize("budget_type", (None, "error"))
+def test_run_block(
+    simulation,
+    control,
+    discretization,
+    parameters,
+    Groundwater,
+    calc_method,
+    budget_type,
+):
+    # the block kernel is used without a budget, else steps are run
+    if not has_prmsgroundwater_f and calc_method == "fortran":
+        pytest.skip("PRMSGroundwater fortran code not available")
+
+    output_dir = simulation["output_dir"]
+    input_variables = {}
+    for key in Groundwater.get_inputs():
+        nc_path = output_dir / f"{key}.nc"
+        if not nc_path.exists():
+            nc_path = None
+        input_variables[key] = nc_path
+
+    gw = Groundwater(
+        control,
+        discretization,
+        parameters,
+        **input_variables,
+        budget_type=budget_type,
+        calc_method=calc_method,
+    )
+
+    # two blocks, the second starting where the first ended
+    n_first = 100
+    blocks = [gw.run_block(n_first), gw.run_block(control.n_times - n_first)]
+    assert control.itime_step == control.n_times - 1
+
+    for var in Groundwater.get_variables():
+        result = np.concatenate([block[var] for block in blocks])
+        answer = adapter_factory(
+            output_dir / f"{var}.nc", variable_name=var, control=control
+        ).data
+        np.testing.assert_allclose(result, answer, atol=atol, rtol=rtol)
+        # the state after the blocks
+        np.testing.assert_equal(gw[var], result[-1])
+
+    if calc_method == "numba" and budget_type is None:
+        # the block kernel does not take the step kernel as an argument
+        assert not isinstance(gw._calculate_gw_block._cache, NullCache)
+
+    return
@@ -126,9 +126,9 @@ def test_parameter_canopy_subset(simulation):
 
     for key in canopy_params:
         if key != "unknown":
-            assert (
-                canopy_subset.parameters[key] is not None
-            ), f"'{key}' parameter should not be None"
+            assert canopy_subset.parameters[key] is not None, (
+                f"'{key}' parameter should not be None"
+            )
 
     print(f"success parsing...'{parameter_file}'")
 
@@ -143,9 +143,9 @@ def test_parameter_access(simulation):
 
     parameters = PrmsParameters.load(parameter_file)
 
-    assert (
-        parameters.parameters["srain_intcp"] is not None
-    ), "'srain_intcp' should not return None"
+    assert parameters.parameters["srain_intcp"] is not None, (
+        "'srain_intcp' should not return None"
+    )
 
     with pytest.raises(KeyError):
         _ = parameters.parameters["unknown"]
@@ -178,3 +178,120 @@ def test_parameter_json(simulation, tmp_path):
             dict(parameters.data[kk]), dict(params_from_json.data[kk])
         )
     return
+
+
+@pytest.mark.domain
+def test_parameter_cache(simulation, tmp_path, monkeypatch):
+    ctl = Control.load_prms(
+        simulation["control_file"], warn_unused_options=False
+    )
+    parameter_file = simulation["dir"] / ctl.options["parameter_file"]
+    parameters = PrmsParameters.load(parameter_file)
+
+    cache_dir = tmp_path / "cache"
+    params_parsed = PrmsParameters.load(parameter_file, cache_dir=cache_dir)
+    cache_files = list(cache_dir.glob("parameters_*.npz"))
+    assert len(cache_files) == 1
+
+    # the cached parameters are loaded without parsing the file
+    from pywatershed.utils.prms5_file_util import PrmsFile
+
+    def no_parse(self):
+        raise AssertionError("the parameter file was parsed")
+
+    with monkeypatch.context() as mp:
+        mp.setattr(PrmsFile, "get_data", no_parse)
+        params_cached = PrmsParameters.load(
+            parameter_file, cache_dir=cache_dir
+        )
+
+    for params in [params_parsed, params_cached]:
+        assert parameters.data.keys() == params.data.keys()
+        assert parameters.dims == params.dims
+        for kk in ["coords", "data_vars"]:
+            assert parameters.data[kk].keys() == params.data[kk].keys()
+            for name, values in parameters.data[kk].items():
+                assert values.dtype == params.data[kk][name].dtype, name
+                np.testing.assert_equal(values, params.data[kk][name])
+
+    # invalid caches are reparsed
+    cache_files[0].write_text("not a cache")
+    with pytest.warns(UserWarning, match="invalid parameter cache"):
+        params = PrmsParameters.load(parameter_file, cache_dir=cache_dir)
+    assert params.dims == parameters.dims
+    return
+
+
+def test_parameter_parse(tmp_path):
+    parameter_file = tmp_path / "test.param"
+    parameter_file.write_text(
+        "\n".join(
+            [
+                "Written by test",
+                "** Dimensions **",
+                "####",
+                "nhru",
+                "3",
+                "####",
+                "nmonth",
+                "12",
+                "####",
+                "npoigages",
+                "3",
+                "** Parameters **",
+                "####",
+                "hru_area 1 nhru",
+                "1",
+                "nhru",
+                "3",
+                "2",
+                "1.5",
+                "2.25  ",
+                "3e2",
+                "####",
+                "hru_type",
+                "1",
+                "nhru",
+                "3",
+                "1",
+                "1 land",
+                "0 inactive",
+                "2",
+                "####",
+                "tmax_cbh_adj",
+                "2",
+                "nhru",
+                "nmonth",
+                "36",
+                "2",
+                *[str(vv) for vv in range(36)],
+                "####",
+                "poi_gage_id",
+                "1",
+                "npoigages",
+                "3",
+                "4",
+                "01",
+                "02",
+                "03",
+            ]
+        )
+        + "\n"
+    )
+    params = PrmsParameters.load(parameter_file)
+    assert params.dims["nhru"] == 3
+    values = params.parameters
+    np.testing.assert_equal(values["hru_area"], [1.5, 2.25, 300.0])
+    assert values["hru_area"].dtype == np.float64
+    np.testing.assert_equal(values["hru_type"], [1, 0, 2])
+    assert values["hru_type"].dtype == int
+    np.testing.assert_equal(
+        values["tmax_cbh_adj"], np.arange(36).reshape(12, 3)
+    )
+    assert list(values["poi_gage_id"]) == ["01", "02", "03"]
+    assert values["poi_gage_id"].dtype == object
+
+    parameter_file.write_text(parameter_file.read_text().replace("1.5\n", ""))
+    with pytest.raises(ValueError):
+        PrmsParameters.load(parameter_file)
+    return
@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 from utils_compare import compare_in_memory, compare_netcdfs
 
@@ -100,3 +101,36 @@ def test_compare_prms(
         )
 
     return
+
+
+@pytest.mark.domain
+def test_soltab_cache(simulation, control, discretization, tmp_path):
+    parameters = PrmsParameters.from_netcdf(
+        simulation["dir"] / "parameters_PRMSSolarGeometry.nc"
+    )
+    cache_dir = tmp_path / "soltab_cache"
+
+    answers = {}
+    for ii in range(3):
+        solar_geom = PRMSSolarGeometry(
+            control,
+            discretization=discretization,
+            parameters=parameters,
+            soltab_cache_dir=cache_dir,
+        )
+        if ii < 2:
+            solar_geom._calculate_all_time()
+        else:
+            with pytest.warns(UserWarning, match="invalid soltab cache"):
+                solar_geom._calculate_all_time()
+        cache_files = list(cache_dir.glob("soltab_*.npz"))
+        assert len(cache_files) == 1
+        for var in PRMSSolarGeometry.get_variables():
+            if ii == 0:
+                answers[var] = solar_geom[var].data.copy()
+            else:
+                np.testing.assert_equal(solar_geom[var].data, answers[var])
+
+        if ii == 1:
+            # an invalid cache file is recomputed and replaced
+            cache_files[0].write_bytes(b"not a cache")
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+import pywatershed as pws
+from pywatershed.base.spin_up import spin_up_cache_key
+from pywatershed.parameters import PrmsParameters
+
+n_time_steps = 20
+n_spin_up = 10
+processes = [
+    pws.PRMSSolarGeometry,
+    pws.PRMSAtmosphere,
+    pws.PRMSCanopy,
+    pws.PRMSSnow,
+]
+
+
+def spin_up_end_time(control):
+    return control.start_time + (n_spin_up - 1) * control.time_step
+
+
+@pytest.mark.domain
+def test_spin_up_cache(load_control, params, tmp_path, monkeypatch):
+    n_calculate = [0]
+    calculate = pws.Model.calculate
+
+    def count_calculate(self, *args, **kwargs):
+        n_calculate[0] += 1
+        return calculate(self, *args, **kwargs)
+
+    monkeypatch.setattr(pws.Model, "calculate", count_calculate)
+
+    cache = pws.SpinUpCache(tmp_path / "cache", max_entries=1)
+    control = load_control()
+    end_time = spin_up_end_time(control)
+    checkpoint_file = cache.spin_up(
+        end_time, processes, control=control, parameters=params
+    )
+    assert n_calculate[0] == n_spin_up
+    assert checkpoint_file.exists()
+
+    # the same spin-up is not run again
+    cached_file = cache.spin_up(
+        end_time,
+        processes,
+        control=load_control(),
+        parameters=params,
+    )
+    assert cached_file == checkpoint_file
+    assert n_calculate[0] == n_spin_up
+
+    # the evaluation period output is not part of the key
+    control = load_control()
+    control.options["netcdf_output_dir"] = tmp_path / "output"
+    model = pws.Model(processes, control=control, parameters=params)
+    control = load_control()
+    assert cache.key(model, end_time) == cache.key(
+        pws.Model(processes, control=control, parameters=params), end_time
+    )
+    assert cache.key(model, end_time) != cache.key(
+        model, end_time - control.time_step
+    )
+
+    # other parameters are another spin-up, evicting the least recently used
+    params_dd = params.to_dd()
+    params_dd.data_vars["snarea_thresh"] = (
+        params_dd.data_vars["snarea_thresh"] * 1.1
+    )
+    other_params = PrmsParameters.from_dict(params_dd.data)
+    other_file = cache.spin_up(
+        end_time,
+        processes,
+        control=load_control(),
+        parameters=other_params,
+    )
+    assert other_file != checkpoint_file
+    assert n_calculate[0] == 2 * n_spin_up
+    assert list((tmp_path / "cache").glob("*.npz")) == [other_file]
+
+    # the evaluation continues the spin-up
+    model = pws.Model(
+        processes, control=load_control(), parameters=other_params
+    )
+    model.run(n_time_steps=n_time_steps)
+    evaluation = pws.Model.from_checkpoint(
+        other_file,
+        processes,
+        control=load_control(),
+        parameters=other_params,
+    )
+    evaluation.run()
+    for proc_name, proc in model.processes.items():
+        for var in proc.get_variables():
+            values = proc[var]
+            np.testing.assert_array_equal(
+                getattr(evaluation.processes[proc_name][var], "current", 0),
+                getattr(values, "current", 0),
+                err_msg=var,
+            )
+            if isinstance(values, np.ndarray):
+                np.testing.assert_array_equal(
+                    evaluation.processes[proc_name][var], values, err_msg=var
+                )
+    return
+
+
+@pytest.mark.domain
+def test_spin_up_cache_key_files(load_control, params):
+    control = load_control()
+    model = pws.Model(processes, control=control, parameters=params)
+    end_time = spin_up_end_time(control)
+    signatures = {"prcp": "a", "tmax": "b", "tmin": "c"}
+    key = spin_up_cache_key(model, end_time, signatures)
+    assert key == spin_up_cache_key(model, end_time, dict(signatures))
+    assert key != spin_up_cache_key(
+        model, end_time, {**signatures, "tmin": "d"}
+    )
+    return
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pywatershed as pws
+from pywatershed.base.adapter import AdapterNdarray
+
+n_time_steps = 10
+processes = [
+    pws.PRMSSolarGeometry,
+    pws.PRMSAtmosphere,
+    pws.PRMSCanopy,
+    pws.PRMSSnow,
+]
+
+
+@pytest.mark.domain
+def test_model_timings(load_control, params, tmp_path):
+    model = pws.Model(
+        processes, control=load_control(budget_type="warn"), parameters=params
+    )
+    model.run()
+    assert model.timings is None
+
+    timed = pws.Model(
+        processes, control=load_control(budget_type="warn"), parameters=params
+    )
+    trace_file = tmp_path / "trace.csv"
+    timed.run(
+        netcdf_dir=tmp_path / "output",
+        output_vars=["net_ppt", "snowmelt"],
+        trace_file=trace_file,
+    )
+
+    timings = timed.timings
+    assert timings.index.names == ["process", "phase"]
+    assert (timings["seconds"] >= 0).all()
+    for proc in processes:
+        name = proc.__name__
+        assert timings.loc[(name, "init"), "calls"] == 1
+        phases = timings.loc[name].index
+        assert "calculate" in phases
+        if name != "PRMSSolarGeometry":
+            assert timings.loc[(name, "calculate"), "calls"] == n_time_steps
+    assert timings.loc[("control", "advance"), "calls"] == n_time_steps
+    assert ("PRMSCanopy", "budget") in timings.index
+    assert ("PRMSCanopy", "output") in timings.index
+    assert timings.loc[("PRMSCanopy", "budget"), "calls"] == n_time_steps
+    # the inputs from other processes are not read
+    phases = timings.loc["PRMSCanopy"].index
+    assert not any(phase.startswith("read") for phase in phases)
+    assert ("PRMSAtmosphere", "advance_inputs") in timings.index
+    if ("PRMSSnow", "jit_compile") in timings.index:
+        assert timings.loc[("PRMSSnow", "jit_compile"), "seconds"] > 0
+
+    trace = pd.read_csv(trace_file, index_col="time")
+    assert trace.shape[0] == n_time_steps
+    assert "PRMSCanopy/calculate" in trace.columns
+    assert "PRMSCanopy/budget" in trace.columns
+    assert (trace.values >= 0).all()
+
+    # timing does not change the results
+    for proc_name, proc in model.processes.items():
+        for var in proc.get_variables():
+            values = proc[var]
+            np.testing.assert_array_equal(
+                getattr(timed.processes[proc_name][var], "current", 0),
+                getattr(values, "current", 0),
+                err_msg=var,
+            )
+            if isinstance(values, np.ndarray):
+                np.testing.assert_array_equal(
+                    timed.processes[proc_name][var], values, err_msg=var
+                )
+    return
+
+
+@pytest.mark.domain
+def test_model_timings_reads(load_control, params):
+    # the inputs of a process alone are read from its input adapters
+    control = load_control(budget_type="warn")
+    model = pws.Model(
+        [pws.PRMSCanopy],
+        control=control,
+        parameters=params,
+        find_input_files=False,
+    )
+    canopy = model.processes["PRMSCanopy"]
+    time = control.start_time + np.arange(n_time_steps) * control.time_step
+    model._set_file_input_adapters(
+        {
+            input: AdapterNdarray(
+                np.zeros((n_time_steps, *canopy[input].shape)),
+                input,
+                time,
+                control,
+            )
+            for input in pws.PRMSCanopy.get_inputs()
+        }
+    )
+    model.run(timings=True)
+    for input in pws.PRMSCanopy.get_inputs():
+        label = ("PRMSCanopy", f"read {input}")
+        assert model.timings.loc[label, "calls"] == n_time_steps
+    return
@@ -1,30 +1,124 @@
-from .analysis.model_graph import ModelGraph
-from .analysis.utils.colorbrewer import ColorBrewer
-from .atmosphere.prms_atmosphere import PRMSAtmosphere
-from .atmosphere.prms_solar_geometry import PRMSSolarGeometry
-from .base import meta
-from .base.adapter import Adapter, AdapterNetcdf, adapter_factory
-from .base.budget import Budget
-from .base.control import Control
-from .base.model import Model
-from .base.parameters import Parameters
-from .base.process import Process
-from .base.timeseries import TimeseriesArray
-from .hydrology.prms_canopy import PRMSCanopy
-from .hydrology.prms_channel import PRMSChannel
-from .hydrology.prms_et import PRMSEt
-from .hydrology.prms_groundwater import PRMSGroundwater
-from .hydrology.prms_groundwater_no_dprst import PRMSGroundwaterNoDprst
-from .hydrology.prms_runoff import PRMSRunoff
-from .hydrology.prms_runoff_no_dprst import PRMSRunoffNoDprst
-from .hydrology.prms_snow import PRMSSnow
-from .hydrology.prms_soilzone import PRMSSoilzone
-from .hydrology.prms_soilzone_no_dprst import PRMSSoilzoneNoDprst
-from .hydrology.starfit import Starfit
-from .utils import ControlVariables, NetCdfRead, NetCdfWrite, Soltab
-from .utils.csv_utils import CsvFile
+"""pywatershed: A hydrologic model framework.
+
+The public names of the package are imported on first access (PEP 562) so
+that ``import pywatershed`` does not import numba, xarray, the analysis
+code, or the metadata until they are needed.
+"""
+
+import importlib
+from typing import TYPE_CHECKING
+
 from .version import __version__
 
+# public name: the module it is imported from on first access
+_lazy_imports = {
+    "ModelGraph": ".analysis.model_graph",
+    "ColorBrewer": ".analysis.utils.colorbrewer",
+    "PRMSAtmosphere": ".atmosphere.prms_atmosphere",
+    "PRMSSolarGeometry": ".atmosphere.prms_solar_geometry",
+    "meta": ".base.meta",
+    "Adapter": ".base.adapter",
+    "AdapterMemmap": ".base.adapter",
+    "AdapterNetcdf": ".base.adapter",
+    "AdapterNetcdfPrefetch": ".base.adapter",
+    "adapter_factory": ".base.adapter",
+    "Budget": ".base.budget",
+    "Control": ".base.control",
+    "EnsembleModel": ".base.ensemble_model",
+    "run_ensemble": ".base.ensemble",
+    "Model": ".base.model",
+    "PartitionedModel": ".base.partition",
+    "Parameters": ".base.parameters",
+    "Process": ".base.process",
+    "SpinUpCache": ".base.spin_up",
+    "TimeseriesArray": ".base.timeseries",
+    "PRMSCanopy": ".hydrology.prms_canopy",
+    "PRMSChannel": ".hydrology.prms_channel",
+    "PRMSEt": ".hydrology.prms_et",
+    "PRMSGroundwater": ".hydrology.prms_groundwater",
+    "PRMSGroundwaterNoDprst": ".hydrology.prms_groundwater_no_dprst",
+    "PRMSRunoff": ".hydrology.prms_runoff",
+    "PRMSRunoffNoDprst": ".hydrology.prms_runoff_no_dprst",
+    "PRMSSnow": ".hydrology.prms_snow",
+    "PRMSSoilzone": ".hydrology.prms_soilzone",
+    "PRMSSoilzoneNoDprst": ".hydrology.prms_soilzone_no_dprst",
+    "Starfit": ".hydrology.starfit",
+    "ControlVariables": ".utils",
+    "NetCdfRead": ".utils",
+    "NetCdfWrite": ".utils",
+    "Soltab": ".utils",
+    "CsvFile": ".utils.csv_utils",
+    "precompile": ".utils.numba_utils",
+}
+
+_submodules = (
+    "analysis",
+    "atmosphere",
+    "base",
+    "constants",
+    "hydrology",
+    "parameters",
+    "utils",
+)
+
+
+def __getattr__(name: str):
+    if name in _lazy_imports.keys():
+        module = importlib.import_module(_lazy_imports[name], __name__)
+        if name == module.__name__.rsplit(".", 1)[-1]:
+            value = module
+        else:
+            value = getattr(module, name)
+    elif name in _submodules:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals().keys()) | set(__all__) | set(_submodules))
+
+
+if TYPE_CHECKING:
+    from .analysis.model_graph import ModelGraph
+    from .analysis.utils.colorbrewer import ColorBrewer
+    from .atmosphere.prms_atmosphere import PRMSAtmosphere
+    from .atmosphere.prms_solar_geometry import PRMSSolarGeometry
+    from .base import meta
+    from .base.adapter import (
+        Adapter,
+        AdapterMemmap,
+        AdapterNetcdf,
+        AdapterNetcdfPrefetch,
+        adapter_factory,
+    )
+    from .base.budget import Budget
+    from .base.control import Control
+    from .base.ensemble import run_ensemble
+    from .base.ensemble_model import EnsembleModel
+    from .base.model import Model
+    from .base.parameters import Parameters
+    from .base.partition import PartitionedModel
+    from .base.process import Process
+    from .base.spin_up import SpinUpCache
+    from .base.timeseries import TimeseriesArray
+    from .hydrology.prms_canopy import PRMSCanopy
+    from .hydrology.prms_channel import PRMSChannel
+    from .hydrology.prms_et import PRMSEt
+    from .hydrology.prms_groundwater import PRMSGroundwater
+    from .hydrology.prms_groundwater_no_dprst import PRMSGroundwaterNoDprst
+    from .hydrology.prms_runoff import PRMSRunoff
+    from .hydrology.prms_runoff_no_dprst import PRMSRunoffNoDprst
+    from .hydrology.prms_snow import PRMSSnow
+    from .hydrology.prms_soilzone import PRMSSoilzone
+    from .hydrology.prms_soilzone_no_dprst import PRMSSoilzoneNoDprst
+    from .hydrology.starfit import Starfit
+    from .utils import ControlVariables, NetCdfRead, NetCdfWrite, Soltab
+    from .utils.csv_utils import CsvFile
+    from .utils.numba_utils import precompile
+
 __all__ = (
     "ModelGraph",
     "ColorBrewer",
@@ -32,13 +126,19 @@ __all__ = (
     "PRMSSolarGeometry",
     "meta",
     "Adapter",
+    "AdapterMemmap",
     "AdapterNetcdf",
+    "AdapterNetcdfPrefetch",
     "adapter_factory",
     "Budget",
     "Control",
+    "EnsembleModel",
     "Model",
+    "PartitionedModel",
+    "run_ensemble",
     "Parameters",
     "Process",
+    "SpinUpCache",
     "TimeseriesArray",
     "PRMSCanopy",
     "PRMSChannel",
@@ -56,5 +156,6 @@ __all__ = (
     "NetCdfWrite",
     "Soltab",
     "CsvFile",
+    "precompile",
     "__version__",
 )
@@ -8,6 +8,7 @@ from pywatershed.utils.netcdf_utils import NetCdfWrite
 
 from ..base.adapter import adaptable
 from ..base.control import Control
+from ..base.timeseries import TimeseriesArray
 from ..constants import inch2cm, nan, nearzero, one, zero
 from ..parameters import Parameters
 from ..utils.time_utils import datetime_day_of_month, datetime_month
@@ -49,25 +50,32 @@ class PRMSAtmosphere(Process):
     evapotranspiration (Jensen and Haise ,1963) and a temperature based
     transpiration flag (transp_on) are also calculated.
 
-    Note that all variables are calculated for all time upon the first advance
-    and that all calculated variables are written to NetCDF (when netcdf output
-    is requested) the first time output is requested. This is effectively a
-    complete preprocessing of the input CBH files to the fields the model
-    actually uses on initialization. For an example of preprocessing the
-    variables in PRMSAtmosphere, see
+    Note that, by default, all variables are calculated for all time upon the
+    first advance and that all calculated variables are written to NetCDF
+    (when netcdf output is requested) the first time output is requested.
+    This is effectively a complete preprocessing of the input CBH files to
+    the fields the model actually uses on initialization. For an example of
+    preprocessing the variables in PRMSAtmosphere, see
     `this notebook <https://github.com/EC-USGS/pywatershed/tree/main/examples/04_preprocess_atm.ipynb>`_.
 
-    The full time version of a variable is given by the "private" version of
-    the variable which is named with a single-leading underscore (eg tmaxf for
-    all time is _tmaxf).
+    The full time version of a variable is given by the data attribute of the
+    variable (eg tmaxf for all time is tmaxf.data).
 
     This full-time initialization may not be tractable for large domains and/or
-    long periods of time and require changes to batch the processing of the
-    variables. The benefits of full-time initialization are 1) the code is
-    vectorized and fast for such a large calculation, 2) the initialization of
-    this class effectively preprocess all the inputs to the rest of the model
-    and can then be skipped in subsequent model calls (unless the parameters
-    are changing).
+    long periods of time. The benefits of full-time initialization are 1) the
+    code is vectorized and fast for such a large calculation, 2) the
+    initialization of this class effectively preprocess all the inputs to the
+    rest of the model and can then be skipped in subsequent model calls
+    (unless the parameters are changing).
+
+    Alternatively, the n_time_chunk argument (or control option) streams the
+    calculation in chunks of time: the inputs are read and the variables are
+    calculated, with the same vectorized code, for n_time_chunk times at a
+    time as the model advances (e.g. 366 for about a year at a time). The
+    data attribute of a variable then holds the current chunk of time and
+    NetCDF output is written a chunk at a time, so memory use is bounded by
+    the chunk size and not the length of the simulation. In this case,
+    initialize_netcdf must be called before the first advance.
 
     Args:
         control: a Control object
@@ -81,6 +89,8 @@ class PRMSAtmosphere(Process):
         soltab_horad_potsw: the solar table of potential shortwave
             radiation on a horizontal plane
 
+        n_time_chunk: the number of times to calculate at once, None or a
+            value less than 1 calculates all times at once (default).
         verbose: Print extra information or not?
 
     """
@@ -95,19 +105,27 @@ class PRMSAtmosphere(Process):
         tmin: [str, pl.Path],
         soltab_potsw: adaptable,
         soltab_horad_potsw: adaptable,
+        n_time_chunk: int = None,
         verbose: bool = False,
     ):
-        # Defering handling batch handling of time chunks but self.n_time_chunk
-        # is a dimension used in the metadata/variables dimensions.
-        # TODO: make time chunking options work (esp with output)
-        # if n_time_chunk <= 0:
-        #     self.n_time_chunk = control.n_times
-        # else:
-        #     self.n_time_chunk = n_time_chunk
-
         # Initialize full time with nans
         self._time = np.full(control.n_times, nan, dtype="datetime64[s]")
 
+        # The length of the chunks of time is needed to initialize the
+        # variables, the option is also set on self by _set_options.
+        if n_time_chunk is None and "n_time_chunk" in control.options.keys():
+            n_time_chunk = control.options["n_time_chunk"]
+        if n_time_chunk is None or n_time_chunk <= 0:
+            n_time_chunk = control.n_times
+        self._time_chunk_len = min(n_time_chunk, control.n_times)
+        # the current chunk of time steps [start, end)
+        self._chunk_start = 0
+        self._chunk_end = 0
+        # the transpiration switches continued between chunks of time
+        self._transp_check = None
+        self._tmax_sum = None
+        self._transp_on_prev = None
+
         metadata_patches = {
             kk: {"dims": ("ntime", "nhru")} for kk in self.variables
         }
@@ -124,21 +142,32 @@ class PRMSAtmosphere(Process):
         self._set_inputs(locals())
         self._set_options(locals())
 
-        self._calculated = False
         self._netcdf_initialized = False
+        self._netcdf_writers = None
 
         return
 
-    def _calculate_all_time(self):
-        if self._calculated:
-            return
+    def _initialize_var(self, var_name: str, flt_to_dbl: bool = True):
+        # The (time, space) variables hold a chunk of time
+        init_vals = self.get_init_values()
+        self[var_name] = TimeseriesArray(
+            var_name=var_name,
+            control=self.control,
+            array=np.full(
+                (self._time_chunk_len, self.nhru),
+                init_vals[var_name],
+                dtype=self._precision_type(
+                    self.meta[var_name]["type"],
+                    self.meta[var_name].get("precision", None),
+                ),
+            ),
+            time=self._time[: self._time_chunk_len],
+        )
+        return
 
-        # Eventually refactor to work at specific chunks of time
-        for input in ["prcp", "tmax", "tmin"]:
-            # # this is a bit of a mess: ._dataset.dataset
-            input_time = self._input_variables_dict[input]._nc_read.times
-            # dont do this...
-            # self[input][:] = ds.dataset[input][:].data
+    def _set_time(self):
+        for input in self._chunk_input_names:
+            input_time = self._input_variables_dict[input].time
             if np.isnan(self._time[0]):
                 self._time[:] = input_time
             else:
@@ -149,12 +178,39 @@ class PRMSAtmosphere(Process):
             msg = "Control start_time is not in the input data time"
             raise ValueError(msg)
         self._init_time_ind = start_time_ind[0]
+        return
 
-        # Solve all variables for all time
-        self._month_ind_12 = datetime_month(self._time) - 1  # (time)
-        self._month_ind_1 = np.zeros(self._time.shape, dtype=int)  # (time)
-        self._month = datetime_month(self._time)  # (time)
-        self._dom = datetime_day_of_month(self._time)  # (time)
+    def _get_input_chunk(self, input: str) -> np.ndarray:
+        adapter = self._input_variables_dict[input]
+        if hasattr(adapter, "get_time_window"):
+            return adapter.get_time_window(self._chunk_start, self._chunk_end)
+        return adapter.data[self._chunk_start : self._chunk_end]
+
+    def _calculate_time_chunk(self):
+        """Calculate all variables for the next chunk of time."""
+        if self._chunk_end == 0:
+            self._set_time()
+
+        self._chunk_start = self._chunk_end
+        self._chunk_end = min(
+            self._chunk_start + self._time_chunk_len, self.control.n_times
+        )
+        n_chunk = self._chunk_end - self._chunk_start
+        self._chunk_time = self._time[self._chunk_start : self._chunk_end]
+        for vv in self.variables:
+            # only the final chunk can be shorter
+            self[vv].set_window(self[vv].data[:n_chunk], self._chunk_time)
+
+        self._chunk_inputs = {
+            input: self._get_input_chunk(input)
+            for input in self._chunk_input_names
+        }
+
+        # Solve all variables for the chunk of time
+        self._month_ind_12 = datetime_month(self._chunk_time) - 1  # (time)
+        self._month_ind_1 = np.zeros(n_chunk, dtype=int)  # (time)
+        self._month = datetime_month(self._chunk_time)  # (time)
+        self._dom = datetime_day_of_month(self._chunk_time)  # (time)
 
         self.adjust_temperature()
         self.adjust_precip()
@@ -162,9 +218,6 @@ class PRMSAtmosphere(Process):
         self.calculate_potential_et_jh()
         self.calculate_transp_tindex()
 
-        # JLM todo: delete large variables on self for memory management
-        self._calculated = True
-
         return
 
     @staticmethod
@@ -271,16 +324,42 @@ class PRMSAtmosphere(Process):
             "orad_hru": nan,
         }
 
+    # The inputs read and used in chunks of time
+    _chunk_input_names = ("prcp", "tmax", "tmin")
+
     def _set_initial_conditions(self):
         return
 
+    def get_checkpoint_state(self) -> dict:
+        # The chunk is calculated ahead of the current time: the switches at
+        # the current time are kept by time in the chunk.
+        itime_chunk = self.control.itime_step - self._chunk_start
+        return {
+            "_transp_check": self._transp_check_chunk[itime_chunk].copy(),
+            "_tmax_sum": self._tmax_sum_chunk[itime_chunk].copy(),
+            "_transp_on_prev": self.transp_on.data[itime_chunk].copy(),
+        }
+
     def _advance_variables(self):
-        if not self._calculated:
-            self._calculate_all_time()
+        if self.control.itime_step >= self._chunk_end:
+            self._calculate_time_chunk()
         for vv in self.variables:
             self[vv].advance()
         return
 
+    def _advance_inputs(self):
+        # the chunked inputs were read with the variables, the others (doy
+        # solar tables) advance as usual
+        itime_chunk = self.control.itime_step - self._chunk_start
+        for key, value in self._input_variables_dict.items():
+            if key in self._chunk_input_names:
+                self[key][:] = self._chunk_inputs[key][itime_chunk]
+            else:
+                value.advance()
+                self[key][:] = value.current
+
+        return
+
     def _calculate(self, time_length):
         return
 
@@ -307,9 +386,9 @@ class PRMSAtmosphere(Process):
             raise ValueError(msg)
 
         # (time, space) dimensions on these variables
-        ivd = self._input_variables_dict
-        self.tmaxf.data[:] = ivd["tmax"].data + self.tmax_cbh_adj[month_ind]
-        self.tminf.data[:] = ivd["tmin"].data + self.tmin_cbh_adj[month_ind]
+        inputs = self._chunk_inputs
+        self.tmaxf.data[:] = inputs["tmax"] + self.tmax_cbh_adj[month_ind]
+        self.tminf.data[:] = inputs["tmin"] + self.tmin_cbh_adj[month_ind]
         self.tminc.data[:] = (self["tminf"].data - 32.0) * (5 / 9)
         self.tmaxc.data[:] = (self["tmaxf"].data - 32.0) * (5 / 9)
         self.tavgc.data[:] = (self["tmaxc"].data + self["tminc"].data) / 2.0
@@ -326,7 +405,7 @@ class PRMSAtmosphere(Process):
             None
         """
 
-        ivd = self._input_variables_dict
+        inputs = self._chunk_inputs
 
         # throw an error shapes are inconsistent
         shape_list = np.array(
@@ -386,7 +465,7 @@ class PRMSAtmosphere(Process):
         # This is in climate_hru as a condition of calling climateflow
         # (eye roll)
         self.prmx.data[:] = np.where(
-            ivd["prcp"].data <= zero, zero, self.prmx.data
+            inputs["prcp"] <= zero, zero, self.prmx.data
         )
 
         # Recalculate/redefine these now based on prmx instead of the
@@ -396,14 +475,14 @@ class PRMSAtmosphere(Process):
 
         # Mixed case (everywhere, to be overwritten by the all-snow/rain-fall
         # cases)
-        self.hru_ppt.data[:] = ivd["prcp"].data * self.snow_cbh_adj[month_ind]
+        self.hru_ppt.data[:] = inputs["prcp"] * self.snow_cbh_adj[month_ind]
         self.hru_rain.data[:] = self.prmx.data * self.hru_ppt.data
         self.hru_snow.data[:] = self.hru_ppt.data - self.hru_rain.data
 
         # All precip is snow case
         # The condition to be used later:
         self.hru_ppt.data[wh_all_snow] = (
-            ivd["prcp"].data * self.snow_cbh_adj[month_ind]
+            inputs["prcp"] * self.snow_cbh_adj[month_ind]
         )[wh_all_snow]
         self.hru_snow.data[wh_all_snow] = self.hru_ppt.data[wh_all_snow]
         self.hru_rain.data[wh_all_snow] = zero
@@ -411,7 +490,7 @@ class PRMSAtmosphere(Process):
         # All precip is rain case
         # The condition to be used later:
         self.hru_ppt.data[wh_all_rain] = (
-            ivd["prcp"].data * self.rain_cbh_adj[month_ind]
+            inputs["prcp"] * self.rain_cbh_adj[month_ind]
         )[wh_all_rain]
         self.hru_rain.data[wh_all_rain] = self.hru_ppt.data[wh_all_rain]
         self.hru_snow.data[wh_all_rain] = zero
@@ -459,7 +538,7 @@ class PRMSAtmosphere(Process):
 
         ivd = self._input_variables_dict
         self.swrad.data[:], self.orad_hru.data[:] = self._ddsolrad_run(
-            dates=self._time,
+            dates=self._chunk_time,
             tmax_hru=self.tmaxf.data,
             hru_ppt=self.hru_ppt.data,
             soltab_potsw=ivd["soltab_potsw"].data,
@@ -630,7 +709,7 @@ class PRMSAtmosphere(Process):
             None
         """
         self.potet.data[:] = self._potet_jh_run(
-            dates=self._time,
+            dates=self._chunk_time,
             tavgc=self.tavgc.data,
             swrad=self.swrad.data,
             jh_coef=self.jh_coef,
@@ -687,36 +766,45 @@ class PRMSAtmosphere(Process):
         else:
             transp_tmax_f = (self.transp_tmax * (9.0 / 5.0)) + 32.0
 
-        transp_check = self.transp_on.current.copy()  # dim nhrus only
-        tmax_sum = self.transp_on.current.copy().astype(
-            "float64"
-        )  # dim nhrus only
-        start_day = self.control.start_doy
-        start_month = self.control.start_month
+        if self._transp_on_prev is None:
+            transp_check = self.transp_on.current.copy()  # dim nhrus only
+            tmax_sum = self.transp_on.current.copy().astype(
+                "float64"
+            )  # dim nhrus only
+            start_day = self.control.start_doy
+            start_month = self.control.start_month
+
+            motmp = start_month + self.nmonth
 
-        motmp = start_month + self.nmonth
+            for hh in range(self.nhru):
+                if start_month == self.transp_beg[hh]:
+                    # rsr, why 10? if transp_tmax < 300, should be < 10
+                    if start_day > 10:
+                        self.transp_on.data[0, hh] = 1
+                    else:
+                        transp_check[hh] = 1
 
-        for hh in range(self.nhru):
-            if start_month == self.transp_beg[hh]:
-                # rsr, why 10? if transp_tmax < 300, should be < 10
-                if start_day > 10:
-                    self.transp_on.data[0, hh] = 1
+                elif self.transp_end[hh] > self.transp_beg[hh]:
+                    if (start_month > self.transp_beg[hh]) and (
+                        start_month < self.transp_end[hh]
+                    ):
+                        self.transp_on.data[0, hh] = 1
                 else:
-                    transp_check[hh] = 1
+                    if (start_month > self.transp_beg[hh]) or (
+                        motmp < self.transp_end[hh] + self.nmonth
+                    ):
+                        self.transp_on.data[0, hh] = 1
 
-            elif self.transp_end[hh] > self.transp_beg[hh]:
-                if (start_month > self.transp_beg[hh]) and (
-                    start_month < self.transp_end[hh]
-                ):
-                    self.transp_on.data[0, hh] = 1
-            else:
-                if (start_month > self.transp_beg[hh]) or (
-                    motmp < self.transp_end[hh] + self.nmonth
-                ):
-                    self.transp_on.data[0, hh] = 1
+        else:
+            # continue from the end of the previous chunk of time
+            transp_check = self._transp_check.copy()
+            tmax_sum = self._tmax_sum.copy()
+            self.transp_on.data[0, :] = self._transp_on_prev
 
         # vectorize
         ntime = self.transp_on.data.shape[0]
+        self._transp_check_chunk = np.zeros((ntime, self.nhru), dtype=int)
+        self._tmax_sum_chunk = np.zeros((ntime, self.nhru), dtype="float64")
         # _transp_check = self.transp_on.data.copy()
         # self._transp_beg = tile_space_to_time(self.transp_beg, ntime)
         # self._transp_end = tile_space_to_time(self.transp_end, ntime)
@@ -761,33 +849,30 @@ class PRMSAtmosphere(Process):
                         transp_check[hh] = 0
                         tmax_sum[hh] = 0.0
 
+            self._transp_check_chunk[tt] = transp_check
+            self._tmax_sum_chunk[tt] = tmax_sum
+
         # <<<
+        self._transp_check = transp_check
+        self._tmax_sum = tmax_sum
+        self._transp_on_prev = self.transp_on.data[-1, :].copy()
         return
 
-    def _write_netcdf_timeseries(self) -> None:
-        if not self._netcdf_initialized:
-            return
-
+    def _open_netcdf_writers(self) -> None:
+        # {nc_path: (NetCdfWrite, variables)}
+        self._netcdf_writers = {}
         if self._netcdf_separate:
             for var in self.variables:
                 if var not in self._netcdf_output_vars:
                     continue
                 nc_path = self._netcdf_output_dir / f"{var}.nc"
-
                 nc = NetCdfWrite(
                     nc_path,
                     self._params.coords,
                     [var],
                     {var: self.meta[var]},
                 )
-                nc.add_all_data(
-                    var,
-                    self[var].data,
-                    self._time,
-                )
-                nc.close()
-                assert nc_path.exists()
-                print(f"Wrote file: {nc_path}")
+                self._netcdf_writers[nc_path] = (nc, [var])
 
         else:
             nc_path = self._netcdf_output_dir / f"{self.name}.nc"
@@ -797,20 +882,38 @@ class PRMSAtmosphere(Process):
                 self._netcdf_output_vars,
                 self.meta,
             )
-            for var in self.variables:
-                if var not in self._netcdf_output_vars:
-                    continue
+            out_vars = [
+                var
+                for var in self.variables
+                if var in self._netcdf_output_vars
+            ]
+            self._netcdf_writers[nc_path] = (nc, out_vars)
+
+        self._netcdf_chunk_end = 0
+        return
+
+    def _write_netcdf_timeseries(self) -> None:
+        if not self._netcdf_initialized:
+            return
+
+        # write the current chunk of time once
+        if self._netcdf_writers is None:
+            self._open_netcdf_writers()
+        if self._netcdf_chunk_end == self._chunk_end:
+            return
+
+        for nc, out_vars in self._netcdf_writers.values():
+            for var in out_vars:
                 nc.add_all_data(
                     var,
                     self[var].data,
-                    self._time,
+                    self._chunk_time,
+                    itime_start=self._chunk_start,
                 )
 
-            nc.close()
-            assert nc_path.exists()
-            print(f"Wrote file: {nc_path}")
-
-        self._finalize_netcdf()
+        self._netcdf_chunk_end = self._chunk_end
+        if self._chunk_end == self.control.n_times:
+            self._finalize_netcdf()
         return
 
     def initialize_netcdf(
@@ -838,10 +941,12 @@ class PRMSAtmosphere(Process):
         ):
             print(f"initializing netcdf output for: {self.name}")
 
+        # the full timeseries is written at once, buffering does not apply
         (
             output_dir,
             output_vars,
             separate_files,
+            _,
         ) = self._reconcile_nc_args_w_control_opts(
             output_dir, output_vars, separate_files
         )
@@ -874,6 +979,12 @@ class PRMSAtmosphere(Process):
         return
 
     def _finalize_netcdf(self) -> None:
+        if self._netcdf_writers is not None:
+            for nc_path, (nc, _) in self._netcdf_writers.items():
+                nc.close()
+                assert nc_path.exists()
+                print(f"Wrote file: {nc_path}")
+            self._netcdf_writers = None
         self._netcdf_initialized = False
         return
 
@@ -881,7 +992,7 @@ class PRMSAtmosphere(Process):
         if self._netcdf_initialized:
             if self._verbose:
                 print(
-                    f"Writing FULL timeseries output for: {self.name}",
+                    f"Writing timeseries output for: {self.name}",
                     flush=True,
                 )
             self._write_netcdf_timeseries()
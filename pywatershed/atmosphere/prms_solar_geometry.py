@@ -1,5 +1,9 @@
+import hashlib
+import os
 import pathlib as pl
+import tempfile
 import warnings
+import zipfile
 from typing import Tuple
 
 import numpy as np
@@ -11,6 +15,7 @@ from ..base.control import Control
 from ..constants import dnearzero, nan, one, zero
 from ..parameters import Parameters
 from ..utils.prms5util import load_soltab_debug
+from ..version import __version__
 from .solar_constants import ndoy, pi, pi_12, r1, solar_declination, two_pi
 
 doy = np.arange(ndoy) + 1
@@ -24,6 +29,30 @@ def tile_space_to_time(arr: np.ndarray) -> np.ndarray:
     return np.tile(arr, (ndoy, 1))
 
 
+def soltab_cache_key(
+    hru_slope: np.ndarray, hru_aspect: np.ndarray, hru_lat: np.ndarray
+) -> str:
+    """The content hash of the parameters the solar tables depend on.
+
+    The pywatershed version is included in the hash so that changes to the
+    calculation invalidate cached tables.
+
+    Args:
+        hru_slope: the hru_slope parameter
+        hru_aspect: the hru_aspect parameter
+        hru_lat: the hru_lat parameter
+
+    Returns:
+        A hexadecimal string.
+    """
+    sha = hashlib.sha256(__version__.encode())
+    for arr in (hru_slope, hru_aspect, hru_lat):
+        arr = np.ascontiguousarray(arr)
+        sha.update(f"{arr.dtype.str}{arr.shape}".encode())
+        sha.update(arr.tobytes())
+    return sha.hexdigest()
+
+
 # def tile_time_to_space(arr: np.ndarray, n_hru) -> np.ndarray:
 #    return np.transpose(np.tile(arr, (n_hru, 1)))
 
@@ -54,6 +83,12 @@ class PRMSSolarGeometry(Process):
         verbose: Print extra information or not?
         from_prms_file: Load from a PRMS output file?
         from_nc_files_dir: [str, pl.Path] = None,
+        soltab_cache_dir: optional directory of a cache of computed solar
+            tables. The tables only depend on hru_slope, hru_aspect and
+            hru_lat, they are computed for the distinct (hru_slope,
+            hru_aspect, hru_lat) of the HRUs and stored in and loaded from a
+            file named by a hash of these (see soltab_cache_key). The
+            default, None, does not use a cache.
 
     """
 
@@ -65,6 +100,7 @@ class PRMSSolarGeometry(Process):
         verbose: bool = False,
         from_prms_file: [str, pl.Path] = None,
         from_nc_files_dir: [str, pl.Path] = None,
+        soltab_cache_dir: [str, pl.Path] = None,
     ):
         # self._time is needed by Process for timeseries arrays
         # TODO: this is redundant because the parameter doy is set
@@ -137,28 +173,96 @@ class PRMSSolarGeometry(Process):
 
     def _calculate_all_time(self):
         self._hru_cossl = np.cos(np.arctan(self["hru_slope"]))
+
+        # The tables only depend on the geometry of an HRU: they are computed
+        # once for the HRUs of the same geometry (e.g. once for all the
+        # members of an EnsembleModel) and indexed to the HRUs.
+        geometry, hru_geometry = np.unique(
+            np.stack(
+                [self["hru_slope"], self["hru_aspect"], self["hru_lat"]],
+                axis=1,
+            ),
+            axis=0,
+            return_inverse=True,
+        )
+        slopes, aspects, lats = (
+            np.ascontiguousarray(geometry[:, icol]) for icol in range(3)
+        )
+
+        tables = None
+        cache_file = self._soltab_cache_file(slopes, aspects, lats)
+        if cache_file is not None:
+            tables = self._load_soltab_cache(cache_file)
+        if tables is None:
+            tables = self._compute_soltabs(slopes, aspects, lats)
+            if cache_file is not None:
+                self._save_soltab_cache(cache_file, tables)
+
+        hru_geometry = hru_geometry.reshape(-1)
+        for vv in self.variables:
+            self[vv].data[:] = tables[vv][:, hru_geometry]
+
+        self._calculated = True
+        return
+
+    def _compute_soltabs(
+        self, slopes: np.ndarray, aspects: np.ndarray, lats: np.ndarray
+    ) -> dict:
+        tables = {}
         # The potential radiation on horizontal surfce
-        self.soltab_horad_potsw.data[:], _ = self.compute_soltab(
-            np.zeros(self["nhru"]),
-            np.zeros(self["nhru"]),
-            self["hru_lat"],
+        tables["soltab_horad_potsw"], _ = self.compute_soltab(
+            np.zeros(len(slopes)),
+            np.zeros(len(slopes)),
+            lats,
             self.compute_t,
             self.func3,
         )
 
         # The potential radiaton given slope and aspect
         (
-            self.soltab_potsw.data[:],
-            self.soltab_sunhrs.data[:],
+            tables["soltab_potsw"],
+            tables["soltab_sunhrs"],
         ) = self.compute_soltab(
-            self["hru_slope"],
-            self["hru_aspect"],
-            self["hru_lat"],
+            slopes,
+            aspects,
+            lats,
             self.compute_t,
             self.func3,
         )
-
-        self._calculated = True
+        return tables
+
+    def _soltab_cache_file(
+        self, slopes: np.ndarray, aspects: np.ndarray, lats: np.ndarray
+    ) -> pl.Path:
+        if self._soltab_cache_dir is None:
+            return None
+        key = soltab_cache_key(slopes, aspects, lats)
+        return pl.Path(self._soltab_cache_dir) / f"soltab_{key}.npz"
+
+    def _load_soltab_cache(self, cache_file: pl.Path) -> dict:
+        if not cache_file.exists():
+            return None
+        try:
+            with np.load(cache_file) as cached:
+                tables = {vv: cached[vv] for vv in self.variables}
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            warnings.warn(f"Recomputing invalid soltab cache: {cache_file}")
+            return None
+        return tables
+
+    def _save_soltab_cache(self, cache_file: pl.Path, tables: dict) -> None:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # write and rename so concurrent models never read a partial file
+        fd, tmp_file = tempfile.mkstemp(
+            suffix=".npz", prefix=".soltab_", dir=cache_file.parent
+        )
+        try:
+            with os.fdopen(fd, "wb") as file_open:
+                np.savez(file_open, **tables)
+            os.replace(tmp_file, cache_file)
+        except BaseException:
+            pl.Path(tmp_file).unlink(missing_ok=True)
+            raise
         return
 
     def _advance_variables(self):
@@ -487,10 +591,12 @@ class PRMSSolarGeometry(Process):
         ):
             print(f"initializing netcdf output for: {self.name}")
 
+        # the full timeseries is written at once, buffering does not apply
         (
             output_dir,
             output_vars,
             separate_files,
+            _,
         ) = self._reconcile_nc_args_w_control_opts(
             output_dir, output_vars, separate_files
         )
@@ -1,13 +1,76 @@
-from .accessor import Accessor
-from .adapter import Adapter
-from .budget import Budget
-from .conservative_process import ConservativeProcess
-from .control import Control
-from .data_model import DatasetDict
-from .model import Model
-from .parameters import Parameters
-from .process import Process
-from .timeseries import TimeseriesArray
+import importlib
+from typing import TYPE_CHECKING
+
+# The names are imported on first access (PEP 562). Importing a base module
+# (e.g. meta) from utils or parameters then does not import all of base,
+# which imports utils and parameters in turn.
+_lazy_imports = {
+    "Accessor": ".accessor",
+    "Adapter": ".adapter",
+    "Budget": ".budget",
+    "ConservativeProcess": ".conservative_process",
+    "Control": ".control",
+    "DatasetDict": ".data_model",
+    "EnsembleModel": ".ensemble_model",
+    "run_ensemble": ".ensemble",
+    "Model": ".model",
+    "PartitionedModel": ".partition",
+    "Parameters": ".parameters",
+    "Process": ".process",
+    "SpinUpCache": ".spin_up",
+    "TimeseriesArray": ".timeseries",
+}
+
+_submodules = (
+    "accessor",
+    "adapter",
+    "budget",
+    "conservative_process",
+    "control",
+    "data_model",
+    "ensemble",
+    "ensemble_model",
+    "meta",
+    "model",
+    "parameters",
+    "partition",
+    "process",
+    "spin_up",
+    "timeseries",
+)
+
+
+def __getattr__(name: str):
+    if name in _lazy_imports.keys():
+        module = importlib.import_module(_lazy_imports[name], __name__)
+        value = getattr(module, name)
+    elif name in _submodules:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals().keys()) | set(__all__) | set(_submodules))
+
+
+if TYPE_CHECKING:
+    from .accessor import Accessor
+    from .adapter import Adapter
+    from .budget import Budget
+    from .conservative_process import ConservativeProcess
+    from .control import Control
+    from .data_model import DatasetDict
+    from .ensemble import run_ensemble
+    from .ensemble_model import EnsembleModel
+    from .model import Model
+    from .parameters import Parameters
+    from .partition import PartitionedModel
+    from .process import Process
+    from .spin_up import SpinUpCache
+    from .timeseries import TimeseriesArray
 
 __all__ = (
     "Accessor",
@@ -16,8 +79,12 @@ __all__ = (
     "ConservativeProcess",
     "Control",
     "DatasetDict",
+    "EnsembleModel",
     "Model",
+    "PartitionedModel",
     "Parameters",
     "Process",
+    "SpinUpCache",
     "TimeseriesArray",
+    "run_ensemble",
 )
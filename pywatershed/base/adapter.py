@@ -13,7 +13,8 @@ import numpy as np
 from ..base.control import Control
 from ..base.timeseries import TimeseriesArray
 from ..constants import fileish
-from ..utils.netcdf_utils import NetCdfRead
+from ..utils.memmap_utils import MemmapRead
+from ..utils.netcdf_utils import NetCdfRead, netcdf_read_pool
 
 
 class Adapter:
@@ -35,6 +36,27 @@ class Adapter:
         """Advance the adapter in time"""
         raise NotImplementedError("Must be overridden")
 
+    @property
+    def can_advance_block(self) -> bool:
+        """Can the adapter advance a block of time steps at once?"""
+        return False
+
+    def advance_block(self, n_steps: int) -> np.ndarray:
+        """Advance the adapter n_steps time steps at once
+
+        Args:
+            n_steps: the number of time steps to advance
+
+        Returns:
+            The data for the n_steps time steps, time is the first dimension.
+            Current is the data for the last time step.
+        """
+        raise NotImplementedError("Must be overridden")
+
+    def close(self) -> None:
+        """Release any resources held by the adapter."""
+        return None
+
     @property
     def current(self):
         """Current time of the Adapter instance."""
@@ -47,6 +69,11 @@ class AdapterNetcdf(Adapter):
     This requires that the NetCDF file have a time dimension named "time" or
     "doy" (day of year) to be properly handled as a timeseries for input, etc.
 
+    The underlying NetCdfRead is obtained from the shared
+    :class:`~pywatershed.utils.netcdf_utils.NetCdfReadPool` so all adapters on
+    a file share an open file, its time index and its cached time batches. The
+    reader is released by close() or when the adapter is deleted.
+
     Args:
         fname: filename of netcdf as string or Path
         variable: variable name string
@@ -57,6 +84,8 @@ class AdapterNetcdf(Adapter):
 
     """
 
+    _prefetch = False
+
     def __init__(
         self,
         fname: fileish,
@@ -68,6 +97,7 @@ class AdapterNetcdf(Adapter):
     ) -> None:
         super().__init__(variable)
         self.name = "AdapterNetcdf"
+        self._nc_read = None
 
         self._dim_sizes = dim_sizes
         self._type = type
@@ -76,12 +106,7 @@ class AdapterNetcdf(Adapter):
         self._start_time = self.control.start_time
         self._end_time = self.control.end_time
 
-        self._nc_read = NetCdfRead(
-            fname,
-            start_time=self._start_time,
-            end_time=self._end_time,
-            load_n_time_batches=load_n_time_batches,
-        )
+        self._nc_read = self._open_nc_read(load_n_time_batches)
 
         # would like to make this a check if dim_sizes and type are available
         nc_type = self._nc_read.dataset[variable].dtype
@@ -94,15 +119,37 @@ class AdapterNetcdf(Adapter):
         self.time = self._nc_read.times
         # self._current_value = np.full(self._dim_sizes, np.nan, self._type)
         self._current_value = np.full(nc_shape, np.nan, nc_type)
+        self._itime_step = 0
 
         return
 
+    def __del__(self):
+        self.close()
+
+    def _open_nc_read(self, load_n_time_batches: int) -> NetCdfRead:
+        return netcdf_read_pool.acquire(
+            self._fname,
+            start_time=self._start_time,
+            end_time=self._end_time,
+            load_n_time_batches=load_n_time_batches,
+            prefetch=self._prefetch,
+        )
+
+    def close(self) -> None:
+        """Release the (shared) NetCdfRead of this adapter."""
+        # the pool may already be gone at interpreter shutdown
+        if self._nc_read is not None and netcdf_read_pool is not None:
+            netcdf_read_pool.release(self._nc_read)
+            self._nc_read = None
+        return None
+
     def advance(self):
-        if self._nc_read._itime_step[self._variable] > self.control.itime_step:
+        if self._itime_step > self.control.itime_step:
             return
-        self._current_value[:] = self._nc_read.advance(
-            self._variable, self.control.current_time
+        self._current_value[:] = self._nc_read.get_time_step_data(
+            self._variable, self._itime_step, self.control.current_time
         )
+        self._itime_step += 1
         return None
 
     @property
@@ -111,6 +158,161 @@ class AdapterNetcdf(Adapter):
         # TODO JLM: seems like we'd want to cache this data if we invoke once
         return self._nc_read.all_time(self._variable).data
 
+    def get_time_window(self, istart: int, iend: int) -> np.ndarray:
+        """Return the data for the simulation time steps [istart, iend)."""
+        return self._nc_read.get_time_window(self._variable, istart, iend).data
+
+    @property
+    def can_advance_block(self) -> bool:
+        # day of year (doy) data are not read in time windows
+        return self._nc_read.dataset[self._variable].dimensions[0] == "time"
+
+    def advance_block(self, n_steps: int) -> np.ndarray:
+        data = self.get_time_window(
+            self._itime_step, self._itime_step + n_steps
+        )
+        self._current_value[:] = data[-1]
+        self._itime_step += n_steps
+        return data
+
+
+class AdapterNetcdfPrefetch(AdapterNetcdf):
+    """Adapter subclass for a NetCDF file with asynchronous time batches
+
+    Like AdapterNetcdf but double-buffered: when a time batch is loaded,
+    the following batch is read on a background thread while the model
+    computes on the current one. This only pays off when
+    load_n_time_batches > 1 and allows small batches (less memory) without
+    stalling the time loop on reads.
+
+    Args:
+        fname: filename of netcdf as string or Path
+        variable: variable name string
+        dim_sizes: a tuple of dimension sizes
+        type: a variable dtype
+        control: a Control object
+        load_n_time_batches: number of times to read from file.
+
+    """
+
+    _prefetch = True
+
+    def __init__(
+        self,
+        fname: fileish,
+        variable: str,
+        dim_sizes: tuple,
+        type: str,
+        control: Control,
+        load_n_time_batches: int = 1,
+    ) -> None:
+        super().__init__(
+            fname,
+            variable=variable,
+            dim_sizes=dim_sizes,
+            type=type,
+            control=control,
+            load_n_time_batches=load_n_time_batches,
+        )
+        self.name = "AdapterNetcdfPrefetch"
+        return
+
+
+class AdapterMemmap(Adapter):
+    """Adapter subclass for a memory-mapped raw binary (.npy) store
+
+    The store is written by
+    :func:`~pywatershed.utils.memmap_utils.netcdf_to_memmap`,
+    :func:`~pywatershed.utils.cbh_utils.cbh_file_to_memmap` or
+    :meth:`~pywatershed.base.DatasetDict.to_memmap`. The data are memory
+    mapped read-only so there is no decompression and concurrent model
+    processes on a node share the forcings through the OS page cache.
+
+    Processes hold a reference to current, so it is a fixed array into which
+    each time step (a contiguous row of the map) is copied on advance. The
+    data property is a zero-copy view of the map over the simulation times.
+
+    Args:
+        fname: filename of the .npy store as string or Path
+        variable: variable name string
+        dim_sizes: a tuple of dimension sizes (unused)
+        type: a variable dtype (unused)
+        control: a Control object
+
+    """
+
+    def __init__(
+        self,
+        fname: fileish,
+        variable: str,
+        dim_sizes: tuple,
+        type: str,
+        control: Control,
+    ) -> None:
+        super().__init__(variable)
+        self.name = "AdapterMemmap"
+
+        self._dim_sizes = dim_sizes
+        self._type = type
+        self._fname = fname
+        self.control = control
+        self._start_time = self.control.start_time
+        self._end_time = self.control.end_time
+
+        self._mm_read = MemmapRead(
+            self._fname,
+            start_time=self._start_time,
+            end_time=self._end_time,
+        )
+        if variable is not None and variable != self._mm_read.variable:
+            msg = (
+                f"Requested variable '{variable}' but {self._fname} stores "
+                f"'{self._mm_read.variable}'"
+            )
+            raise ValueError(msg)
+
+        self.time = self._mm_read.times
+        mm_data = self._mm_read.data
+        self._current_value = np.full(mm_data.shape[1:], np.nan, mm_data.dtype)
+        self._itime_step = 0
+
+        return
+
+    def close(self) -> None:
+        """Release the memory map of this adapter."""
+        self._mm_read.close()
+        return None
+
+    def advance(self):
+        if self._itime_step > self.control.itime_step:
+            return
+        self._current_value[:] = self._mm_read.get_time_step_data(
+            self._itime_step, self.control.current_time
+        )
+        self._itime_step += 1
+        return None
+
+    @property
+    def data(self) -> np.memmap:
+        """Return a zero-copy view of the data for all simulation times."""
+        return self._mm_read.data
+
+    def get_time_window(self, istart: int, iend: int) -> np.ndarray:
+        """Return a zero-copy view of the time steps [istart, iend)."""
+        return self._mm_read.get_time_window(istart, iend)
+
+    @property
+    def can_advance_block(self) -> bool:
+        return self._mm_read.dims[0] == "time"
+
+    def advance_block(self, n_steps: int) -> np.ndarray:
+        data = self.get_time_window(
+            self._itime_step, self._itime_step + n_steps
+        )
+        self._current_value[:] = data[-1]
+        self._itime_step += n_steps
+        return data
+
 
 class AdapterOnedarray(Adapter):
     """Adapter subclass for an invariant 1-D numpy.array
@@ -136,10 +338,165 @@ class AdapterOnedarray(Adapter):
         """A dummy method for compliance."""
         return None
 
+    @property
+    def can_advance_block(self) -> bool:
+        return True
+
+    def advance_block(self, n_steps: int) -> np.ndarray:
+        """A read-only view of the (invariant) data n_steps times."""
+        return np.broadcast_to(
+            self._current_value, (n_steps, *self._current_value.shape)
+        )
+
+
+class AdapterNdarray(Adapter):
+    """Adapter subclass for an in-memory timeseries numpy.array
+
+    The first axis of the data is time with a row for each simulation time
+    step, e.g. the data of a file adapter placed in shared memory by
+    :func:`~pywatershed.base.ensemble.run_ensemble`. As for AdapterMemmap,
+    each time step is copied into current on advance and the data property
+    is a zero-copy view.
+
+    Args:
+        data: the (time, ...) data for the simulation times
+        variable: variable name string
+        time: the datetime64 times of the data
+        control: a Control object
+    """
+
+    def __init__(
+        self,
+        data: np.ndarray,
+        variable: str,
+        time: np.ndarray,
+        control: Control,
+    ) -> None:
+        super().__init__(variable)
+        self.name = "AdapterNdarray"
+        self._data = data
+        self.time = time
+        self.control = control
+        self._current_value = np.full(data.shape[1:], np.nan, data.dtype)
+        self._itime_step = 0
+        return
+
+    def advance(self):
+        if self._itime_step > self.control.itime_step:
+            return
+        self._current_value[:] = self._data[self._itime_step]
+        self._itime_step += 1
+        return None
+
+    @property
+    def data(self) -> np.ndarray:
+        """Return the data for all simulation times."""
+        return self._data
+
+    def get_time_window(self, istart: int, iend: int) -> np.ndarray:
+        """Return a zero-copy view of the time steps [istart, iend)."""
+        return self._data[istart:iend]
+
+    @property
+    def can_advance_block(self) -> bool:
+        return True
+
+    def advance_block(self, n_steps: int) -> np.ndarray:
+        data = self.get_time_window(
+            self._itime_step, self._itime_step + n_steps
+        )
+        self._current_value[:] = data[-1]
+        self._itime_step += n_steps
+        return data
+
+
+class AdapterTile(Adapter):
+    """Adapter subclass repeating the data of an adapter along the last axis
+
+    The data of the adapter are read once and repeated n_tiles times along
+    the last (spatial) axis, e.g. the input files of a domain for the
+    members of an EnsembleModel stacked along nhru.
+
+    Args:
+        adapter: the adapter of the data
+        n_tiles: the number of repetitions
+    """
+
+    def __init__(
+        self,
+        adapter: Adapter,
+        n_tiles: int,
+    ) -> None:
+        super().__init__(adapter._variable)
+        self.name = "AdapterTile"
+        self._adapter = adapter
+        self._n_tiles = n_tiles
+        self._fname = getattr(adapter, "_fname", None)
+        self.time = getattr(adapter, "time", None)
+        self._current_value = self._tile(adapter.current)
+        return
+
+    def _tile(self, data: np.ndarray) -> np.ndarray:
+        return np.tile(data, (*([1] * (data.ndim - 1)), self._n_tiles))
+
+    def _set_current(self) -> None:
+        current = self._adapter.current
+        tiles = self._current_value.reshape(
+            *current.shape[:-1], self._n_tiles, current.shape[-1]
+        )
+        tiles[:] = current[..., np.newaxis, :]
+        return None
+
+    def close(self) -> None:
+        """Release the resources of the adapter."""
+        self._adapter.close()
+        return None
+
+    def advance(self) -> None:
+        self._adapter.advance()
+        self._set_current()
+        return None
+
+    @property
+    def data(self) -> np.ndarray:
+        """Return the (repeated) data for all simulation times."""
+        return self._tile(self._adapter.data)
+
+    def get_time_window(self, istart: int, iend: int) -> np.ndarray:
+        """Return the (repeated) data for the time steps [istart, iend)."""
+        return self._tile(self._adapter.get_time_window(istart, iend))
+
+    @property
+    def can_advance_block(self) -> bool:
+        return self._adapter.can_advance_block
+
+    def advance_block(self, n_steps: int) -> np.ndarray:
+        data = self._adapter.advance_block(n_steps)
+        self._set_current()
+        return self._tile(data)
+
 
 adaptable = Union[str, pl.Path, np.ndarray, Adapter]
 
 
+def netcdf_load_options(control: Control) -> dict:
+    """Get the NetCDF input load options for adapter_factory from control.
+
+    Args:
+        control: a Control object
+
+    Returns:
+        A dictionary of keyword arguments for adapter_factory.
+    """
+    opts = control.options
+    load_opts = {"load_n_time_batches": 1, "prefetch": False}
+    if "load_n_time_batches" in opts.keys():
+        load_opts["load_n_time_batches"] = opts["load_n_time_batches"]
+    if "load_prefetch" in opts.keys():
+        load_opts["prefetch"] = opts["load_prefetch"]
+    return load_opts
+
+
 def adapter_factory(
     var: adaptable,
     variable_name: str = None,
@@ -147,6 +504,7 @@ def adapter_factory(
     variable_dim_sizes: tuple = None,
     variable_type: str = None,
     load_n_time_batches: int = 1,
+    prefetch: bool = False,
 ) -> "Adapter":
     """A function to return the appropriate subclass of Adapter
 
@@ -154,9 +512,11 @@ def adapter_factory(
        var: the quantity to be adapted
        variable_name: what you call the above var
        control: a Control object
-       variable_dim_sizes: for an AdapterNetcdf
-       variable_type: for an AdapterNetcdf
+       variable_dim_sizes: for an AdapterNetcdf or AdapterMemmap
+       variable_type: for an AdapterNetcdf or AdapterMemmap
        load_n_time_batches: for an AdapterNetcdf
+       prefetch: for a netcdf file, get an AdapterNetcdfPrefetch instead of
+         an AdapterNetcdf when load_n_time_batches > 1.
 
     """
     if isinstance(var, Adapter):
@@ -164,9 +524,23 @@ def adapter_factory(
         return var
 
     elif isinstance(var, (str, pl.Path)):
-        # Paths and strings are considered paths to netcdf files
-        if pl.Path(var).suffix == ".nc":
-            return AdapterNetcdf(
+        # Paths and strings are considered paths to netcdf files or to
+        # memmap (.npy) stores
+        if pl.Path(var).suffix == ".npy":
+            return AdapterMemmap(
+                var,
+                variable=variable_name,
+                control=control,
+                dim_sizes=variable_dim_sizes,
+                type=variable_type,
+            )
+
+        elif pl.Path(var).suffix == ".nc":
+            if prefetch and load_n_time_batches > 1:
+                netcdf_adapter = AdapterNetcdfPrefetch
+            else:
+                netcdf_adapter = AdapterNetcdf
+            return netcdf_adapter(
                 var,
                 variable=variable_name,
                 control=control,
@@ -1,9 +1,8 @@
 import pathlib as pl
 from copy import deepcopy
-from typing import Union
+from typing import Literal, Union
 from warnings import warn
 
-import netCDF4 as nc4
 import numpy as np
 
 from pywatershed.base.control import Control
@@ -11,6 +10,7 @@ from pywatershed.base.control import Control
 from ..constants import epsilon64, one, zero
 from ..utils.formatting import pretty_print
 from ..utils.netcdf_utils import NetCdfWrite
+from ..utils.numba_utils import jit_kernel
 from .accessor import Accessor
 from .parameters import Parameters
 
@@ -22,10 +22,93 @@ from .parameters import Parameters
 # * terminology: what is the term for the budget dosent close/zero?
 
 
+def _sum_rows(rows: np.ndarray, out: np.ndarray) -> np.ndarray:
+    # add the rows in order, in place (faster than np.sum over axis 0)
+    np.copyto(out, rows[0])
+    for row in rows[1:]:
+        out += row
+    return out
+
+
+def _accumulate_kernel(
+    rates: np.ndarray,
+    accum: np.ndarray,
+    time_step: float,
+    comp_sum: np.ndarray,
+    comp_accum_sum: np.ndarray,
+) -> None:
+    """Sum and accumulate the stacked terms of a budget component.
+
+    The (n_terms, nspace) rates are added in order to the sum of the
+    component and, multiplied by the time step, to their accumulations
+    which are added in order to the accumulated sum, as by the numpy
+    operations of Budget.
+    """
+    n_terms, nspace = rates.shape
+    for iterm in range(n_terms):
+        rate = rates[iterm]
+        acc = accum[iterm]
+        if iterm == 0:
+            for ii in range(nspace):
+                acc[ii] = acc[ii] + rate[ii] * time_step
+                comp_sum[ii] = rate[ii]
+                comp_accum_sum[ii] = acc[ii]
+        else:
+            for ii in range(nspace):
+                acc[ii] = acc[ii] + rate[ii] * time_step
+                comp_sum[ii] += rate[ii]
+                comp_accum_sum[ii] += acc[ii]
+    return
+
+
+def _unit_balance_kernel(
+    inputs_sum: np.ndarray,
+    outputs_sum: np.ndarray,
+    storage_changes_sum: np.ndarray,
+    unit_balance: np.ndarray,
+    rtol: float,
+    atol: float,
+) -> int:
+    """Check the unit balance as Budget._calc_unit_balance.
+
+    Returns:
+        The number of spatial units where the balance is not close.
+    """
+    n_not_close = 0
+    for ii in range(unit_balance.shape[0]):
+        storage_change = storage_changes_sum[ii]
+        unit_balance[ii] = inputs_sum[ii] - outputs_sum[ii]
+        abs_diff = abs(unit_balance[ii] - storage_change)
+        abs_close = abs_diff < atol
+        if storage_change < epsilon64:
+            close = abs_close
+        else:
+            close = abs_close or (abs_diff / storage_change) < rtol
+        if not close:
+            n_not_close += 1
+    return n_not_close
+
+
 class Budget(Accessor):
     """Budget class for mass and energy conservation.
 
     Currently no energy budget has been implmenented, todo.
+
+    On the first calculate, the terms of each component are registered in
+    the rows of a preallocated (n_terms, nspace) float64 array and their
+    accumulations are held in a second such array (the accumulations
+    dictionary holds views of its rows). The sums, accumulations and unit
+    balance check of each time step are in-place numpy operations on these
+    and other preallocated arrays or, with calc_method="numba", jitted
+    kernels.
+
+    With check_interval greater than one, the terms are accumulated every
+    time step but the balance is only checked every check_interval time
+    steps (and at reset_accumulations and finalize), on the mean rates of
+    the window of time steps since the last check (the differences of the
+    accumulations). Each window checked is recorded in check_log with its
+    residuals where the balance is not close, see check_window. An
+    imbalance of a single time step is diluted by the length of the window.
     """
 
     def __init__(
@@ -44,6 +127,8 @@ class Budget(Accessor):
         basis: str = "unit",
         imbalance_fatal: bool = False,
         verbose: bool = True,
+        calc_method: Literal["numpy", "numba"] = "numpy",
+        check_interval: int = 1,
     ):
         self.name = "Budget"
         self.control = control
@@ -57,6 +142,20 @@ class Budget(Accessor):
         self.imbalance_fatal = imbalance_fatal
         self.verbose = verbose
         self.basis = basis
+        self.calc_method = calc_method
+        if (
+            check_interval is None
+            or not isinstance(check_interval, (int, np.integer))
+            or check_interval < 1
+        ):
+            warn(
+                f"check_interval must be a positive integer, got "
+                f"{check_interval}, using 1"
+            )
+            check_interval = 1
+        self.check_interval = int(check_interval)
+        # the records of the windows checked, see check_window
+        self._check_log = []
 
         self._output_netcdf = False
         self._inputs_sum = None
@@ -66,6 +165,9 @@ class Budget(Accessor):
         self._accumulations = None
         self._accumulations_sum = None
         self._zero_sum = None
+        # the stacked terms, allocated on the first calculate
+        self._rates = None
+        self._accum = None
 
         self._time = self.control.current_time
         self._itime_step = self.control.itime_step
@@ -182,6 +284,9 @@ class Budget(Accessor):
         return {comp: list(self[comp].keys()) for comp in self.components}
 
     def set_initial_accumulations(self, init_accumulations, accum_start_time):
+        # the stacked terms are reallocated from the accumulations
+        self._rates = None
+        self._accum = None
         self._itime_accumulated = self._itime_step  # -1
         self._time_accumulated = self._time  # None
         self._accumulations = {}
@@ -209,6 +314,15 @@ class Budget(Accessor):
 
     def reset_accumulations(self):
         self._accum_start_time = self._time_accumulated
+        if self._accum is not None:
+            # the accumulation window ends
+            if self.check_interval > 1:
+                self.check_window()
+            for accum in self._accum.values():
+                accum[:] = zero
+            self._sum_component_accumulations()
+            self._start_window()
+            return
         for component in self.components:
             self._accumulations[component] = {}
             for var in self[component].keys():
@@ -216,6 +330,37 @@ class Budget(Accessor):
         self._sum_component_accumulations()
         return
 
+    def get_checkpoint_state(self) -> dict:
+        """Get the accumulations of the budget for a checkpoint.
+
+        Returns:
+            A dictionary of the accumulations by component/variable and
+            their start time (accum_start_time).
+        """
+        state = {"accum_start_time": np.array(self._accum_start_time)}
+        for component, accumulations in self._accumulations.items():
+            for var, values in accumulations.items():
+                state[f"{component}/{var}"] = np.array(values)
+        return state
+
+    def set_checkpoint_state(self, state: dict) -> None:
+        """Set the accumulations of the budget from get_checkpoint_state()."""
+        self._accum_start_time = state["accum_start_time"][()]
+        for component in self.components:
+            for var in self[component].keys():
+                values = state[f"{component}/{var}"]
+                if self._accum is not None:
+                    self._accumulations[component][var][...] = values
+                    continue
+                # accumulations not started are scalar zeros
+                self._accumulations[component][var] = (
+                    values.copy() if values.ndim else values[()]
+                )
+        self._sum_component_accumulations()
+        if self._accum is not None:
+            self._start_window()
+        return None
+
     def advance(self):
         """Advance time (taken from storageUnit)"""
         if self._itime_step >= self.control.itime_step:
@@ -230,38 +375,278 @@ class Budget(Accessor):
         self._itime_step = self.control.itime_step
         self._time = self.control.current_time
 
+    def _init_terms(self):
+        """Register the terms of each component in stacked arrays.
+
+        The terms are copied to the rows of the (n_terms, nspace) float64
+        arrays _rates each time step. The accumulations are moved to the
+        rows of the arrays _accum and the accumulations dictionary set to
+        views of them. The components may differ in their shape (e.g. HRU
+        and segment terms of a global budget).
+        """
+        self._rates = {}
+        self._accum = {}
+        self._sums = {}
+        self._accumulations_sum = {}
+        for component in self.components:
+            shape = np.broadcast_shapes(
+                *[np.shape(values) for values in self[component].values()]
+            )
+            n_terms = len(self[component])
+            self._rates[component] = np.zeros(
+                (n_terms, *shape), dtype=np.float64
+            )
+            accum = np.zeros((n_terms, *shape), dtype=np.float64)
+            for iterm, var in enumerate(self[component].keys()):
+                accum[iterm] = self._accumulations[component][var]
+                self._accumulations[component][var] = accum[iterm]
+            self._accum[component] = accum
+            self._sums[component] = np.zeros(shape, dtype=np.float64)
+            self._accumulations_sum[component] = np.zeros(
+                shape, dtype=np.float64
+            )
+
+        self._inputs_sum = self._sums["inputs"]
+        self._outputs_sum = self._sums["outputs"]
+        self._storage_changes_sum = self._sums["storage_changes"]
+
+        # the unit balance and the work arrays of its check
+        shape = self._inputs_sum.shape
+        self._unit_balance = np.zeros(shape, dtype=np.float64)
+        self._check_work = np.zeros((2, *shape), dtype=np.float64)
+        self._check_masks = np.zeros((3, *shape), dtype=bool)
+
+        # the accumulated sums at the start of the check window
+        self._sum_component_accumulations()
+        self._window_start_sums = {
+            component: np.zeros(values.shape, dtype=np.float64)
+            for component, values in self._sums.items()
+        }
+        self._window_sums = deepcopy(self._window_start_sums)
+        self._start_window()
+
+        self._kernels = None
+        if self.calc_method == "numba" and all(
+            rates.ndim == 2 for rates in self._rates.values()
+        ):
+            self._kernels = (
+                jit_kernel(_accumulate_kernel),
+                jit_kernel(_unit_balance_kernel),
+            )
+        return
+
     def calculate(self):
         """Accumulate for the timestep."""
         if self._itime_accumulated >= self._itime_step:
             raise ValueError("Can not accumulate twice per timestep")
 
-        self._inputs_sum = self._sum_inputs()
-        self._outputs_sum = self._sum_outputs()
-        self._storage_changes_sum = self._sum_storage_changes()
+        if self._rates is None:
+            self._init_terms()
 
-        # accumulate
-        for component in self.components:
-            for var in self[component].keys():
-                self._accumulations[component][var] += self[component][
-                    var
-                ] * self.control.time_step.astype(
-                    f"timedelta64[{self.time_unit}]"
-                ).astype(int)
+        # accumulate, in float64 whatever the float_precision of the terms
+        time_step = self._time_step_units()
+        # with a check interval, the balance is checked on windows
+        check = self.check_interval == 1
 
-        self._sum_component_accumulations()
+        if self._kernels is None:
+            self._calculate_numpy(time_step, check)
+        else:
+            self._calculate_numba(time_step, check)
+
+        self._itime_accumulated = self._itime_step
+        self._time_accumulated = self._time
+
+        if self._window_n_steps == 0:
+            self._window_start_time = self._time
+        self._window_n_steps += 1
+        if check or self._window_n_steps < self.check_interval:
+            return
+        self.check_window()
+        return
+
+    def _time_step_units(self) -> int:
+        return self.control.time_step.astype(
+            f"timedelta64[{self.time_unit}]"
+        ).astype(int)
+
+    def _start_window(self) -> None:
+        for component, start_sum in self._window_start_sums.items():
+            np.copyto(start_sum, self._accumulations_sum[component])
+        self._window_n_steps = 0
+        self._window_start_time = None
+        return
+
+    @property
+    def check_log(self) -> list:
+        """The records of the windows checked, see check_window."""
+        return self._check_log
+
+    def check_window(self) -> None:
+        """Check the balance over the time steps since the last check.
+
+        The mean rates of the window are the differences of the accumulated
+        sums since the start of the window divided by its duration, checked
+        for balance with rtol and atol as the rates of a time step. The
+        window is appended to check_log as a dictionary of:
+
+          * start_time, end_time: the times of the first and last time
+            steps of the window
+          * n_time_steps: the number of time steps of the window
+          * max_abs_residual: the maximum absolute residual, the mean
+            inputs minus outputs minus storage changes (for the global
+            basis, of their spatial sums)
+          * locations: the indices of the spatial units where the balance
+            is not close (empty if the balance is close)
+          * residuals: the residuals at locations
+
+        An imbalance warns or, if imbalance_fatal, raises a ValueError.
+
+        Returns:
+            None
+        """
+        if self._accum is None or self._window_n_steps == 0:
+            return None
+
+        duration = self._window_n_steps * self._time_step_units()
+        window_sums = self._window_sums
+        for component, window_sum in window_sums.items():
+            np.subtract(
+                self._accumulations_sum[component],
+                self._window_start_sums[component],
+                out=window_sum,
+            )
+            window_sum /= duration
+
+        if self.basis == "unit":
+            cond = self._unit_close(
+                window_sums["inputs"],
+                window_sums["outputs"],
+                window_sums["storage_changes"],
+            )
+            residual = self._unit_balance - window_sums["storage_changes"]
+            locations = np.flatnonzero(~cond)
+            residuals = residual.ravel()[locations]
+            max_abs_residual = np.abs(residual).max()
+            self._zero_sum = locations.size == 0
+            self._balance = self._unit_balance
+        else:
+            global_balance = (
+                window_sums["inputs"].sum() - window_sums["outputs"].sum()
+            )
+            storage_change = window_sums["storage_changes"].sum()
+            residual = global_balance - storage_change
+            self._zero_sum = np.allclose(
+                global_balance, storage_change, rtol=self.rtol, atol=self.atol
+            )
+            locations = np.array([], dtype=np.int64)
+            residuals = np.array([residual] if not self._zero_sum else [])
+            max_abs_residual = abs(residual)
+            self._balance = global_balance
+
+        record = {
+            "start_time": self._window_start_time,
+            "end_time": self._time_accumulated,
+            "n_time_steps": self._window_n_steps,
+            "max_abs_residual": max_abs_residual,
+            "locations": locations,
+            "residuals": residuals,
+        }
+        self._check_log.append(record)
+        self._start_window()
+
+        if not self._zero_sum:
+            msg = (
+                f"The flux {self.basis} balance not equal to the change in "
+                f"{self.basis} storage over the {record['n_time_steps']} "
+                f"time steps from {record['start_time']} to "
+                f"{record['end_time']} for {self.description}"
+            )
+            if self.basis == "unit":
+                msg += f" at the following locations: {locations}"
+            self._imbalance(msg)
+        return None
+
+    def finalize(self) -> None:
+        """Check the last window, if checking at intervals, and close the
+        NetCDF output."""
+        if self.check_interval > 1:
+            self.check_window()
+        self._finalize_netcdf()
+        return None
+
+    def _calculate_numpy(self, time_step: int, check: bool) -> None:
+        # term by term, while the row of the term is in cache. The terms may
+        # be rebound (e.g. by set_input_to_adapter) and are looked up every
+        # time step.
+        for component in self.components:
+            comp_sum = self._sums[component]
+            comp_accum_sum = self._accumulations_sum[component]
+            for iterm, values in enumerate(self[component].values()):
+                rate = self._rates[component][iterm]
+                accum = self._accum[component][iterm]
+                rate[...] = values
+                if iterm == 0:
+                    np.copyto(comp_sum, rate)
+                else:
+                    comp_sum += rate
+                rate *= time_step
+                accum += rate
+                if iterm == 0:
+                    np.copyto(comp_accum_sum, accum)
+                else:
+                    comp_accum_sum += accum
 
         # check balance
+        if not check:
+            return
         if self.basis == "unit":
             self._balance = self._calc_unit_balance()
         elif self.basis == "global":
             self._balance = self._calc_global_balance()
+        return
 
-        self._itime_accumulated = self._itime_step
-        self._time_accumulated = self._time
+    def _calculate_numba(self, time_step: int, check: bool) -> None:
+        accumulate_kernel, unit_balance_kernel = self._kernels
+        for component in self.components:
+            rates = self._rates[component]
+            for iterm, values in enumerate(self[component].values()):
+                rates[iterm] = values
+            accumulate_kernel(
+                rates,
+                self._accum[component],
+                float(time_step),
+                self._sums[component],
+                self._accumulations_sum[component],
+            )
+
+        if not check:
+            return
+        if self.basis == "global":
+            self._balance = self._calc_global_balance()
+            return
+
+        n_not_close = unit_balance_kernel(
+            self._inputs_sum,
+            self._outputs_sum,
+            self._storage_changes_sum,
+            self._unit_balance,
+            float(self.rtol),
+            float(self.atol),
+        )
+        if n_not_close:
+            # the numpy check diagnoses the locations not close
+            self._balance = self._calc_unit_balance()
+        else:
+            self._zero_sum = True
+            self._balance = self._unit_balance
         return
 
     def _sum_component_accumulations(self):
         # sum the individual component accumulations
+        if self._accum is not None:
+            for component, accum in self._accum.items():
+                _sum_rows(accum, self._accumulations_sum[component])
+            return
         for component in self.components:
             self._accumulations_sum[component] = None
             for var in self[component].keys():
@@ -279,37 +664,52 @@ class Budget(Accessor):
     def accumulations(self):
         return self._accumulations
 
-    def _sum(self, attr):
-        """Sum over the individual terms in a budget component."""
-        key0 = list(self[attr].keys())[0]
-        sum = self[attr][key0] * zero
-        for kk, vv in self[attr].items():
-            sum += vv
-        return sum
-
-    def _sum_inputs(self):
-        return self._sum("inputs")
+    def _unit_close(
+        self,
+        inputs_sum: np.ndarray,
+        outputs_sum: np.ndarray,
+        storage_changes_sum: np.ndarray,
+    ) -> np.ndarray:
+        """Where the unit balance is close to the storage changes.
 
-    def _sum_outputs(self):
-        return self._sum("outputs")
+        The unit balance (inputs minus outputs) is written to _unit_balance.
 
-    def _sum_storage_changes(self):
-        return self._sum("storage_changes")
+        Returns:
+            A boolean array, in the preallocated work arrays.
+        """
+        # roll our own np.allclose so we can diagnose the not close points,
+        # in place in the preallocated arrays
+        abs_diff, rel_abs_diff = self._check_work
+        mask_div_zero, abs_close, cond = self._check_masks
+        unit_balance = np.subtract(
+            inputs_sum, outputs_sum, out=self._unit_balance
+        )
+        np.subtract(unit_balance, storage_changes_sum, out=abs_diff)
+        np.abs(abs_diff, out=abs_diff)
+        np.less(storage_changes_sum, epsilon64, out=mask_div_zero)
+        np.copyto(rel_abs_diff, storage_changes_sum)
+        np.copyto(rel_abs_diff, one, where=mask_div_zero)
+        np.divide(abs_diff, rel_abs_diff, out=rel_abs_diff)
+        np.less(abs_diff, self.atol, out=abs_close)
+        # either close, unless dividing by zero
+        np.less(rel_abs_diff, self.rtol, out=cond)
+        np.logical_or(abs_close, cond, out=cond)
+        np.copyto(cond, abs_close, where=mask_div_zero)
+        return cond
+
+    def _imbalance(self, msg: str) -> None:
+        if self.imbalance_fatal:
+            raise ValueError(msg)
+        else:
+            warn(msg, UserWarning)
+        return None
 
     def _calc_unit_balance(self):
         self._zero_sum = True
 
-        # roll our own np.allclose so we can diagnose the not close points
-        unit_balance = self._inputs_sum - self._outputs_sum
-        abs_diff = np.abs(unit_balance - self._storage_changes_sum)
-        mask_div_zero = self._storage_changes_sum < epsilon64
-        rel_abs_diff = abs_diff / np.where(
-            mask_div_zero, one, self._storage_changes_sum
+        cond = self._unit_close(
+            self._inputs_sum, self._outputs_sum, self._storage_changes_sum
         )
-        abs_close = abs_diff < self.atol
-        rel_close = rel_abs_diff < self.rtol
-        either_close = abs_close | rel_close
-        cond = np.where(mask_div_zero, abs_close, either_close)
 
         if not cond.all():
             self._zero_sum = False
@@ -319,12 +719,9 @@ class Budget(Accessor):
                 f"storage at time {self.control.current_time} and at the "
                 f"following locations for {self.description}: {wh_not_cond}"
             )
-            if self.imbalance_fatal:
-                raise ValueError(msg)
-            else:
-                warn(msg, UserWarning)
+            self._imbalance(msg)
 
-        return unit_balance
+        return self._unit_balance
 
     def _calc_global_balance(self):
         global_balance = self._inputs_sum.sum() - self._outputs_sum.sum()
@@ -340,10 +737,7 @@ class Budget(Accessor):
                 "The global flux balance not equal to the change in global "
                 f"storage: {self.description}"
             )
-            if self.imbalance_fatal:
-                raise ValueError(msg)
-            else:
-                warn(msg, UserWarning)
+            self._imbalance(msg)
 
         return global_balance
 
@@ -594,11 +988,14 @@ class Budget(Accessor):
         output_dir: str,
         write_sum_vars: Union[list, bool] = True,
         write_individual_vars: bool = False,
+        buffer_n_times: int = None,
     ) -> None:
         """Initialize NetCDF output
 
         Args:
             output_dir: directory for NetCDF file
+            buffer_n_times: number of time steps to buffer before writing,
+                see NetCdfWrite.
 
         Returns:
             None
@@ -661,6 +1058,7 @@ class Budget(Accessor):
             self._netcdf_output_var_dict,
             self.meta,
             global_attrs=global_attrs,
+            buffer_n_times=buffer_n_times,
         )
         # todo jlm: put terms in to metadata
         return
@@ -673,24 +1071,19 @@ class Budget(Accessor):
 
         """
         if self._output_netcdf:
-            self._netcdf.time[self.control.itime_step] = nc4.date2num(
-                self.control.current_datetime, self._netcdf.time.units
+            itime_step = self.control.itime_step
+            self._netcdf.add_simulation_time(
+                itime_step, self.control.current_datetime
             )
             for nc_group, group_vars in self._netcdf_output_var_dict.items():
                 for nc_var in group_vars:
-                    var_self_name = nc_var
-
+                    # NetCdfWrite.variables are keyed without the group
                     if nc_group is None:
-                        var_path = nc_var
-                        self._netcdf.dataset[var_path][
-                            self.control.itime_step, :
-                        ] = self[var_self_name]
-
+                        data = self[nc_var]
                     else:
-                        var_path = f"{nc_group}/{nc_var}"
-                        self._netcdf.dataset[var_path][
-                            self.control.itime_step, :
-                        ] = self[nc_group][var_self_name]
+                        data = self[nc_group][nc_var]
+
+                    self._netcdf.add_data(nc_var, itime_step, data)
 
         return
 
@@ -92,9 +92,33 @@ class ConservativeProcess(Process):
     def finalize(self) -> None:
         super().finalize()
         if self.budget is not None:
-            self.budget._finalize_netcdf()
+            self.budget.finalize()
         return
 
+    def get_checkpoint_state(self) -> dict:
+        state = super().get_checkpoint_state()
+        if self.budget is not None:
+            for name, values in self.budget.get_checkpoint_state().items():
+                state[f"budget/{name}"] = values
+        return state
+
+    def set_checkpoint_state(self, state: dict) -> None:
+        budget_state = {
+            name[len("budget/") :]: values
+            for name, values in state.items()
+            if name.startswith("budget/")
+        }
+        super().set_checkpoint_state(
+            {
+                name: values
+                for name, values in state.items()
+                if not name.startswith("budget/")
+            }
+        )
+        if self.budget is not None and budget_state:
+            self.budget.set_checkpoint_state(budget_state)
+        return None
+
     @classmethod
     def get_mass_budget_terms(cls) -> dict:
         """Get a dictionary of variable names for mass budget terms."""
@@ -168,6 +192,15 @@ class ConservativeProcess(Process):
                 description=self.name,
                 imbalance_fatal=(self._budget_type == "error"),
                 basis=basis,
+                # the budget of numba processes (the default) is jitted
+                calc_method=(
+                    "numpy"
+                    if getattr(self, "_calc_method", None) == "numpy"
+                    else "numba"
+                ),
+                check_interval=self.control.options.get(
+                    "budget_check_interval", 1
+                ),
             )
         else:
             raise ValueError(f"Illegal behavior: {self._budget_type}")
@@ -190,6 +223,7 @@ class ConservativeProcess(Process):
         separate_files: bool = None,
         budget_args: dict = None,
         output_vars: list = None,
+        buffer_n_times: int = None,
     ) -> None:
         if self._netcdf_initialized:
             msg = (
@@ -203,6 +237,7 @@ class ConservativeProcess(Process):
             output_dir=output_dir,
             separate_files=separate_files,
             output_vars=output_vars,
+            buffer_n_times=buffer_n_times,
         )
 
         if self.budget is not None:
@@ -210,6 +245,8 @@ class ConservativeProcess(Process):
                 budget_args = {}
             budget_args["output_dir"] = self._netcdf_output_dir
             budget_args["params"] = self._params
+            if "buffer_n_times" not in budget_args.keys():
+                budget_args["buffer_n_times"] = self._netcdf_buffer_n_times
 
             self.budget.initialize_netcdf(**budget_args)
 
@@ -28,16 +28,25 @@ from .accessor import Accessor
 # The following are duplicated in the Control docstring below and that
 # docstring needs updated whenever any of these change.
 pws_control_options_avail = [
+    "budget_check_interval",
     "budget_type",
     "calc_method",
+    "channel_routing",
     "dprst_flag",
+    "float_precision",
     # "restart",
     "input_dir",
-    # "load_n_time_batches",
+    "input_memmap",
+    "load_n_time_batches",
+    "load_prefetch",
+    "n_time_chunk",
+    "netcdf_output_buffer_n_times",
     "netcdf_output_dir",
     "netcdf_output_var_names",
     "netcdf_output_separate_files",
+    "numba_num_threads",
     "parameter_file",
+    "soltab_cache_dir",
     "start_time",
     "streamflow_module",
     "time_step_units",
@@ -88,15 +97,43 @@ class Control(Accessor):
         options: a dictionary of global Process options.
 
     Available pywatershed options:
+      * budget_check_interval: int number of time steps between the balance
+        checks of the budgets, which accumulate every time step, default is
+        1 (every time step). See Budget.
       * budget_type: one of [None, "warn", "error"]
       * calc_method: one of ["numpy", "numba", "fortran"]
+      * channel_routing: one of ["serial", "level"] segment routing order of
+        PRMSChannel, see PRMSChannel
       * dprst_flag: boolean if depression storage is included (true) or not.
+      * float_precision: one of ["float64", "float32"] the float type of the
+        parameters, inputs and variables of the Processes, default is
+        "float64". Budgets accumulate in float64 and PRMSChannel routes in
+        float64 regardless.
       * input_dir: str or pathlib.path directory to search for input data
+      * input_memmap: bool if a Model reads the memmap store ``{name}.npy``
+        of an input instead of ``{name}.nc`` when both are in input_dir,
+        unless the NetCDF file is newer than the store. Default is False.
+      * load_n_time_batches: int number of time batches in which to read
+        NetCDF input files, default is 1 (all times read at once)
+      * load_prefetch: bool if the next time batch of NetCDF inputs is read
+        in the background while the current batch is used, only applies
+        when load_n_time_batches > 1
+      * n_time_chunk: int number of times PRMSAtmosphere calculates at once,
+        default is all times
+      * netcdf_output_buffer_n_times: int number of time steps to buffer in
+        memory before (background) writing to NetCDF, None writes every
+        time step
       * netcdf_output_dir: str or pathlib.Path directory for output
       * netcdf_output_var_names: a list of variable names to output
       * netcdf_output_separate_files: bool if output is grouped by Process or
         if each variable is written to an individual file
+      * numba_num_threads: int number of threads of the numba kernels, or a
+        dictionary of process names to ints, default is the
+        NUMBA_NUM_THREADS environment variable. Greater than one compiles
+        the parallel (prange) kernels
       * parameter_file: the name of a parameter file to use
+      * soltab_cache_dir: str or pathlib.Path directory of a cache of solar
+        tables computed by PRMSSolarGeometry
       * streamflow_module: the selected streamflow module in PRMS.
       * start_time: np.datetime64
       * end_time: np.datetime64
@@ -347,6 +384,17 @@ class Control(Accessor):
         result.meta = meta
         return result
 
+    def __getstate__(self) -> dict:
+        # the meta module is not pickled but restored on unpickling
+        state = self.__dict__.copy()
+        del state["meta"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.meta = meta
+        return None
+
     @property
     def current_time(self) -> np.datetime64:
         """Get the current time."""
@@ -448,6 +496,31 @@ class Control(Accessor):
 
         return None
 
+    def edit_start_time(self, new_start_time: np.datetime64) -> None:
+        """Supply a new start time for the simulation, e.g. to restart it.
+
+        The end time is kept and the current time is reset to one time step
+        before the new start time.
+
+        Args:
+            new_start_time: the new time at which to start the simulation.
+        """
+        n_times_m1 = (self._end_time - new_start_time) / self._time_step
+        if n_times_m1 < 0 or n_times_m1 != int(n_times_m1):
+            msg = (
+                f"new_start_time {new_start_time} is not a time step before "
+                f"end_time {self._end_time}"
+            )
+            raise ValueError(msg)
+
+        self._start_time = new_start_time
+        self._n_times = int(n_times_m1) + 1
+        self._init_time = self._start_time - self._time_step
+        self._current_time = self._init_time
+        self._previous_time = None
+        self._itime_step = -1
+        return None
+
     def edit_end_time(self, new_end_time: np.datetime64) -> None:
         """Supply a new end time for the simulation.
 
@@ -374,6 +374,47 @@ class DatasetDict(Accessor):
             self.to_nc4_ds(filename)
         return
 
+    def to_memmap(self, output_dir: fileish, variables: list = None) -> list:
+        """Write data variables to memmap stores (one .npy per variable).
+
+        Only variables with a first dimension of "time" or "doy" can be
+        written, these are the default. See
+        :mod:`pywatershed.utils.memmap_utils`.
+
+        Returns:
+            A list of the paths of the .npy files written.
+        """
+        from ..utils.memmap_utils import time_dims, write_memmap
+
+        if variables is None:
+            variables = [
+                vv
+                for vv in self.data_vars.keys()
+                if len(self.metadata[vv]["dims"])
+                and self.metadata[vv]["dims"][0] in time_dims
+            ]
+
+        npy_files = []
+        for vv in variables:
+            dims = tuple(self.metadata[vv]["dims"])
+            npy_files += [
+                write_memmap(
+                    output_dir,
+                    vv,
+                    self.data_vars[vv],
+                    dims,
+                    time=self.coords.get("time"),
+                    doy=self.coords.get("doy"),
+                    coords={
+                        dd: self.coords[dd]
+                        for dd in dims[1:]
+                        if dd in self.coords.keys()
+                    },
+                    attrs=self.metadata[vv].get("attrs", {}),
+                )
+            ]
+        return npy_files
+
     def rename_dim(self, name_maps: dict, in_place: bool = True):
         """Rename dimensions."""
         if not in_place:
@@ -612,8 +653,12 @@ class DatasetDict(Accessor):
             if vk == wh_data_name:
                 continue
             var_dims = self.metadata[vk]["dims"]
+            # index along the coordinate dims wherever they are in the var
             var_wh = tuple(
-                [dim_where[dd] for dd in var_dims if dd in dim_where.keys()]
+                [
+                    dim_where[dd] if dd in dim_where.keys() else slice(None)
+                    for dd in var_dims
+                ]
             )
             if vk in self.coords.keys():
                 self["coords"][vk] = self.variables[vk][var_wh]
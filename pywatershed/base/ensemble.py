@@ -0,0 +1,455 @@
+"""Ensembles of models run on a pool of worker processes.
+
+For ensembles which EnsembleModel can not stack in one model, e.g. members
+with different processes or calc_method, run_ensemble runs each member as
+its own Model on a ProcessPoolExecutor. The input files and the parameters
+of the base model are read once and placed in shared memory from which the
+workers build their models without copies.
+"""
+
+import multiprocessing as mp
+import pathlib as pl
+import tempfile
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from copy import deepcopy
+from multiprocessing import shared_memory
+from time import perf_counter
+from typing import NamedTuple, Union
+from warnings import warn
+
+import numpy as np
+from tqdm.auto import tqdm
+
+from ..constants import fileish
+from .adapter import AdapterNdarray, adapter_factory, netcdf_load_options
+from .control import Control
+from .model import Model
+from .parameters import Parameters
+
+member_keys = ("control", "parameters", "model_order")
+
+# the shared memory of the base model attached in a worker
+_worker_shared = {}
+
+
+class _SharedArray(NamedTuple):
+    name: str
+    shape: tuple
+    dtype: str
+
+
+class _SharedParameters(NamedTuple):
+    key: str
+
+
+def _base_file_inputs(model_dict: dict) -> set:
+    procs = [
+        vv["class"]
+        for vv in model_dict.values()
+        if isinstance(vv, dict) and "class" in vv.keys()
+    ]
+    return set(
+        input for proc in procs for input in proc.get_inputs()
+    ).difference(var for proc in procs for var in proc.get_variables())
+
+
+def _share_array(array: np.ndarray, blocks: list) -> _SharedArray:
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    blocks.append(shm)
+    np.ndarray(array.shape, array.dtype, buffer=shm.buf)[...] = array
+    return _SharedArray(shm.name, array.shape, array.dtype.str)
+
+
+def _share_parameters(params: Parameters, blocks: list) -> dict:
+    data = deepcopy(params.to_dd(copy=False).data)
+    for group in ["coords", "data_vars"]:
+        for name, values in data[group].items():
+            values = np.asarray(values)
+            if values.dtype.kind in "biuf":
+                data[group][name] = _share_array(values, blocks)
+    return {"class": type(params), "data": data}
+
+
+def _share_model_dict(model_dict: dict, blocks: list) -> tuple:
+    """Put the parameters and file inputs of a model dict in shared memory."""
+    shared = {"parameters": {}, "inputs": {}}
+    model_spec = {}
+    param_keys = {}
+    for key, val in model_dict.items():
+        if isinstance(val, Parameters):
+            params = [val]
+        elif isinstance(val, dict) and "parameters" in val.keys():
+            params = [val["parameters"]]
+        else:
+            params = []
+        for pp in params:
+            if id(pp) not in param_keys:
+                param_keys[id(pp)] = _SharedParameters(str(len(param_keys)))
+                shared["parameters"][param_keys[id(pp)].key] = (
+                    _share_parameters(pp, blocks)
+                )
+        if isinstance(val, Parameters):
+            model_spec[key] = param_keys[id(val)]
+        elif params:
+            model_spec[key] = {**val, "parameters": param_keys[id(params[0])]}
+        else:
+            model_spec[key] = val
+
+    control = [vv for vv in model_dict.values() if isinstance(vv, Control)][0]
+    input_dir = pl.Path(control.options["input_dir"]).resolve()
+    input_memmap = control.options.get("input_memmap", False)
+    for name in _base_file_inputs(model_dict):
+        input_path = input_dir / f"{name}.nc"
+        if input_memmap:
+            input_path = Model._memmap_input_path(input_path)
+        adapter = adapter_factory(
+            input_path, name, control=control, **netcdf_load_options(control)
+        )
+        shared["inputs"][name] = (
+            _share_array(np.asarray(adapter.data), blocks),
+            np.asarray(adapter.time),
+        )
+        adapter.close()
+
+    return model_spec, shared
+
+
+def _attach_array(array: Union[_SharedArray, np.ndarray]) -> np.ndarray:
+    if not isinstance(array, _SharedArray):
+        return array
+    shm = shared_memory.SharedMemory(name=array.name)
+    _worker_shared.setdefault("blocks", []).append(shm)
+    view = np.ndarray(array.shape, np.dtype(array.dtype), buffer=shm.buf)
+    view.flags.writeable = False
+    return view
+
+
+def _init_worker(shared: dict) -> None:
+    """Attach the shared memory of the base model in a worker process."""
+    _worker_shared["parameters"] = {}
+    for key, spec in shared["parameters"].items():
+        data = spec["data"]
+        for group in ["coords", "data_vars"]:
+            for name, values in data[group].items():
+                data[group][name] = _attach_array(values)
+        _worker_shared["parameters"][key] = spec
+
+    _worker_shared["inputs"] = {
+        name: (_attach_array(data), time)
+        for name, (data, time) in shared["inputs"].items()
+    }
+    return None
+
+
+def _member_model_dict(model_spec: dict, member: dict) -> dict:
+    """The model dict of a member on the shared memory of the worker."""
+    param_values = member.get("parameters", {})
+    params = {}
+    for key, spec in _worker_shared["parameters"].items():
+        # copy the dictionaries of the parameters but not their arrays
+        arrays = {
+            id(values): values
+            for group in ["coords", "data_vars"]
+            for values in spec["data"][group].values()
+        }
+        data = deepcopy(spec["data"], memo=arrays)
+        for name, values in param_values.items():
+            if name in data["data_vars"]:
+                shared_values = data["data_vars"][name]
+                values = np.asarray(values, dtype=shared_values.dtype)
+                if values.shape != shared_values.shape:
+                    msg = (
+                        f"Parameter '{name}' has shape {values.shape}, "
+                        f"expected {shared_values.shape}"
+                    )
+                    raise ValueError(msg)
+                data["data_vars"][name] = values
+        params[key] = spec["class"](**data, copy=False)
+
+    model_order = member.get("model_order")
+    model_dict = {}
+    for key, val in model_spec.items():
+        if isinstance(val, Control):
+            control = deepcopy(val)
+            control.options.update(member.get("control", {}))
+            # the outputs of the members are written by run_ensemble
+            control.options.pop("netcdf_output_dir", None)
+            control.options.pop("netcdf_output_var_names", None)
+            model_dict[key] = control
+        elif isinstance(val, _SharedParameters):
+            model_dict[key] = params[val.key]
+        elif isinstance(val, dict):
+            if model_order is None or key in model_order:
+                model_dict[key] = {
+                    **val,
+                    "parameters": params[val["parameters"].key],
+                }
+        elif isinstance(val, list) and model_order is not None:
+            model_dict[key] = list(model_order)
+        else:
+            model_dict[key] = val
+
+    return model_dict
+
+
+def _run_member(
+    imember: int,
+    member: dict,
+    model_spec: dict,
+    member_dir: Union[pl.Path, None],
+    output_vars: Union[list, None],
+    progress,
+) -> dict:
+    """Run a member in a worker process, returning its timings."""
+    start = perf_counter()
+    model = Model(
+        _member_model_dict(model_spec, member), find_input_files=False
+    )
+    control = model.control
+    model._set_file_input_adapters(
+        {
+            name: AdapterNdarray(data, name, time, control)
+            for name, (data, time) in _worker_shared["inputs"].items()
+            if name in model._file_input_names
+        }
+    )
+    if member_dir is not None:
+        model.initialize_netcdf(member_dir, output_vars=output_vars)
+    init_time = perf_counter() - start
+
+    n_report = max(control.n_times // 100, 1)
+    for istep in range(control.n_times):
+        model.advance()
+        model.calculate()
+        model.output()
+        if (istep + 1) % n_report == 0 or istep == control.n_times - 1:
+            progress.put((imember, istep + 1))
+
+    model.finalize()
+    return {
+        "init_time": init_time,
+        "run_time": perf_counter() - start - init_time,
+    }
+
+
+def _format_error(error: Exception) -> str:
+    # with the traceback of the worker, the cause of the exception
+    return "".join(
+        traceback.format_exception(type(error), error, error.__traceback__)
+    )
+
+
+def _track_progress(progress, n_members: int, n_times: int) -> None:
+    steps = np.zeros(n_members, dtype=int)
+    with tqdm(total=n_members * n_times) as pbar:
+        while True:
+            report = progress.get()
+            if report is None:
+                return
+            imember, istep = report
+            # a retried member starts over
+            pbar.update(max(istep - steps[imember], 0))
+            steps[imember] = max(istep, steps[imember])
+
+
+def _gather_outputs(
+    member_dirs: dict, output_vars: list, output_file: fileish
+) -> None:
+    import xarray as xr
+
+    data_arrays = {}
+    for var in output_vars:
+        members = [
+            imember
+            for imember, member_dir in member_dirs.items()
+            if (member_dir / f"{var}.nc").exists()
+        ]
+        if not members:
+            continue
+        member_data = []
+        for imember in members:
+            with xr.open_dataarray(member_dirs[imember] / f"{var}.nc") as da:
+                member_data.append(da.load())
+        data = xr.concat(member_data, dim="member").assign_coords(
+            member=members
+        )
+        data_arrays[var] = data.transpose(data.dims[1], "member", ...)
+
+    xr.Dataset(data_arrays).to_netcdf(output_file)
+    return None
+
+
+def run_ensemble(
+    model_dict: Union[dict, fileish],
+    members: list,
+    output_vars: list = None,
+    output_file: fileish = None,
+    max_workers: int = None,
+    n_retries: int = 1,
+) -> list:
+    """Run an ensemble of models on a pool of worker processes.
+
+    Each member is a Model built from the base model dict with the
+    perturbations of the member, run in a worker process of a
+    ProcessPoolExecutor. The parameters of the model dict and its input
+    files (in the control input_dir) are read once and placed in shared
+    memory, from which the workers build their models without copies or
+    reading files. The members share the simulation times of the base
+    control.
+
+    A member is a dictionary with the optional keys:
+
+    * control: a dictionary of control options to set.
+    * parameters: a dictionary of parameter values by name to replace in
+      all the Parameters of the model dict which have them.
+    * model_order: a list of the processes of the model dict to run, in
+      order, e.g. a subset of the processes. Their file inputs must be
+      file inputs of the base model.
+
+    The workers report the progress of the members (a progress bar over all
+    member time steps). A member raising an exception is retried up to
+    n_retries times after the other members ran. The selected outputs of
+    the members which succeeded are gathered in a single NetCDF file with a
+    member dimension: (time, member, nhm_id) or (time, member, nhm_seg).
+
+    Args:
+        model_dict: A model dictionary (see `Model`) or a yaml file of one
+            (see `Model.from_yaml`).
+        members: A list of the member dictionaries.
+        output_vars: The variables to gather in output_file.
+        output_file: The NetCDF file of the gathered outputs.
+        max_workers: The number of worker processes, defaults to the number
+            of cpus.
+        n_retries: The number of retries of a member which failed.
+
+    Returns:
+        A list of dictionaries, one per member, with the "attempts",
+        "init_time" and "run_time" (in seconds) of the member and its
+        "error", the traceback of its last failure or None.
+
+    Examples:
+    ---------
+
+    >>> import numpy as np
+    >>> import pywatershed as pws
+    >>> model_dict = pws.Model.model_dict_from_yaml("model.yaml")
+    >>> members = [
+    ...     {"control": {"calc_method": "numpy"}},
+    ...     {"control": {"calc_method": "numba"}},
+    ...     {"parameters": {"soil_moist_max": np.full(765, 3.0)}},
+    ... ]
+    >>> reports = pws.run_ensemble(
+    ...     model_dict,
+    ...     members,
+    ...     output_vars=["soil_moist"],
+    ...     output_file="ensemble.nc",
+    ... )
+
+    """
+    if isinstance(model_dict, (str, pl.Path)):
+        model_dict = Model.model_dict_from_yaml(model_dict)
+    if (output_vars is None) != (output_file is None):
+        raise ValueError("output_vars and output_file are required together")
+
+    param_names = set(
+        name
+        for val in model_dict.values()
+        for params in (
+            [val["parameters"]]
+            if isinstance(val, dict) and "parameters" in val.keys()
+            else [val]
+            if isinstance(val, Parameters)
+            else []
+        )
+        for name in params.data_vars.keys()
+    )
+    for imember, member in enumerate(members):
+        unknown = set(member.keys()).difference(member_keys)
+        if unknown:
+            msg = f"Member {imember} has unknown keys {sorted(unknown)}"
+            raise ValueError(msg)
+        unknown = set(member.get("parameters", {})).difference(param_names)
+        if unknown:
+            msg = f"Member {imember} has unknown parameters {sorted(unknown)}"
+            raise ValueError(msg)
+
+    control = [vv for vv in model_dict.values() if isinstance(vv, Control)][0]
+    n_members = len(members)
+    reports = [
+        {"attempts": 0, "init_time": None, "run_time": None, "error": None}
+        for member in members
+    ]
+
+    ctx = mp.get_context("spawn")
+    blocks = []
+    with tempfile.TemporaryDirectory() as tmp_dir, ctx.Manager() as manager:
+        member_dirs = {}
+        if output_file is not None:
+            member_dirs = {
+                imember: pl.Path(tmp_dir) / f"member_{imember}"
+                for imember in range(n_members)
+            }
+        progress = manager.Queue()
+        tracker = threading.Thread(
+            target=_track_progress,
+            args=(progress, n_members, control.n_times),
+            daemon=True,
+        )
+        tracker.start()
+        try:
+            model_spec, shared = _share_model_dict(model_dict, blocks)
+            to_run = list(range(n_members))
+            while to_run:
+                with ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=ctx,
+                    initializer=_init_worker,
+                    initargs=(shared,),
+                ) as executor:
+                    futures = {
+                        executor.submit(
+                            _run_member,
+                            imember,
+                            members[imember],
+                            model_spec,
+                            member_dirs.get(imember),
+                            output_vars,
+                            progress,
+                        ): imember
+                        for imember in to_run
+                    }
+                    to_run = []
+                    for future in as_completed(futures):
+                        imember = futures[future]
+                        report = reports[imember]
+                        report["attempts"] += 1
+                        try:
+                            report.update(future.result())
+                            report["error"] = None
+                        except Exception as error:
+                            report["error"] = _format_error(error)
+                            if report["attempts"] <= n_retries:
+                                to_run.append(imember)
+        finally:
+            progress.put(None)
+            tracker.join()
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+        failed = [ii for ii, rr in enumerate(reports) if rr["error"]]
+        if failed:
+            warn(
+                f"Ensemble members {failed} failed after "
+                f"{n_retries + 1} attempts"
+            )
+        if output_file is not None:
+            _gather_outputs(
+                {ii: dd for ii, dd in member_dirs.items() if ii not in failed},
+                output_vars,
+                output_file,
+            )
+
+    return reports
@@ -0,0 +1,292 @@
+"""Parameter ensembles advanced by a single model.
+
+The HRUs (and stream segments) of the PRMS processes are independent in
+their kernels up to the channel routing along tosegment. The members of a
+parameter ensemble stacked along the nhru and nsegment dimensions are then
+a single domain of M disconnected copies of the stream network which one
+Model advances in a single pass over member x HRU, sharing the reads of the
+input files.
+"""
+
+import pathlib as pl
+from typing import Union
+from warnings import warn
+
+import numpy as np
+
+from ..constants import fileish
+from ..parameters import PrmsParameters
+from ..utils.netcdf_utils import NetCdfWrite
+from .adapter import AdapterTile
+from .control import Control
+from .model import Model
+
+member_dims = ("nhru", "nsegment", "nssr", "ngw")
+segment_index_params = ("tosegment", "hru_segment")
+# used as scalars by PRMSSnow, on nhru in the files of single HRU domains
+scalar_params = ("albset_rna", "albset_rnm", "albset_sna", "albset_snm")
+
+
+def stack_parameters(parameters_list: list) -> PrmsParameters:
+    """Stack the parameters of ensemble members along nhru and nsegment.
+
+    The members are concatenated along the nhru and nsegment dimensions
+    (and nssr and ngw), member m taking the indices [m * n, (m + 1) * n).
+    The segment indices of tosegment and hru_segment are offset to the
+    segments of their member. Parameters on other dimensions (scalars,
+    depletion curves, POIs) are shared and must be equal for all members,
+    as are the albedo reset parameters of PRMSSnow (albset_*).
+
+    Args:
+        parameters_list: a list of the PrmsParameters of the members, on
+            the same domain.
+
+    Returns:
+        The PrmsParameters of the stacked members.
+    """
+    n_members = len(parameters_list)
+    if n_members == 0:
+        raise ValueError("parameters_list has no members")
+
+    dds = [params.to_dd() for params in parameters_list]
+    stacked = dds[0]
+    for imember, dd in enumerate(dds[1:], start=1):
+        if dd.dims != stacked.dims:
+            msg = f"Dimensions of member {imember} differ from member 0"
+            raise ValueError(msg)
+
+    n_segments = stacked.dims.get("nsegment", 0)
+    for var_name in stacked.variables:
+        dims = stacked.metadata[var_name]["dims"]
+        group = "coords" if var_name in stacked.coords else "data_vars"
+        values = [getattr(dd, group)[var_name] for dd in dds]
+        axes = [idim for idim, dd in enumerate(dims) if dd in member_dims]
+        if var_name in scalar_params and np.size(values[0]) == 1:
+            axes = []
+            stacked.metadata[var_name]["dims"] = ("scalar",)
+            stacked.dims.setdefault("scalar", 1)
+
+        if not axes:
+            equal_nan = np.issubdtype(np.asarray(values[0]).dtype, np.floating)
+            for imember, vv in enumerate(values[1:], start=1):
+                if not np.array_equal(values[0], vv, equal_nan=equal_nan):
+                    msg = (
+                        f"Parameter '{var_name}' on dimensions {dims} differs "
+                        f"between member 0 and member {imember}"
+                    )
+                    raise ValueError(msg)
+            continue
+
+        if var_name in segment_index_params:
+            values = [
+                np.where(vv > 0, vv + imember * n_segments, vv)
+                for imember, vv in enumerate(values)
+            ]
+        getattr(stacked, group)[var_name] = np.concatenate(
+            values, axis=axes[0]
+        )
+
+    for dim in member_dims:
+        if dim in stacked.dims:
+            stacked.dims[dim] *= n_members
+
+    return PrmsParameters.from_dict(stacked.data)
+
+
+class EnsembleModel(Model):
+    """Run an ensemble of parameter sets with a single PRMS model.
+
+    The parameters of the M members are stacked along the nhru and nsegment
+    dimensions (see `stack_parameters`) and the processes advance all the
+    members in each time step, their kernels looping over member x HRU.
+    The input files are read once and repeated for every member (see
+    `AdapterTile`) and the solar tables of PRMSSolarGeometry are computed
+    once for the HRUs of the members with the same hru_slope, hru_aspect
+    and hru_lat. The NetCDF output of the model has a member dimension,
+    (time, member, nhm_id) or (time, member, nhm_seg), one file per
+    variable.
+
+    The members can only differ in their parameters on the nhru and
+    nsegment dimensions (e.g. soil_moist_max, gwflow_coef or
+    tmax_cbh_adj): parameters on other dimensions are shared.
+
+    Args:
+        process_list: a list of the PRMS process classes of the model.
+        control: the Control object of the model.
+        parameters_list: a list of the PrmsParameters of the members, on
+            the same domain.
+        find_input_files: see `Model`.
+        write_control: see `Model`.
+
+    Examples:
+    ---------
+
+    >>> import pywatershed as pws
+    >>> test_data_dir = pws.constants.__pywatershed_root__ / "../test_data"
+    >>> domain_dir = test_data_dir / "drb_2yr"
+    >>> control = pws.Control.load_prms(
+    ...     domain_dir / "control.test", warn_unused_options=False
+    ... )
+    >>> control.options["input_dir"] = domain_dir
+    >>> params = pws.parameters.PrmsParameters.load(
+    ...     domain_dir / "myparam.param"
+    ... )
+    >>> members = []
+    >>> for factor in [0.8, 1.0, 1.2]:
+    ...     params_dd = params.to_dd()
+    ...     params_dd.data_vars["soil_moist_max"] *= factor
+    ...     members.append(
+    ...         pws.parameters.PrmsParameters.from_dict(params_dd.data)
+    ...     )
+    >>> model = pws.EnsembleModel(
+    ...     [pws.PRMSSolarGeometry, pws.PRMSAtmosphere, pws.PRMSCanopy],
+    ...     control=control,
+    ...     parameters_list=members,
+    ... )
+    >>> model.run(netcdf_dir="ensemble", output_vars=["net_ppt"])
+    model initializing NetCDF output
+    100%|█████████████████████████████████████████████████████████| 731/731 [00:02<00:00, 301.27it/s]
+    model.run(): finalizing
+    >>> model.get_member_values("net_ppt").shape
+    (3, 765)
+
+    """  # noqa: E501
+
+    def __init__(
+        self,
+        process_list: list,
+        control: Control,
+        parameters_list: list,
+        find_input_files: bool = True,
+        write_control: Union[bool, str, pl.Path] = False,
+    ):
+        self.n_members = len(parameters_list)
+        self.member_coords = parameters_list[0].coords
+        self._member_netcdf = {}
+        super().__init__(
+            process_list,
+            control=control,
+            parameters=stack_parameters(parameters_list),
+            find_input_files=find_input_files,
+            write_control=write_control,
+        )
+        return
+
+    def _set_file_input_adapters(self, file_inputs: dict) -> None:
+        # read the inputs of the domain once for all the members
+        tiled = {
+            name: AdapterTile(adapter, self.n_members)
+            for name, adapter in file_inputs.items()
+        }
+        super()._set_file_input_adapters(tiled)
+        return
+
+    def get_member_values(self, var_name: str) -> np.ndarray:
+        """The current values of a variable, (n_members, n) for each member.
+
+        Args:
+            var_name: the name of a variable of a process of the model.
+        """
+        for proc in self.processes.values():
+            if var_name in proc.get_variables():
+                values = proc[var_name]
+                values = getattr(values, "current", values)
+                return np.reshape(values, (self.n_members, -1))
+
+        raise KeyError(f"{var_name} is not a variable of the model")
+
+    def initialize_netcdf(
+        self,
+        output_dir: fileish = None,
+        separate_files: bool = None,
+        budget_args: dict = None,
+        output_vars: list = None,
+        buffer_n_times: int = None,
+    ):
+        """Initialize the NetCDF output files of the members.
+
+        Each variable is written to a file with a member dimension. Process
+        variables on the doy dimension (PRMSSolarGeometry) are not written.
+
+        Args:
+            output_dir: pl.Path or str of the directory where to write files
+            separate_files: only separate files are supported.
+            budget_args: budget output is not supported.
+            output_vars: A list of variables to write. Unrecognized variable
+                names are silently skipped. Defaults to None which writes
+                all variables for all Processes.
+            buffer_n_times: see `Model.initialize_netcdf`.
+        """
+        print("model initializing NetCDF output")
+
+        if not self._found_input_files:
+            self._find_input_files()
+
+        if separate_files is False:
+            warn("EnsembleModel only writes separate files, ignoring")
+        if budget_args is not None:
+            warn("EnsembleModel does not write budgets, ignoring budget_args")
+
+        opts = self.control.options
+        if output_dir is None:
+            output_dir = self._default_nc_out_dir
+        if output_dir is None:
+            raise ValueError("An output_dir is required for NetCDF output")
+        output_dir = pl.Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        if output_vars is None:
+            output_vars = opts.get("netcdf_output_var_names")
+        if buffer_n_times is None:
+            buffer_n_times = opts.get("netcdf_output_buffer_n_times")
+
+        for cls in self.process_order:
+            proc = self.processes[cls]
+            for var_name in proc.get_variables():
+                if output_vars is not None and var_name not in output_vars:
+                    continue
+                if "ndoy" in proc.meta[var_name]["dims"]:
+                    continue
+                self._member_netcdf[(cls, var_name)] = NetCdfWrite(
+                    output_dir / f"{var_name}.nc",
+                    self.member_coords,
+                    [var_name],
+                    {var_name: proc.meta[var_name]},
+                    {"process class": proc.name},
+                    buffer_n_times=buffer_n_times,
+                    n_members=self.n_members,
+                )
+
+        self._netcdf_initialized = True
+        return
+
+    def _output_members(self) -> None:
+        for (cls, var_name), writer in self._member_netcdf.items():
+            values = self.processes[cls][var_name]
+            writer.add_simulation_time(
+                self.control.itime_step, self.control.current_datetime
+            )
+            writer.add_data(
+                var_name,
+                self.control.itime_step,
+                getattr(values, "current", values),
+            )
+        return None
+
+    def step_plan(self) -> list:
+        plan = super().step_plan()
+        if self._member_netcdf:
+            plan += [("EnsembleModel", "output", self._output_members)]
+        return plan
+
+    def output(self):
+        """Output the model at the current time."""
+        super().output()
+        self._output_members()
+        return
+
+    def finalize(self):
+        """Finalize the model."""
+        super().finalize()
+        for writer in self._member_netcdf.values():
+            writer.close()
+        return
@@ -8,13 +8,17 @@ not a class.
 
 """
 
+import os
 import pathlib as pl
+import pickle
+import tempfile
 from typing import Iterable, Union
 
 import numpy as np
 import yaml
 
 from ..constants import __pywatershed_root__
+from ..version import __version__
 
 varoptions = Union[str, list, tuple]
 
@@ -23,6 +27,14 @@ control_file = __pywatershed_root__ / "static/metadata/control.yaml"
 params_file = __pywatershed_root__ / "static/metadata/parameters.yaml"
 vars_file = __pywatershed_root__ / "static/metadata/variables.yaml"
 
+# the parsed metadata are cached in a pickle, like bytecode in __pycache__
+cache_file = (
+    __pywatershed_root__ / "static/metadata/__pycache__/metadata.pickle"
+)
+
+# the C loader (when pyyaml is built with libyaml) is much faster
+_yaml_loader = getattr(yaml, "CLoader", yaml.Loader)
+
 
 def load_yaml_file(the_file: pl.Path) -> dict:
     """Load a yaml file
@@ -35,7 +47,7 @@ def load_yaml_file(the_file: pl.Path) -> dict:
 
     """
     with pl.Path(the_file).open("r") as file_stream:
-        data = yaml.load(file_stream, Loader=yaml.Loader)
+        data = yaml.load(file_stream, Loader=_yaml_loader)
     return data
 
 
@@ -53,10 +65,85 @@ def _dims_to_tuples(dd):
     return result
 
 
-dimensions = _dims_to_tuples(load_yaml_file(dims_file))
-control = _dims_to_tuples(load_yaml_file(control_file))
-parameters = _dims_to_tuples(load_yaml_file(params_file))
-variables = _dims_to_tuples(load_yaml_file(vars_file))
+def _cache_key() -> tuple:
+    return (
+        __version__,
+        *(
+            (ff.name, ff.stat().st_mtime_ns, ff.stat().st_size)
+            for ff in (dims_file, control_file, params_file, vars_file)
+        ),
+    )
+
+
+def load_metadata(use_cache: bool = True) -> dict:
+    """Load the static metadata, from the cache when it is current
+
+    The metadata yaml files are parsed and the result is pickled to
+    cache_file, which is used instead of parsing the files as long as the
+    modification times and sizes of the yaml files and the pywatershed version
+    are unchanged. If the cache can not be written (e.g. a read-only install)
+    the files are parsed on every import.
+
+    Args:
+        use_cache: read and write the cache?
+
+    Returns:
+        metadata: dictionary with keys dimensions, control, parameters, and
+          variables.
+
+    """
+    key = _cache_key()
+    if use_cache and cache_file.exists():
+        try:
+            with cache_file.open("rb") as file_stream:
+                cached = pickle.load(file_stream)
+            if cached["key"] == key:
+                return cached["metadata"]
+        except Exception:
+            pass
+
+    metadata = {
+        "dimensions": _dims_to_tuples(load_yaml_file(dims_file)),
+        "control": _dims_to_tuples(load_yaml_file(control_file)),
+        "parameters": _dims_to_tuples(load_yaml_file(params_file)),
+        "variables": _dims_to_tuples(load_yaml_file(vars_file)),
+    }
+
+    if use_cache:
+        # write to a temporary file and rename so concurrent imports never
+        # read a partial cache
+        tmp_name = None
+        try:
+            cache_file.parent.mkdir(exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                dir=cache_file.parent, delete=False
+            ) as file_stream:
+                tmp_name = file_stream.name
+                pickle.dump(
+                    {"key": key, "metadata": metadata},
+                    file_stream,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(tmp_name, cache_file)
+            tmp_name = None
+        except (OSError, pickle.PicklingError):
+            pass
+        finally:
+            # a failed write does not leave its temporary file behind
+            if tmp_name is not None:
+                try:
+                    os.unlink(tmp_name)
+                except OSError:
+                    pass
+
+    return metadata
+
+
+_metadata = load_metadata()
+dimensions = _metadata["dimensions"]
+control = _metadata["control"]
+parameters = _metadata["parameters"]
+variables = _metadata["variables"]
 
 
 def meta_netcdf_type(meta_item: dict) -> str:
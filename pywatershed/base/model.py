@@ -1,12 +1,23 @@
 import pathlib as pl
 from copy import deepcopy
 from datetime import datetime
+from time import perf_counter
 from typing import Union
+from warnings import warn
 
+import numpy as np
+import pandas as pd
 from tqdm.auto import tqdm
 
-from ..base.adapter import adapter_factory
+from ..base.adapter import (
+    AdapterOnedarray,
+    adapter_factory,
+    netcdf_load_options,
+)
+from ..base.conservative_process import ConservativeProcess
 from ..base.control import Control
+from ..base.process import Process
+from ..base.timing import StepTimer
 from ..constants import fileish
 from ..parameters import Parameters, PrmsParameters
 from ..utils.path import path_rel_to_yaml
@@ -332,10 +343,12 @@ class Model:
         self._connect_procs()
 
         self._found_input_files = False
+        self._file_input_adapters = {}
         if find_input_files:
             self._find_input_files()
 
         self._netcdf_initialized = False
+        self._step_timer = None
         opts = self.control.options
         if "netcdf_output_dir" in opts.keys():
             self._default_nc_out_dir = opts["netcdf_output_dir"]
@@ -432,7 +445,8 @@ class Model:
                         # check?
 
         # If inputs dont come from other processes, assume they come from
-        # file in input_dir. Exception is that PRMSAtmosphere requires its
+        # file in input_dir (a memmap store, name.npy, if present else
+        # name.nc). Exception is that PRMSAtmosphere requires its
         # files on init, so dont adapt these
         file_input_names = set([])
         for k0, v0 in inputs_from.items():
@@ -455,6 +469,7 @@ class Model:
     def _init_procs(self):
         # instantiate processes: instance dict
         self.processes = {}
+        self._init_seconds = {}
         for proc_name in self.model_dict[self._order_name]:
             # establish the args for init
             proc_specs = self.model_dict[proc_name]
@@ -475,7 +490,9 @@ class Model:
                 **process_inputs,
             }
 
+            start = perf_counter()
             self.processes[proc_name] = self._proc_dict[proc_name](**args)
+            self._init_seconds[proc_name] = perf_counter() - start
 
         # <
         return
@@ -514,25 +531,55 @@ class Model:
 
     def _find_input_files(self) -> None:
         file_inputs = {}
+        load_opts = netcdf_load_options(self.control)
+        input_memmap = self.control.options.get("input_memmap", False)
         for name in self._file_input_names:
-            nc_path = self._input_dir / f"{name}.nc"
+            input_path = self._input_dir / f"{name}.nc"
+            if input_memmap:
+                input_path = self._memmap_input_path(input_path)
             file_inputs[name] = adapter_factory(
-                nc_path,
+                input_path,
                 name,
                 control=self.control,
+                **load_opts,
             )
+        self._set_file_input_adapters(file_inputs)
+        return
+
+    def _set_file_input_adapters(self, file_inputs: dict) -> None:
+        """Set the adapters of the inputs not from other processes."""
         for process in self.process_order:
             for input, frm in self._inputs_from[process].items():
                 if not frm:
-                    fname = file_inputs[input]._fname
+                    fname = getattr(file_inputs[input], "_fname", None)
                     self.process_input_from[process][input] = fname
                     self.processes[process].set_input_to_adapter(
                         input, file_inputs[input]
                     )
 
+        self._file_input_adapters = file_inputs
         self._found_input_files = True
         return
 
+    @staticmethod
+    def _memmap_input_path(nc_path: pl.Path) -> pl.Path:
+        """The memmap store of a netcdf input when present and up to date."""
+        npy_path = nc_path.with_suffix(".npy")
+        if not npy_path.exists():
+            return nc_path
+        sidecar_path = npy_path.with_suffix(".json")
+        if (
+            nc_path.exists()
+            and nc_path.stat().st_mtime > sidecar_path.stat().st_mtime
+        ):
+            msg = (
+                f"{nc_path} is newer than the memmap store {npy_path}, "
+                f"using {nc_path}"
+            )
+            warn(msg)
+            return nc_path
+        return npy_path
+
     @staticmethod
     def model_dict_from_yaml(yaml_file: Union[str, pl.Path]) -> dict:
         """Generate a model dictionary from a yaml file.
@@ -642,6 +689,7 @@ class Model:
         separate_files: bool = None,
         budget_args: dict = None,
         output_vars: list = None,
+        buffer_n_times: int = None,
     ):
         """Initialize NetCDF output files for model (all processes).
 
@@ -654,6 +702,11 @@ class Model:
             output_vars: A list of variables to write. Unrecognized variable
                 names are silently skipped. Defaults to None which writes
                 all variables for all Processes.
+            buffer_n_times: The number of time steps to buffer in memory
+                for each variable before writing a block to file on a
+                background thread. Defaults to None which writes every time
+                step as it is output. Also set by the control option
+                "netcdf_output_buffer_n_times".
         """
         print("model initializing NetCDF output")
 
@@ -666,6 +719,7 @@ class Model:
                 separate_files=separate_files,
                 budget_args=budget_args,
                 output_vars=output_vars,
+                buffer_n_times=buffer_n_times,
             )
         self._netcdf_initialized = True
         return
@@ -676,6 +730,8 @@ class Model:
         finalize: bool = True,
         n_time_steps: int = None,
         output_vars: list = None,
+        timings: bool = False,
+        trace_file: fileish = None,
     ):
         """Run the model.
 
@@ -694,6 +750,13 @@ class Model:
                Default is to finalize.
             n_time_steps: the number of timesteps to run
             output_vars: the vars to output to the netcdf_dir
+            timings: time the phases of every process (see
+               `Model.timings`). The time loop runs the calls of
+               `Model.step_plan`, timing each. Untimed runs are not
+               instrumented.
+            trace_file: optional path of a csv file of the time of every
+               phase by time step (see `StepTimer.write_trace`), implies
+               timings.
         """
         if netcdf_dir or (
             not self._netcdf_initialized
@@ -704,10 +767,13 @@ class Model:
         if not n_time_steps:
             n_time_steps = self.control.n_times
 
-        for istep in tqdm(range(n_time_steps)):
-            self.advance()
-            self.calculate()
-            self.output()
+        if timings or trace_file is not None:
+            self._run_timed(n_time_steps, trace_file)
+        else:
+            for istep in tqdm(range(n_time_steps)):
+                self.advance()
+                self.calculate()
+                self.output()
 
         if finalize:
             print("model.run(): finalizing")
@@ -715,6 +781,150 @@ class Model:
 
         return
 
+    def step_plan(self) -> list:
+        """The calls of a model time step labeled by process and phase.
+
+        The calls are in the order of `Model.advance`, `Model.calculate`
+        and `Model.output`: the control advance, the advance of every
+        process (its _advance_variables, the advance of its input adapters
+        and copies of inputs not sharing memory with their adapter), then
+        the calculation of every process (its _calculate and its budget
+        advance and calculate), then the output of the processes with output
+        initialized. All processes advance before any calculates as some
+        processes use the previous values of variables of processes after
+        them in the process order, e.g. PRMSRunoff uses soil_rechr_prev of
+        PRMSSoilzone. Processes overriding advance, _advance_inputs,
+        calculate or output keep their own methods.
+
+        Each call is in a tuple (process, phase, call). The phases are
+        advance (of the variables and of the adapters of inputs from other
+        processes), read {input} (the advance of the adapter of a file
+        input), advance_inputs (the copies of inputs or the whole
+        _advance_inputs of processes overriding it), calculate, budget and
+        output. The control advance is the advance phase of the "control"
+        process. Timed runs (see `Model.run`) run and time these calls.
+
+        Returns:
+            A list of (str, str, callable) tuples.
+        """
+        if not self._found_input_files:
+            self._find_input_files()
+
+        plan = [("control", "advance", self.control.advance)]
+        for cls in self.process_order:
+            file_inputs = [
+                input
+                for input, frm in self._inputs_from[cls].items()
+                if not frm
+            ]
+            plan += [
+                (cls, phase, call)
+                for phase, call in self._step_advance_calls(
+                    self.processes[cls], file_inputs
+                )
+            ]
+        for cls in self.process_order:
+            plan += [
+                (cls, phase, call)
+                for phase, call in self._step_calculate_calls(
+                    self.processes[cls]
+                )
+            ]
+
+        for cls in self.process_order:
+            proc = self.processes[cls]
+            budget = getattr(proc, "budget", None)
+            if proc._netcdf_initialized or (
+                budget is not None and budget._output_netcdf
+            ):
+                plan += [(cls, "output", proc.output)]
+
+        return plan
+
+    @staticmethod
+    def _step_advance_calls(proc: Process, file_inputs: list = ()) -> list:
+        proc_cls = type(proc)
+        if proc_cls.advance is not Process.advance:
+            return [("advance", proc.advance)]
+
+        def advance_itime_step():
+            proc._itime_step += 1
+
+        calls = [
+            ("advance", proc._advance_variables),
+            ("advance", advance_itime_step),
+        ]
+        if proc_cls._advance_inputs is not Process._advance_inputs:
+            return calls + [("advance_inputs", proc._advance_inputs)]
+
+        for key, adapter in proc._input_variables_dict.items():
+            if not isinstance(adapter, AdapterOnedarray):
+                phase = f"read {key}" if key in file_inputs else "advance"
+                calls += [(phase, adapter.advance)]
+            if proc[key] is adapter.current:
+                continue
+
+            def copy_input(key=key, adapter=adapter):
+                proc[key][:] = adapter.current
+
+            calls += [("advance_inputs", copy_input)]
+
+        return calls
+
+    @staticmethod
+    def _step_calculate_calls(proc: Process) -> list:
+        proc_cls = type(proc)
+        if proc_cls.calculate not in (
+            Process.calculate,
+            ConservativeProcess.calculate,
+        ):
+            return [("calculate", lambda: proc.calculate(1.0))]
+
+        calls = [("calculate", lambda: proc._calculate(1.0))]
+        budget = getattr(proc, "budget", None)
+        if budget is not None:
+            calls += [("budget", budget.advance), ("budget", budget.calculate)]
+        return calls
+
+    def _run_timed(self, n_time_steps: int, trace_file: fileish) -> None:
+        control = self.control
+        start_time = control.current_time + control.time_step
+        times = start_time + np.arange(n_time_steps) * control.time_step
+        self._step_timer = StepTimer(self.step_plan(), n_time_steps, times)
+        self._step_timer.run()
+        if trace_file is not None:
+            self._step_timer.write_trace(trace_file)
+        return
+
+    @property
+    def timings(self) -> pd.DataFrame:
+        """The wall time of the processes by phase in the last timed run.
+
+        The phases are those of `Model.step_plan`, the init of the processes
+        (including the jit compilation of the kernels compiled on init) and
+        jit_compile, the time spent compiling numba kernels during the run,
+        which is excluded from the other phases. None before a timed run,
+        see the timings argument of `Model.run`.
+
+        Returns:
+            A DataFrame indexed by process and phase with the columns
+            seconds, calls and seconds_per_call.
+        """
+        if self._step_timer is None:
+            return None
+        init = pd.DataFrame(
+            {
+                "seconds": list(self._init_seconds.values()),
+                "calls": 1,
+            },
+            index=pd.MultiIndex.from_tuples(
+                [(proc_name, "init") for proc_name in self._init_seconds],
+                names=["process", "phase"],
+            ),
+        )
+        init["seconds_per_call"] = init["seconds"]
+        return pd.concat([init, self._step_timer.to_dataframe()])
+
     def advance(self):
         """Advance the model in time."""
         if not self._found_input_files:
@@ -743,8 +953,91 @@ class Model:
             self.processes[cls].output()
         return
 
+    def checkpoint(self, checkpoint_file: fileish) -> None:
+        """Write the state of the model at the current time to a file.
+
+        The state of every process (its variables, private state and budget
+        accumulations, see `Process.get_checkpoint_state`) and the control
+        time are written uncompressed to a numpy .npz file. A model
+        continues from the checkpoint with `Model.from_checkpoint`.
+
+        Args:
+            checkpoint_file: the path of the checkpoint file.
+        """
+        state = {
+            "control/current_time": np.array(self.control.current_time),
+            "control/time_step": np.array(self.control.time_step),
+            "model/process_order": np.array(self.process_order),
+        }
+        for cls in self.process_order:
+            proc_state = self.processes[cls].get_checkpoint_state()
+            for name, values in proc_state.items():
+                state[f"{cls}/{name}"] = values
+
+        with pl.Path(checkpoint_file).open("wb") as file:
+            np.savez(file, **state)
+        return None
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint_file: fileish, *args, **kwargs):
+        """Instantiate a model continuing from a checkpoint.
+
+        The arguments after the checkpoint file are those of the model for
+        the whole simulation (e.g. a process list, control and parameters).
+        The control is edited to start at the time step after the
+        checkpoint and the state of the processes is set from the
+        checkpoint, so running the model gives the same results as the
+        continuous run. The parameters may differ from those of the
+        checkpointed model, e.g. to run scenarios from a spin-up.
+
+        Args:
+            checkpoint_file: a file written by `Model.checkpoint`.
+            *args: the arguments of the model.
+            **kwargs: the keyword arguments of the model.
+
+        Returns:
+            The model, at the time of the checkpoint.
+        """
+        with np.load(checkpoint_file) as npz:
+            state = {name: npz[name] for name in npz.files}
+
+        controls = [
+            vv
+            for aa in (*args, *kwargs.values())
+            for vv in (aa.values() if isinstance(aa, dict) else [aa])
+            if isinstance(vv, Control)
+        ]
+        control = controls[0]
+        if state["control/time_step"] != control.time_step:
+            msg = (
+                f"The checkpoint time step {state['control/time_step']} "
+                f"differs from the control time step {control.time_step}"
+            )
+            raise ValueError(msg)
+        control.edit_start_time(
+            state["control/current_time"][()] + control.time_step
+        )
+
+        model = cls(*args, **kwargs)
+        for proc_name in model.process_order:
+            if proc_name not in state["model/process_order"]:
+                msg = f"{proc_name} is not in the checkpoint {checkpoint_file}"
+                raise ValueError(msg)
+            prefix = f"{proc_name}/"
+            proc_state = {
+                name[len(prefix) :]: values
+                for name, values in state.items()
+                if name.startswith(prefix)
+            }
+            model.processes[proc_name].set_checkpoint_state(proc_state)
+
+        return model
+
     def finalize(self):
         """Finalize the model."""
         for cls in self.process_order:
             self.processes[cls].finalize()
+        # release the (shared) file readers of the input adapters
+        for adapter in self._file_input_adapters.values():
+            adapter.close()
         return
@@ -0,0 +1,468 @@
+"""Partitioning of a model domain on its stream network.
+
+The HRUs of the PRMS processes only interact through the channel routing:
+the vertical processes (PRMSSolarGeometry through PRMSGroundwater) can run
+on any subset of the HRUs. PartitionedModel runs them on sub-basins of the
+stream network in worker processes and routes their lateral flows over the
+whole network in the main process.
+"""
+
+import heapq
+import multiprocessing as mp
+import os
+import pathlib as pl
+import tempfile
+import threading
+import traceback
+from typing import Union
+
+import numpy as np
+from tqdm.auto import tqdm
+
+from ..constants import fileish
+from ..parameters import PrmsParameters
+from .adapter import AdapterOnedarray
+from .control import Control
+from .data_model import DatasetDict
+from .model import Model
+from .process import float_precision_type
+
+
+def partition_hrus(parameters: PrmsParameters, n_partitions: int) -> list:
+    """Partition the HRUs of a domain into sub-basins of its stream network.
+
+    The stream network (tosegment) is cut into sub-basins: the networks
+    draining to each outlet, split at their tributaries while larger than
+    the mean size of a partition. The sub-basins are assigned largest first
+    to the partition with the fewest HRUs. HRUs not contributing to a
+    segment (an hru_segment of 0) are assigned individually.
+
+    Args:
+        parameters: the parameters of the domain with tosegment and
+            hru_segment.
+        n_partitions: the number of partitions.
+
+    Returns:
+        A list of the sorted, zero-based indices of the HRUs of each
+        partition. There are fewer than n_partitions partitions when the
+        domain has fewer sub-basins.
+    """
+    tosegment = np.asarray(parameters.get_param_values("tosegment"))
+    hru_segment = np.asarray(parameters.get_param_values("hru_segment"))
+    n_segments = len(tosegment)
+    n_hrus = len(hru_segment)
+
+    children = [[] for iseg in range(n_segments)]
+    for iseg, to in enumerate(tosegment):
+        if to > 0:
+            children[to - 1].append(iseg)
+    seg_hrus = [[] for iseg in range(n_segments)]
+    for ihru, iseg in enumerate(hru_segment):
+        if iseg > 0:
+            seg_hrus[iseg - 1].append(ihru)
+
+    # the segments from the outlets, upstream segments after downstream
+    outlets = np.where(tosegment == 0)[0].tolist()
+    order = list(outlets)
+    for iseg in order:
+        order.extend(children[iseg])
+    if len(order) != n_segments:
+        raise ValueError("tosegment has segments not draining to an outlet")
+
+    n_upstream = np.array([len(hrus) for hrus in seg_hrus])
+    for iseg in reversed(order):
+        if tosegment[iseg] > 0:
+            n_upstream[tosegment[iseg] - 1] += n_upstream[iseg]
+
+    # split the sub-basins larger than a partition at their tributaries
+    target = n_hrus / max(n_partitions, 1)
+    units = []
+    stack = list(outlets)
+    while stack:
+        iseg = stack.pop()
+        if n_upstream[iseg] > target and children[iseg]:
+            units.append(list(seg_hrus[iseg]))
+            stack.extend(children[iseg])
+        else:
+            segs = [iseg]
+            for jseg in segs:
+                segs.extend(children[jseg])
+            units.append([ihru for jseg in segs for ihru in seg_hrus[jseg]])
+    units += [[ihru] for ihru in np.where(hru_segment <= 0)[0]]
+    units = sorted([uu for uu in units if len(uu)], key=len, reverse=True)
+
+    partitions = [[] for ipart in range(max(n_partitions, 1))]
+    sizes = [(0, ipart) for ipart in range(len(partitions))]
+    for hrus in units:
+        size, ipart = heapq.heappop(sizes)
+        partitions[ipart] += hrus
+        heapq.heappush(sizes, (size + len(hrus), ipart))
+
+    return [np.sort(np.array(pp, dtype=np.int64)) for pp in partitions if pp]
+
+
+def subset_hrus(
+    parameters: PrmsParameters, hru_inds: np.ndarray
+) -> PrmsParameters:
+    """Subset PrmsParameters to HRUs on their nhm_id coordinate.
+
+    Args:
+        parameters: the PrmsParameters of the domain.
+        hru_inds: the zero-based indices of the HRUs to keep.
+
+    Returns:
+        The PrmsParameters of the HRUs.
+    """
+    return PrmsParameters.from_dict(_subset_hrus_dd(parameters, hru_inds).data)
+
+
+def _subset_hrus_dd(
+    parameters: PrmsParameters, hru_inds: np.ndarray
+) -> DatasetDict:
+    # a DatasetDict can be pickled (for a worker process), Parameters not
+    params_dd = parameters.to_dd()
+    params_dd.subset_on_coord("nhm_id", (hru_inds,))
+    params_dd.drop_var("subset_inds")
+    return params_dd
+
+
+def _subset_input_file(
+    nc_file: pl.Path, hru_inds: np.ndarray, out_file: pl.Path
+) -> None:
+    import xarray as xr
+
+    with xr.open_dataset(nc_file) as ds:
+        hru_dim = [dd for dd in ds[nc_file.stem].dims if dd != "time"][0]
+        ds.isel({hru_dim: hru_inds}).to_netcdf(out_file)
+    return None
+
+
+def _exchange_arrays(
+    raw_arrays: dict, float_type: type, n_time_block: int
+) -> dict:
+    # (2 blocks, n_time_block, nhru) views of the shared memory
+    return {
+        name: np.frombuffer(raw, dtype=float_type).reshape(2, n_time_block, -1)
+        for name, raw in raw_arrays.items()
+    }
+
+
+def _run_partition(
+    ipart: int,
+    process_list: list,
+    control: Control,
+    params_dd: DatasetDict,
+    hru_inds: np.ndarray,
+    raw_exchange: dict,
+    float_type: type,
+    n_time_block: int,
+    barrier: mp.Barrier,
+    errors: mp.SimpleQueue,
+    netcdf_dir: Union[fileish, None],
+    output_vars: Union[list, None],
+) -> None:
+    """The vertical processes of a partition, in a worker process."""
+    try:
+        input_dir = pl.Path(control.options["input_dir"])
+        file_inputs = set(
+            input for proc in process_list for input in proc.get_inputs()
+        ).difference(
+            var for proc in process_list for var in proc.get_variables()
+        )
+        with tempfile.TemporaryDirectory() as part_dir:
+            for name in file_inputs:
+                _subset_input_file(
+                    input_dir / f"{name}.nc",
+                    hru_inds,
+                    pl.Path(part_dir) / f"{name}.nc",
+                )
+            control.options["input_dir"] = part_dir
+            control.options.pop("netcdf_output_dir", None)
+            control.options.pop("input_memmap", None)
+
+            parameters = PrmsParameters.from_dict(params_dd.data)
+            exchange = _exchange_arrays(raw_exchange, float_type, n_time_block)
+            model = Model(process_list, control=control, parameters=parameters)
+            if netcdf_dir is not None:
+                model.initialize_netcdf(
+                    pl.Path(netcdf_dir) / f"partition_{ipart}",
+                    output_vars=output_vars,
+                )
+            owners = {
+                name: proc
+                for proc in model.processes.values()
+                for name in exchange.keys()
+                if name in proc.get_variables()
+            }
+
+            for istep in range(control.n_times):
+                model.advance()
+                model.calculate()
+                model.output()
+                iblock, itime = divmod(istep, n_time_block)
+                for name, values in exchange.items():
+                    values[iblock % 2, itime, hru_inds] = owners[name][name]
+                if itime == n_time_block - 1 or istep == control.n_times - 1:
+                    barrier.wait()
+
+            model.finalize()
+
+    except threading.BrokenBarrierError:
+        # an other partition or the routing failed
+        pass
+    except Exception:
+        errors.put((ipart, traceback.format_exc()))
+        barrier.abort()
+
+    return None
+
+
+def _watch_workers(
+    workers: list, barrier: mp.Barrier, done: threading.Event
+) -> None:
+    # a worker killed (e.g. out of memory) does not reach the barrier
+    while not done.wait(1.0):
+        if any(ww.exitcode not in (None, 0) for ww in workers):
+            barrier.abort()
+            return
+    return None
+
+
+class PartitionedModel:
+    """Run a PRMS model on partitions of its domain in parallel.
+
+    The HRUs of the domain are partitioned into sub-basins of the stream
+    network (see `partition_hrus`) with the parameters subset on the nhm_id
+    coordinate (see `subset_hrus`). The vertical processes run on each
+    partition in its own worker process, reading the inputs of the
+    partition from subsets of the input files in input_dir. The lateral
+    flows of the partitions (the inputs of the routing process, e.g.
+    sroff_vol, ssres_flow_vol and gwres_flow_vol for PRMSChannel) are
+    exchanged through shared memory in blocks of n_time_block time steps
+    and routed over the whole stream network in the main process. The
+    exchange is double buffered: the partitions calculate a block while the
+    main process routes the previous one.
+
+    Only the PRMS-legacy instantiation (process list, control and
+    PrmsParameters) of Model is supported. The worker processes are spawned
+    and load the numba kernels from their cache (see
+    `pywatershed.precompile`).
+
+    Args:
+        process_list: A process list of PRMS model components, at most one
+            of which routes on the stream network (has tosegment in its
+            parameters).
+        control: A Control object.
+        parameters: A PrmsParameters object.
+        n_partitions: The number of partitions (worker processes), defaults
+            to the number of cpus.
+        n_time_block: The number of time steps of lateral flows exchanged
+            at once.
+
+    Examples:
+    ---------
+
+    >>> import pywatershed as pws
+    >>> test_data_dir = pws.constants.__pywatershed_root__ / "../test_data"
+    >>> domain_dir = test_data_dir / "drb_2yr"
+    >>> control = pws.Control.load_prms(
+    ...     domain_dir / "nhm.control", warn_unused_options=False
+    ... )
+    >>> control.options["input_dir"] = domain_dir
+    >>> params = pws.parameters.PrmsParameters.load(
+    ...     domain_dir / "myparam.param"
+    ... )
+    >>> model = pws.PartitionedModel(
+    ...     [
+    ...         pws.PRMSSolarGeometry,
+    ...         pws.PRMSAtmosphere,
+    ...         pws.PRMSCanopy,
+    ...         pws.PRMSSnow,
+    ...         pws.PRMSRunoff,
+    ...         pws.PRMSSoilzone,
+    ...         pws.PRMSGroundwater,
+    ...         pws.PRMSChannel,
+    ...     ],
+    ...     control=control,
+    ...     parameters=params,
+    ...     n_partitions=4,
+    ... )
+    >>> model.run(netcdf_dir="output")
+
+    """
+
+    def __init__(
+        self,
+        process_list: list,
+        control: Control,
+        parameters: PrmsParameters,
+        n_partitions: int = None,
+        n_time_block: int = 30,
+    ):
+        self.control = control
+        self.parameters = parameters
+
+        routing_list = [
+            proc
+            for proc in process_list
+            if "tosegment" in proc.get_parameters()
+        ]
+        if len(routing_list) > 1:
+            msg = "Only one process can route on the stream network"
+            raise ValueError(msg)
+        self._vertical_list = [
+            proc for proc in process_list if proc not in routing_list
+        ]
+
+        vertical_vars = set(
+            var for proc in self._vertical_list for var in proc.get_variables()
+        )
+        self.exchange_vars = []
+        self.processes = {}
+        for proc in routing_list:
+            missing = set(proc.get_inputs()).difference(vertical_vars)
+            if missing:
+                msg = (
+                    f"The inputs {sorted(missing)} of {proc.__name__} are "
+                    "not variables of the other processes"
+                )
+                raise ValueError(msg)
+            self.exchange_vars = list(proc.get_inputs())
+            self.processes[proc.__name__] = proc(
+                control=control,
+                discretization=None,
+                parameters=parameters,
+                **{input: None for input in proc.get_inputs()},
+            )
+
+        if n_partitions is None:
+            n_partitions = os.cpu_count()
+        self.partitions = partition_hrus(parameters, n_partitions)
+        self._n_time_block = max(1, min(n_time_block, control.n_times))
+        return
+
+    def run(
+        self,
+        netcdf_dir: fileish = None,
+        finalize: bool = True,
+        output_vars: list = None,
+    ) -> None:
+        """Run the model.
+
+        Args:
+            netcdf_dir: optional directory of the netcdf output files. The
+                routing process writes its files in netcdf_dir and the
+                processes of each partition in netcdf_dir/partition_{i}.
+                Defaults to the control option netcdf_output_dir.
+            finalize: option to not finalize the routing process at the end
+                of the time loop. The partitions are always finalized.
+            output_vars: the vars to output to the netcdf_dir
+        """
+        if netcdf_dir is None:
+            netcdf_dir = self.control.options.get("netcdf_output_dir", None)
+
+        ctx = mp.get_context("spawn")
+        float_type = float_precision_type(self.control)
+        n_hrus = self.parameters.dims["nhru"]
+        n_time_block = self._n_time_block
+        raw_exchange = {
+            name: ctx.RawArray(
+                np.ctypeslib.as_ctypes_type(np.dtype(float_type)),
+                2 * n_time_block * n_hrus,
+            )
+            for name in self.exchange_vars
+        }
+        exchange = _exchange_arrays(raw_exchange, float_type, n_time_block)
+
+        barrier = ctx.Barrier(len(self.partitions) + 1)
+        errors = ctx.SimpleQueue()
+        workers = [
+            ctx.Process(
+                target=_run_partition,
+                args=(
+                    ipart,
+                    self._vertical_list,
+                    self.control,
+                    _subset_hrus_dd(self.parameters, hru_inds),
+                    hru_inds,
+                    raw_exchange,
+                    float_type,
+                    n_time_block,
+                    barrier,
+                    errors,
+                    netcdf_dir,
+                    output_vars,
+                ),
+                name=f"partition_{ipart}",
+            )
+            for ipart, hru_inds in enumerate(self.partitions)
+        ]
+        for worker in workers:
+            worker.start()
+        done = threading.Event()
+        watcher = threading.Thread(
+            target=_watch_workers, args=(workers, barrier, done), daemon=True
+        )
+        watcher.start()
+
+        inputs = {}
+        for proc in self.processes.values():
+            if netcdf_dir is not None:
+                proc.initialize_netcdf(
+                    output_dir=netcdf_dir, output_vars=output_vars
+                )
+            for name in self.exchange_vars:
+                inputs[name] = np.zeros(n_hrus, dtype=float_type)
+                proc.set_input_to_adapter(
+                    name, AdapterOnedarray(inputs[name], name)
+                )
+
+        try:
+            for istep in tqdm(range(self.control.n_times)):
+                iblock, itime = divmod(istep, n_time_block)
+                if itime == 0:
+                    # the partitions have calculated the block
+                    barrier.wait()
+                for name, values in inputs.items():
+                    values[:] = exchange[name][iblock % 2, itime]
+                self.control.advance()
+                for proc in self.processes.values():
+                    proc.advance()
+                for proc in self.processes.values():
+                    proc.calculate(1.0)
+                    proc.output()
+
+        except threading.BrokenBarrierError:
+            # raised below
+            pass
+
+        except BaseException:
+            barrier.abort()
+            for worker in workers:
+                worker.join()
+            raise
+
+        finally:
+            done.set()
+
+        for worker in workers:
+            worker.join()
+        failures = []
+        while not errors.empty():
+            ipart, trace = errors.get()
+            failures.append(f"partition_{ipart}:\n{trace}")
+        for worker in workers:
+            if worker.exitcode != 0:
+                failures.append(
+                    f"{worker.name} exited with code {worker.exitcode}"
+                )
+        if failures:
+            msg = "PartitionedModel partitions failed\n" + "\n".join(failures)
+            raise RuntimeError(msg)
+
+        if finalize:
+            print("PartitionedModel.run(): finalizing")
+            for proc in self.processes.values():
+                proc.finalize()
+
+        return
@@ -7,7 +7,7 @@ from warnings import warn
 import numpy as np
 
 from ..base import meta
-from ..base.adapter import Adapter, adapter_factory
+from ..base.adapter import Adapter, adapter_factory, netcdf_load_options
 from ..base.data_model import _merge_dicts
 from ..base.timeseries import TimeseriesArray
 from ..parameters import Parameters
@@ -15,6 +15,24 @@ from ..utils.netcdf_utils import NetCdfWrite
 from .accessor import Accessor
 from .control import Control
 
+# The float types of the control option float_precision
+float_precisions = {"float64": np.float64, "float32": np.float32}
+
+
+def float_precision_type(control: Control) -> type:
+    """The numpy float type of the float_precision option of a Control."""
+    precision = control.options.get("float_precision", None)
+    if precision is None:
+        precision = "float64"
+    if precision not in float_precisions.keys():
+        msg = (
+            f"Invalid float_precision={precision}, valid values are "
+            f"{list(float_precisions.keys())}. Using 'float64'."
+        )
+        warn(msg)
+        precision = "float64"
+    return float_precisions[precision]
+
 
 class Process(Accessor):
     """Base class for physical process representation.
@@ -60,6 +78,21 @@ class Process(Accessor):
         setting previous values to current values. When/if necessary to
         keep previous diagnostic variables, those must not appear here but
         in _calculate().
+    _float_precisions:
+        The float_precision control option values the Process supports.
+        Its parameters, inputs and float variables are allocated with the
+        float type of the float_precision of the control when supported,
+        else in float64. Inputs always follow the float_precision as they
+        are shared with the variables of other Processes. Float variables
+        with precision "double" in their metadata (e.g. the snowpack
+        water balance of PRMSSnow, as in the PRMS mixed precision build)
+        are always float64.
+    _checkpoint_private:
+        The private attributes holding state between time steps (e.g.
+        the routing terms of PRMSChannel) which are written to checkpoints
+        with the variables, see get_checkpoint_state(). Attributes derived
+        from parameters do not belong here: a checkpoint may restart a
+        model with other parameters.
     _calculate():
         This method is to be overridden by the subclass. Near the end of
         the method, the subclass should calculate its changes in mass and
@@ -88,6 +121,9 @@ class Process(Accessor):
         How to handle metadata_patches conflicts. Experimental.
     """
 
+    _float_precisions = ("float64", "float32")
+    _checkpoint_private = ()
+
     def __init__(
         self,
         control: Control,
@@ -114,6 +150,12 @@ class Process(Accessor):
                 conflicts=metadata_patch_conflicts,
             )
 
+        self._input_float_type = float_precision_type(control)
+        if np.dtype(self._input_float_type).name in self._float_precisions:
+            self._float_type = self._input_float_type
+        else:
+            self._float_type = np.float64
+
         self._initialize_self_variables()
         self._set_initial_conditions()
 
@@ -186,6 +228,40 @@ class Process(Accessor):
         variable."""
         raise Exception("This must be overridden")
 
+    def get_checkpoint_state(self) -> dict:
+        """Get the state of the Process at the current time.
+
+        Returns:
+            A dictionary of copies of the variables (except TimeseriesArrays,
+            calculated from the inputs) and the _checkpoint_private
+            attributes by name.
+        """
+        state = {}
+        for name in (*self.get_variables(), *self._checkpoint_private):
+            values = getattr(self, name)
+            if isinstance(values, TimeseriesArray):
+                continue
+            state[name] = np.array(values)
+        return state
+
+    def set_checkpoint_state(self, state: dict) -> None:
+        """Set the state of the Process from get_checkpoint_state().
+
+        Arrays are set in place as they may be shared with other Processes.
+
+        Args:
+            state: a dictionary of arrays by name.
+        """
+        for name, values in state.items():
+            current = getattr(self, name, None)
+            if isinstance(current, np.ndarray) and (
+                current.shape == values.shape
+            ):
+                current[...] = values
+            else:
+                setattr(self, name, values.copy())
+        return None
+
     @property
     def dimensions(self) -> tuple:
         """A tuple of parameter names."""
@@ -248,16 +324,32 @@ class Process(Accessor):
 
         # parameters
         for name in self.parameters:
-            setattr(self, name, self._params.get_param_values(name))
+            values = self._params.get_param_values(name)
+            if isinstance(values, np.ndarray):
+                param_type = self._precision_type(values.dtype)
+                if values.dtype != param_type:
+                    writeable = values.flags.writeable
+                    values = values.astype(param_type)
+                    values.flags.writeable = writeable
+            setattr(self, name, values)
 
         # inputs
         for name in self.inputs:
+            input_meta = meta.find_variables(name)[name]
             # dims of internal variables never have time, so they are spatial
             spatial_dims = self._params.get_dim_values(
-                list(meta.find_variables(name)[name]["dims"])
+                list(input_meta["dims"])
             )
             spatial_dims = tuple(spatial_dims.values())
-            setattr(self, name, np.zeros(spatial_dims, dtype=float) + np.nan)
+            # inputs are floats, whatever their type
+            input_type = self._precision_type(
+                np.float64,
+                input_meta.get("precision", None),
+                self._input_float_type,
+            )
+            setattr(
+                self, name, np.full(spatial_dims, np.nan, dtype=input_type)
+            )
 
         # variables
         # skip restart variables if restart (for speed) ?
@@ -285,7 +377,10 @@ class Process(Accessor):
             return
 
         dims = [self[vv] for vv in self.meta[var_name]["dims"]]
-        init_type = self.meta[var_name]["type"]
+        init_type = self._precision_type(
+            self.meta[var_name]["type"],
+            self.meta[var_name].get("precision", None),
+        )
 
         if len(dims) == 1:
             self[var_name] = np.full(
@@ -300,6 +395,25 @@ class Process(Accessor):
             )
         return
 
+    def _precision_type(
+        self, var_type, precision: str = None, float_type: type = None
+    ) -> type:
+        """The type of a variable at the float precision of self.
+
+        Args:
+            var_type: the type of the variable in its metadata.
+            precision: the precision of the variable in its metadata, float
+                variables with precision "double" are always float64.
+            float_type: the float type, defaults to the float type of self.
+        """
+        if not np.issubdtype(var_type, np.floating):
+            return var_type
+        if precision == "double":
+            return np.float64
+        if float_type is None:
+            return self._float_type
+        return float_type
+
     def _set_initial_conditions(self):
         raise Exception("This must be overridden")
 
@@ -315,6 +429,7 @@ class Process(Accessor):
 
     def _set_inputs(self, args):
         self._input_variables_dict = {}
+        load_opts = netcdf_load_options(args["control"])
         for ii in self.inputs:
             ii_dims = self.control.meta.get_dimensions(ii)[ii]
             # This accomodates Timeseries like objects that need to init
@@ -333,9 +448,17 @@ class Process(Accessor):
                 control=args["control"],
                 variable_dim_sizes=ii_dim_sizes,
                 variable_type=ii_type,
+                **load_opts,
             )
             if self._input_variables_dict[ii]:
-                self[ii] = self._input_variables_dict[ii].current
+                current = self._input_variables_dict[ii].current
+                if (
+                    np.issubdtype(current.dtype, np.floating)
+                    and current.dtype != self[ii].dtype
+                ):
+                    # copied on advance
+                    current = current.astype(self[ii].dtype)
+                self[ii] = current
 
         return
 
@@ -402,6 +525,113 @@ class Process(Accessor):
     def _calculate(self):
         raise Exception("This must be overridden")
 
+    def _calculate_block(
+        self, time_length: float, input_blocks: dict, output_blocks: dict
+    ) -> None:
+        """Calculate a block of time steps, optionally overridden
+
+        A subclass overriding this method calculates all the time steps of
+        input_blocks at once (typically with a kernel looping over time) and
+        fills output_blocks in place. The inputs and variables on self are
+        the state before the block and must be the state after the block on
+        return.
+
+        Args:
+            time_length: the length of each time step
+            input_blocks: dictionary of (n_steps, nspace) arrays for each
+                input
+            output_blocks: dictionary of (n_steps, nspace) arrays for each
+                variable
+        """
+        raise NotImplementedError("Must be overridden")
+
+    def run_block(self, n_steps: int, time_length: float = 1.0) -> dict:
+        """Run the Process alone for a block of n_steps time steps
+
+        For a Process whose inputs all come from adapters (files or arrays),
+        run n_steps time steps and return the variables for each. The
+        control is advanced with the Process, so this is for standalone
+        Process runs (e.g. calibration of a single Process) and not for
+        Processes in a Model.
+
+        When the subclass overrides _calculate_block, the Process has no
+        budget and no output and its input adapters can advance blocks, the
+        inputs are taken from the adapters as (n_steps, nspace) blocks and
+        handed to _calculate_block which loops over time internally.
+        Otherwise the time steps are advanced and calculated one at a time.
+        Currently only PRMSGroundwater (and PRMSGroundwaterNoDprst)
+        implements _calculate_block, for its numpy and numba calc_methods.
+
+        Args:
+            n_steps: the number of time steps to run
+            time_length: the length of each time step passed to calculate
+
+        Returns:
+            A dictionary of (n_steps, nspace) arrays of the variables.
+        """
+        if self.control.itime_step + n_steps >= self.control.n_times:
+            msg = (
+                f"Can not run {n_steps} time steps from time step "
+                f"{self.control.itime_step} of {self.control.n_times}"
+            )
+            raise ValueError(msg)
+
+        output_blocks = {}
+        for var in self.variables:
+            current = self[var]
+            if isinstance(current, TimeseriesArray):
+                current = current.current
+            output_blocks[var] = np.zeros(
+                (n_steps, *current.shape), dtype=current.dtype
+            )
+
+        adapters = {
+            key: adapter
+            for key, adapter in self._input_variables_dict.items()
+            if adapter is not None
+        }
+        use_block = (
+            type(self)._calculate_block is not Process._calculate_block
+            and getattr(self, "budget", None) is None
+            and not self._netcdf_initialized
+            and all(adapter.can_advance_block for adapter in adapters.values())
+        )
+
+        if not use_block:
+            for istep in range(n_steps):
+                self.control.advance()
+                self.advance()
+                self.calculate(time_length)
+                self.output()
+                for var, block in output_blocks.items():
+                    current = self[var]
+                    if isinstance(current, TimeseriesArray):
+                        current = current.current
+                    block[istep] = current
+
+            return output_blocks
+
+        for istep in range(n_steps):
+            self.control.advance()
+
+        input_blocks = {}
+        for key in self.inputs:
+            if key in adapters:
+                block = adapters[key].advance_block(n_steps)
+            else:
+                block = np.broadcast_to(self[key], (n_steps, *self[key].shape))
+            if not block.flags.writeable:
+                # jitted kernels take writeable arrays
+                block = np.array(block)
+            input_blocks[key] = block
+
+        self._calculate_block(time_length, input_blocks, output_blocks)
+        for key in adapters.keys():
+            self[key][:] = input_blocks[key][-1]
+        self._itime_step += n_steps
+
+        return output_blocks
+
     def calculate(self, time_length: float, **kwargs) -> None:
         """Calculate Process terms for a time step
 
@@ -463,6 +693,7 @@ class Process(Accessor):
         output_dir: [str, pl.Path] = None,
         separate_files: bool = None,
         output_vars: list = None,
+        buffer_n_times: int = None,
     ) -> None:
         """Initialize NetCDF output.
 
@@ -473,6 +704,9 @@ class Process(Accessor):
                 variables should be written to a separate file for each
                 variable
             output_vars: list of variable names to outuput.
+            buffer_n_times: number of time steps to buffer in memory before
+                writing to file on a background thread, see NetCdfWrite.
+                Default is None, writing each time step as it is output.
 
         Returns:
             None
@@ -493,8 +727,9 @@ class Process(Accessor):
             output_dir,
             output_vars,
             separate_files,
+            buffer_n_times,
         ) = self._reconcile_nc_args_w_control_opts(
-            output_dir, output_vars, separate_files
+            output_dir, output_vars, separate_files, buffer_n_times
         )
 
         # apply defaults if necessary
@@ -511,6 +746,7 @@ class Process(Accessor):
 
         self._netcdf_initialized = True
         self._netcdf_output_dir = pl.Path(output_dir)
+        self._netcdf_buffer_n_times = buffer_n_times
         if output_vars is None:
             self._netcdf_output_vars = self.variables
         else:
@@ -538,6 +774,7 @@ class Process(Accessor):
                     [variable_name],
                     {variable_name: self.meta[variable_name]},
                     {"process class": self.name},
+                    buffer_n_times=buffer_n_times,
                 )
 
         else:
@@ -554,6 +791,7 @@ class Process(Accessor):
                 self._netcdf_output_vars,
                 self.meta,
                 {"process class": self.name},
+                buffer_n_times=buffer_n_times,
             )
             for variable in the_out_vars[1:]:
                 self._netcdf[variable] = self._netcdf[initial_variable]
@@ -606,19 +844,21 @@ class Process(Accessor):
         return
 
     def _reconcile_nc_args_w_control_opts(
-        self, output_dir, output_vars, separate_files
+        self, output_dir, output_vars, separate_files, buffer_n_times=None
     ):
         # can treat the other args but they are not yet in the available opts
         arg_opt_name_map = {
             "output_dir": "netcdf_output_dir",
             "output_vars": "netcdf_output_var_names",
             "separate_files": "netcdf_output_separate_files",
+            "buffer_n_times": "netcdf_output_buffer_n_times",
         }
 
         args = {
             "output_dir": output_dir,
             "output_vars": output_vars,
             "separate_files": separate_files,
+            "buffer_n_times": buffer_n_times,
         }
 
         for vv in args.keys():
@@ -655,4 +895,9 @@ class Process(Accessor):
                     )
                     raise ValueError(msg)
 
-        return args["output_dir"], args["output_vars"], args["separate_files"]
+        return (
+            args["output_dir"],
+            args["output_vars"],
+            args["separate_files"],
+            args["buffer_n_times"],
+        )
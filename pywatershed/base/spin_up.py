@@ -0,0 +1,266 @@
+"""A cache of model spin-ups.
+
+Calibration and scenario runs repeat the same spin-up of a model before
+their evaluation period. The state of the model at the end of a spin-up is
+stored as a checkpoint (see `Model.checkpoint`) in a cache directory, named
+by a hash of everything the state depends on, and reused by the models of
+the evaluation period (see `Model.from_checkpoint`).
+"""
+
+import hashlib
+import os
+import pathlib as pl
+import tempfile
+import warnings
+
+import numpy as np
+from tqdm.auto import tqdm
+
+from ..constants import fileish
+from ..version import __version__
+from .model import Model
+
+# control options which do not change the state of a model
+spin_up_ignored_options = (
+    "budget_check_interval",
+    "input_dir",
+    "input_memmap",
+    "load_n_time_batches",
+    "load_prefetch",
+    "n_time_chunk",
+    "netcdf_output_buffer_n_times",
+    "netcdf_output_dir",
+    "netcdf_output_separate_files",
+    "netcdf_output_var_names",
+    "numba_num_threads",
+    "parameter_file",
+    "soltab_cache_dir",
+    "verbosity",
+)
+
+
+def _update_array(sha, arr) -> None:
+    arr = np.ascontiguousarray(arr)
+    sha.update(f"{arr.dtype.str}{arr.shape}".encode())
+    sha.update(arr.tobytes())
+    return None
+
+
+def file_signature(file: fileish, block_size: int = 2**20) -> str:
+    """The content hash of a file.
+
+    Args:
+        file: the path of the file.
+        block_size: the number of bytes hashed at a time.
+
+    Returns:
+        A hexadecimal string.
+    """
+    sha = hashlib.sha256()
+    with pl.Path(file).open("rb") as ff:
+        for block in iter(lambda: ff.read(block_size), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def spin_up_cache_key(
+    model: Model, spin_up_end_time: np.datetime64, file_signatures: dict
+) -> str:
+    """The hash of everything the state of a model after spin-up depends on.
+
+    These are the process classes and their parameters, the start time, end
+    of spin-up and time step of the control, the control options (except
+    spin_up_ignored_options), the scalar options of the processes in the
+    model dictionary, the signatures of the input files and the pywatershed
+    version.
+
+    Args:
+        model: the model of the spin-up, not yet advanced.
+        spin_up_end_time: the last time of the spin-up.
+        file_signatures: the signatures of the input files of the model by
+            input name (see file_signature).
+
+    Returns:
+        A hexadecimal string.
+    """
+    control = model.control
+    sha = hashlib.sha256(__version__.encode())
+    sha.update(
+        f"{control.start_time}{spin_up_end_time}{control.time_step}".encode()
+    )
+    for key in sorted(control.options.keys()):
+        if key not in spin_up_ignored_options:
+            sha.update(f"{key}={control.options[key]!r}".encode())
+
+    for proc_name in model.process_order:
+        proc = model.processes[proc_name]
+        cls = type(proc)
+        sha.update(f"{proc_name}:{cls.__module__}.{cls.__qualname__}".encode())
+        for key, value in sorted(model.model_dict[proc_name].items()):
+            if isinstance(value, (str, int, float, bool, type(None))):
+                sha.update(f"{key}={value!r}".encode())
+        for param in proc.parameters:
+            sha.update(param.encode())
+            _update_array(sha, proc._params.get_param_values(param))
+
+    for name in sorted(file_signatures.keys()):
+        sha.update(f"{name}:{file_signatures[name]}".encode())
+
+    return sha.hexdigest()
+
+
+class SpinUpCache:
+    """A least recently used cache of model spin-ups.
+
+    The state of a model at the end of its spin-up is written to a
+    checkpoint (see `Model.checkpoint`) in the cache directory, in a file
+    named by the hash of the processes, parameters, control and input files
+    of the model (see `spin_up_cache_key`). A spin-up with the same hash
+    reuses the checkpoint instead of running the model. When the cache holds
+    more than max_entries checkpoints, the least recently used are removed.
+
+    The models of the evaluation period continue from the checkpoint with
+    `Model.from_checkpoint` and their own parameters, so candidates of a
+    calibration differing in their parameters share one spin-up.
+
+    Args:
+        cache_dir: the directory of the cache.
+        max_entries: the maximum number of checkpoints in the cache.
+
+    Examples:
+    ---------
+
+    >>> import numpy as np
+    >>> import pywatershed as pws
+    >>> cache = pws.SpinUpCache("spin_up_cache", max_entries=4)
+    >>> checkpoint_file = cache.spin_up(
+    ...     np.datetime64("1980-12-31T00:00:00"),
+    ...     processes,
+    ...     control=spin_up_control,
+    ...     parameters=spin_up_params,
+    ... )
+    >>> for candidate_params in candidates:
+    ...     model = pws.Model.from_checkpoint(
+    ...         checkpoint_file,
+    ...         processes,
+    ...         control=pws.Control.load_prms(control_file),
+    ...         parameters=candidate_params,
+    ...     )
+    ...     model.run()
+
+    """
+
+    def __init__(self, cache_dir: fileish, max_entries: int = 8):
+        self.cache_dir = pl.Path(cache_dir)
+        if max_entries < 1:
+            warnings.warn(
+                f"max_entries must be positive, got {max_entries}, using 1"
+            )
+            max_entries = 1
+        self.max_entries = max_entries
+        # {(path, size, mtime_ns): signature} of the input files hashed
+        self._file_signatures = {}
+        return
+
+    def _input_file_signatures(self, model: Model) -> dict:
+        signatures = {}
+        for name in model._file_input_names:
+            path = model._input_dir / f"{name}.nc"
+            if not path.exists():
+                signatures[name] = None
+                continue
+            stat = path.stat()
+            file_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+            if file_key not in self._file_signatures.keys():
+                self._file_signatures[file_key] = file_signature(path)
+            signatures[name] = self._file_signatures[file_key]
+        return signatures
+
+    def key(self, model: Model, spin_up_end_time: np.datetime64) -> str:
+        """The cache key of the spin-up of a model, see spin_up_cache_key."""
+        return spin_up_cache_key(
+            model, spin_up_end_time, self._input_file_signatures(model)
+        )
+
+    def spin_up(
+        self, spin_up_end_time: np.datetime64, *args, **kwargs
+    ) -> pl.Path:
+        """The checkpoint of a model at the end of its spin-up.
+
+        The model is instantiated from the arguments after spin_up_end_time
+        (those of `Model`) and, unless its spin-up is in the cache, run from
+        the start time of its control through spin_up_end_time without
+        output. The control of the model is advanced as by any run.
+
+        Args:
+            spin_up_end_time: the last time of the spin-up.
+            *args: the arguments of the model.
+            **kwargs: the keyword arguments of the model.
+
+        Returns:
+            The path of the checkpoint in the cache.
+        """
+        model = Model(*args, **kwargs)
+        control = model.control
+        n_time_steps = (spin_up_end_time - control.start_time) / (
+            control.time_step
+        ) + 1
+        if (
+            n_time_steps < 1
+            or n_time_steps > control.n_times
+            or n_time_steps != int(n_time_steps)
+        ):
+            msg = (
+                f"spin_up_end_time {spin_up_end_time} is not a time of the "
+                f"control from {control.start_time} to {control.end_time}"
+            )
+            raise ValueError(msg)
+
+        cache_file = (
+            self.cache_dir / f"spin_up_{self.key(model, spin_up_end_time)}.npz"
+        )
+        if self._load(cache_file):
+            model.finalize()
+            return cache_file
+
+        for istep in tqdm(range(int(n_time_steps))):
+            model.advance()
+            model.calculate()
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(
+            suffix=".npz", prefix=".spin_up_", dir=self.cache_dir
+        )
+        os.close(fd)
+        try:
+            model.checkpoint(tmp_file)
+            os.replace(tmp_file, cache_file)
+        finally:
+            if pl.Path(tmp_file).exists():
+                os.remove(tmp_file)
+        model.finalize()
+
+        self._evict()
+        return cache_file
+
+    def _load(self, cache_file: pl.Path) -> bool:
+        if not cache_file.exists():
+            return False
+        try:
+            with np.load(cache_file) as cached:
+                cached["control/current_time"]
+        except Exception:
+            warnings.warn(f"Recomputing invalid spin-up cache: {cache_file}")
+            return False
+        # the modification time orders the entries by their last use
+        os.utime(cache_file)
+        return True
+
+    def _evict(self) -> None:
+        entries = sorted(
+            self.cache_dir.glob("spin_up_*.npz"),
+            key=lambda path: path.stat().st_mtime_ns,
+        )
+        for path in entries[: max(len(entries) - self.max_entries, 0)]:
+            path.unlink(missing_ok=True)
+        return None
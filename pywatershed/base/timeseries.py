@@ -26,6 +26,9 @@ class TimeseriesArray:
         # check if control.start_time is in time
         # integer is doy type and np.datetime64 is time type
         self._time_type = self.time.dtype
+        # This is for DOY time which is integer
+        # Windows represents this as int32, others as int64
+        self._is_doy = self._time_type in [np.int32, np.int64]
 
         return
 
@@ -33,15 +36,27 @@ class TimeseriesArray:
         self._set_current()
         return
 
+    def set_window(self, array: np.ndarray, time: np.ndarray) -> None:
+        """Set the data to a window of time starting at the current time.
+
+        This allows a timeseries to be held (and computed) in windows of time
+        instead of for all times. The array is the data for the window with
+        times time, its first time is the current time of control. The
+        current array keeps its identity.
+        """
+        self.data = array
+        self.time = time
+        # the time index into the window is relative to its first time step
+        self._init_time_ind = -self.control.itime_step
+        return
+
     def _set_current(self):
         if not self.control._current_time:
             # then data is all nans, just use 0
             time_ind = 0
 
         else:
-            # This is for DOY time which is integer
-            # Windows represents this as int32, others as int64
-            if self._time_type in [np.int32, np.int64]:
+            if self._is_doy:
                 time_ind = self.control.current_doy - 1
 
             else:
@@ -0,0 +1,124 @@
+"""Timing of the phases of the processes of a model run.
+
+A timed run (``Model.run(timings=True)``) calls the labeled plan of a time
+step (see `Model.step_plan`) and measures the wall time of every call.
+Untimed runs do not go through this module.
+"""
+
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from tqdm.auto import tqdm
+
+from ..constants import fileish
+
+
+def _compile_seconds(listener) -> float:
+    return listener.duration if listener.done else 0.0
+
+
+class StepTimer:
+    """Time the calls of the time steps of a model.
+
+    The wall time of each call of the plan is recorded for every time step.
+    The time spent compiling numba kernels during a call (the jit
+    compilation happens on the first calls of the kernels) is subtracted
+    from the call and accumulated separately as the jit_compile phase of
+    its process.
+
+    Args:
+        plan: a list of (process, phase, call) tuples, see
+            `Model.step_plan`.
+        n_time_steps: the number of time steps to time.
+        times: the simulation times of the steps, for the trace.
+    """
+
+    def __init__(self, plan: list, n_time_steps: int, times: np.ndarray):
+        self.labels = [(process, phase) for process, phase, _ in plan]
+        self._calls = [call for _, _, call in plan]
+        self.times = times
+        self.step_seconds = np.zeros((n_time_steps, len(plan)))
+        self.compile_seconds = np.zeros(len(plan))
+        return
+
+    def run(self) -> None:
+        """Run and time the plan for every time step."""
+        # numba is imported on first use by pywatershed
+        from numba.core import event
+
+        calls = self._calls
+        step_seconds = self.step_seconds
+        compile_seconds = self.compile_seconds
+        # the outermost of nested compilations are timed
+        compiles = event.TimingListener()
+        with event.install_listener("numba:compile", compiles):
+            for istep in tqdm(range(step_seconds.shape[0])):
+                seconds = step_seconds[istep]
+                for icall, call in enumerate(calls):
+                    compile_start = _compile_seconds(compiles)
+                    start = perf_counter()
+                    call()
+                    seconds[icall] = perf_counter() - start
+                    compile_seconds[icall] += (
+                        _compile_seconds(compiles) - compile_start
+                    )
+        return None
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """The total time by process and phase.
+
+        Returns:
+            A DataFrame indexed by process and phase with the columns
+            seconds (excluding jit compilation), calls (the number of time
+            steps, or 1 for jit_compile) and seconds_per_call, in the order
+            of the plan.
+        """
+        seconds = {}
+        calls = {}
+        for label, call_seconds, call_compile in zip(
+            self.labels, self.step_seconds.sum(axis=0), self.compile_seconds
+        ):
+            seconds[label] = seconds.get(label, 0.0) + (
+                call_seconds - call_compile
+            )
+            # the calls of a label are counted once per time step
+            calls[label] = self.step_seconds.shape[0]
+            if call_compile:
+                compile_label = (label[0], "jit_compile")
+                seconds[compile_label] = (
+                    seconds.get(compile_label, 0.0) + call_compile
+                )
+                calls[compile_label] = 1
+
+        index = pd.MultiIndex.from_tuples(
+            list(seconds.keys()), names=["process", "phase"]
+        )
+        df = pd.DataFrame(
+            {"seconds": list(seconds.values()), "calls": list(calls.values())},
+            index=index,
+        )
+        df["seconds_per_call"] = df["seconds"] / df["calls"]
+        return df
+
+    def write_trace(self, trace_file: fileish) -> None:
+        """Write the time of every phase by time step to a csv file.
+
+        The columns are the simulation time and one column per process and
+        phase, named process/phase, of the wall time in seconds (including
+        jit compilation).
+
+        Args:
+            trace_file: the path of the csv file.
+        """
+        columns = list(dict.fromkeys(self.labels))
+        trace = np.zeros((self.step_seconds.shape[0], len(columns)))
+        for icall, label in enumerate(self.labels):
+            trace[:, columns.index(label)] += self.step_seconds[:, icall]
+        df = pd.DataFrame(
+            trace,
+            columns=[f"{process}/{phase}" for process, phase in columns],
+            index=pd.Index(self.times, name="time"),
+        )
+        df.to_csv(trace_file)
+        return None
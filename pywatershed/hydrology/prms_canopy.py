@@ -1,8 +1,9 @@
-from typing import Literal
+from typing import Literal, Union
 from warnings import warn
 
 import numpy as np
 from numba import prange
+from numba.extending import register_jitable
 
 from ..base.adapter import adaptable
 from ..base.conservative_process import ConservativeProcess
@@ -13,10 +14,15 @@ from ..constants import (
     dnearzero,
     nan,
     nearzero,
-    numba_num_threads,
     zero,
 )
 from ..parameters import Parameters
+from ..utils.numba_utils import (
+    fastmath_flags,
+    get_num_threads,
+    jit_kernel,
+    threaded_kernel,
+)
 
 try:
     from ..prms_canopy_f import canopy
@@ -66,6 +72,9 @@ class PRMSCanopy(ConservativeProcess):
         budget_type: one of [None, "warn", "error"]
         calc_method: one of ["fortran", "numba", "numpy"]. None defaults to
             "numba".
+        numba_num_threads: the number of threads of the numba kernels, an
+            int or a dictionary of process names to ints. None defaults to the
+            NUMBA_NUM_THREADS environment variable.
         verbose: Print extra information or not?
         load_n_time_batches: not-implemented
     """
@@ -85,6 +94,7 @@ class PRMSCanopy(ConservativeProcess):
         pptmix: adaptable,
         budget_type: Literal[None, "warn", "error"] = None,
         calc_method: Literal["fortran", "numba", "numpy"] = None,
+        numba_num_threads: Union[int, dict] = None,
         verbose: bool = None,
     ):
         super().__init__(
@@ -187,14 +197,11 @@ class PRMSCanopy(ConservativeProcess):
             self._calc_method = "numba"
 
         if self._calc_method.lower() in ["numba"]:
-            import numba as nb
-
             numba_msg = f"{self.name} jit compiling with numba "
-            nb_parallel = (numba_num_threads is not None) and (
-                numba_num_threads > 1
-            )
+            num_threads = get_num_threads(self._numba_num_threads, self.name)
+            nb_parallel = num_threads > 1
             if nb_parallel:
-                numba_msg += f"and using {numba_num_threads} threads"
+                numba_msg += f"and using {num_threads} threads"
             print(numba_msg, flush=True)
 
             # JLM: note. I gave up on specifying signatures because it
@@ -219,7 +226,6 @@ class PRMSCanopy(ConservativeProcess):
             #     ),
             #     fastmath=True,
             # )(self._intercept)
-            self._intercept = nb.njit(fastmath=True)(self._intercept)
 
             # self._calculate_numba = nb.njit(
             #     nb.types.Tuple(
@@ -276,9 +282,14 @@ class PRMSCanopy(ConservativeProcess):
             #     ),
             #     fastmath=True,
             # )(self._calculate_procedural)
-            self._calculate_canopy = nb.njit(
-                fastmath=True, parallel=nb_parallel
-            )(self._calculate_numpy)
+            self._calculate_canopy = threaded_kernel(
+                jit_kernel(
+                    self._calculate_numpy,
+                    fastmath=fastmath_flags,
+                    parallel=nb_parallel,
+                ),
+                num_threads,
+            )
 
         elif self._calc_method.lower() == "fortran":
             pass
@@ -362,7 +373,6 @@ class PRMSCanopy(ConservativeProcess):
                 snow=np.int32(SNOW),
                 off=np.int32(OFF),
                 active=np.int32(ACTIVE),
-                intercept=self._intercept,
             )
 
         else:
@@ -463,7 +473,6 @@ class PRMSCanopy(ConservativeProcess):
         snow,
         off,
         active,
-        intercept,
     ):
         # TODO: would be nice to alphabetize the arguments
         #       probably while keeping constants at the end.
@@ -664,3 +673,8 @@ class PRMSCanopy(ConservativeProcess):
                 net_precip[i] += (intcp_stor[i] - stor_max[i]) * covden[i]
                 intcp_stor[i] = stor_max[i]
         return
+
+
+# The kernel calls the sub-kernels as module globals so numba compiles them
+# into it and can cache it.
+intercept = register_jitable(fastmath=fastmath_flags)(PRMSCanopy._intercept)
@@ -1,14 +1,21 @@
-from typing import Literal, Tuple
+from typing import Literal, Tuple, Union
 from warnings import warn
 
 import networkx as nx
 import numpy as np
+from numba import prange
 
 from ..base.adapter import adaptable
 from ..base.conservative_process import ConservativeProcess
 from ..base.control import Control
 from ..constants import SegmentType, nan, zero
 from ..parameters import Parameters
+from ..utils.numba_utils import (
+    fastmath_flags,
+    get_num_threads,
+    jit_kernel,
+    threaded_kernel,
+)
 
 try:
     from ..prms_channel_f import calc_muskingum_mann as _calculate_fortran
@@ -18,6 +25,11 @@ except ImportError:
     has_prmschannel_f = False
 
 
+# The minimum number of segments in a level for numba to route it in parallel,
+# runs of narrower levels are routed serially (in level order)
+level_parallel_min_segments = 256
+
+
 class PRMSChannel(ConservativeProcess):
     """PRMS channel flow (muskingum_mann).
 
@@ -84,6 +96,16 @@ class PRMSChannel(ConservativeProcess):
         budget_type: one of [None, "warn", "error"]
         calc_method: one of ["fortran", "numba", "numpy"]. None defaults to
             "numba".
+        numba_num_threads: the number of threads of the numba kernels, an
+            int or a dictionary of process names to ints. None defaults to the
+            NUMBA_NUM_THREADS environment variable.
+        channel_routing: one of ["serial", "level"]. None defaults to
+            "serial" which routes one segment at a time in topological order.
+            "level" routes the segments in topological levels (groups of
+            segments whose upstream segments are all in previous levels), with
+            vectorized numpy or numba prange over the segments of a level.
+            The results are the same as "serial". Not available with
+            calc_method="fortran".
         adjust_parameters: one of ["warn", "error", "no"]. Default is "warn",
             the code edits the parameters and issues a warning. If "error" is
             selected the the code issues warnings about all edited parameters
@@ -93,6 +115,18 @@ class PRMSChannel(ConservativeProcess):
         verbose: Print extra information or not?
     """
 
+    # The routing is in float64 whatever the float_precision of the control,
+    # only the inputs follow it.
+    _float_precisions = ("float64",)
+    # the routing terms carried between time steps
+    _checkpoint_private = (
+        "_seg_inflow",
+        "_seg_inflow0",
+        "_inflow_ts",
+        "_outflow_ts",
+        "_seg_current_sum",
+    )
+
     def __init__(
         self,
         control: Control,
@@ -103,6 +137,8 @@ class PRMSChannel(ConservativeProcess):
         gwres_flow_vol: adaptable,
         budget_type: Literal[None, "warn", "error"] = None,
         calc_method: Literal["fortran", "numba", "numpy"] = None,
+        numba_num_threads: Union[int, dict] = None,
+        channel_routing: Literal["serial", "level"] = None,
         adjust_parameters: Literal["warn", "error", "no"] = "warn",
         verbose: bool = None,
     ) -> None:
@@ -197,6 +233,14 @@ class PRMSChannel(ConservativeProcess):
         self._tosegment = self.tosegment - 1
         self._tosegment = self._tosegment.astype("int64")
 
+        # The HRU to segment lateral inflow operator: the HRUs routed to a
+        # segment and their segments. The fluxes of HRUs not routed to any
+        # segment (hru_segment = 0) are discarded (set to zero).
+        self._hru_routed = np.where(self._hru_segment >= 0)[0].astype("int64")
+        self._hru_routed_segment = self._hru_segment[self._hru_routed].astype(
+            "int64"
+        )
+
         # calculate connectivity
         self._outflow_mask = np.full((len(self._tosegment)), False)
         connectivity = []
@@ -328,6 +372,8 @@ class PRMSChannel(ConservativeProcess):
         self._c1[idx] += self._c0[idx]
         self._c0[idx] = 0.0
 
+        self._initialize_routing_levels()
+
         # local flow variables
         self._seg_inflow = np.zeros(self.nsegment, dtype=float)
         self._seg_inflow0 = np.zeros(self.nsegment, dtype=float) * nan
@@ -344,6 +390,122 @@ class PRMSChannel(ConservativeProcess):
 
         return
 
+    def _initialize_routing_levels(self) -> None:
+        """Compute the level schedule for channel_routing="level"
+
+        The level of a segment is one more than the maximum level of the
+        segments upstream of it, headwater segments have level 0. Within a
+        level the segments are in topological (serial) order and the segments
+        upstream of each segment are also kept in topological order so that
+        the upstream inflows are summed in the same order as serial routing.
+        """
+        if self._channel_routing is None:
+            self._channel_routing = "serial"
+
+        avail_routing = ["serial", "level"]
+        if self._channel_routing not in avail_routing:
+            msg = (
+                f"Invalid channel_routing={self._channel_routing} for "
+                f"{self.name}, must be one of {avail_routing}"
+            )
+            raise ValueError(msg)
+
+        if self._channel_routing == "serial":
+            self._routing_schedule = ()
+            return
+
+        # levels, visited in topological order
+        seg_level = np.zeros(self.nsegment, dtype="int64")
+        for iseg in self._segment_order:
+            to_seg = self._tosegment[iseg]
+            if to_seg >= 0:
+                seg_level[to_seg] = max(seg_level[to_seg], seg_level[iseg] + 1)
+
+        n_levels = seg_level.max() + 1
+        order_level = seg_level[self._segment_order]
+        self._level_segs = self._segment_order[
+            np.argsort(order_level, kind="stable")
+        ]
+        self._level_ptr = np.zeros(n_levels + 1, dtype="int64")
+        self._level_ptr[1:] = np.cumsum(
+            np.bincount(order_level, minlength=n_levels)
+        )
+
+        # upstream segments of each segment, compressed sparse rows
+        from_segs = self._segment_order[
+            self._tosegment[self._segment_order] >= 0
+        ]
+        to_segs = self._tosegment[from_segs]
+        self._up_segs = from_segs[np.argsort(to_segs, kind="stable")]
+        self._up_ptr = np.zeros(self.nsegment + 1, dtype="int64")
+        self._up_ptr[1:] = np.cumsum(
+            np.bincount(to_segs, minlength=self.nsegment)
+        )
+
+        # for numpy, with the segments permuted to level order so each
+        # level is a contiguous slice: the slice of each level, the k-th
+        # upstream segments of the segments in the level and the segments
+        # routed (by the Muskingum equation or not) on each hour
+        level_pos = np.empty(self.nsegment, dtype="int64")
+        level_pos[self._level_segs] = np.arange(self.nsegment)
+        self._level_schedule = []
+        for ilev in range(n_levels):
+            start = self._level_ptr[ilev]
+            end = self._level_ptr[ilev + 1]
+            segs = self._level_segs[start:end]
+            n_up = self._up_ptr[segs + 1] - self._up_ptr[segs]
+            gathers = []
+            for kk in range(n_up.max()):
+                pos_k = np.where(n_up > kk)[0]
+                ups_k = self._up_segs[self._up_ptr[segs[pos_k]] + kk]
+                gathers += [(pos_k, level_pos[ups_k])]
+
+            tsi = self._tsi[segs]
+            routed = []
+            for ihr in range(24):
+                pos = np.where((ihr + 1) % tsi == 0)[0] + start
+                if not len(pos):
+                    routed += [None]
+                    continue
+                musk = pos[self._tsi[self._level_segs[pos]] > 0]
+                short = pos[self._tsi[self._level_segs[pos]] <= 0]
+                routed += [(pos, musk, short)]
+
+            self._level_schedule += [(start, end, gathers, routed)]
+
+        return
+
+    def _level_blocks(self, min_segments: int) -> Tuple[np.ndarray]:
+        """Group the levels into blocks routed in parallel or serially
+
+        Levels with at least min_segments segments are parallel blocks, runs
+        of narrower levels are merged into serial blocks which are routed in
+        level order.
+
+        Args:
+            min_segments: the minimum number of segments of a parallel level
+
+        Returns:
+            block_ptr: the start of each block in _level_segs
+            block_parallel: is each block routed in parallel?
+        """
+        level_width = np.diff(self._level_ptr)
+        block_ptr = [0]
+        block_parallel = []
+        for ilev, width in enumerate(level_width):
+            parallel = width >= min_segments
+            if len(block_parallel) and not parallel and not block_parallel[-1]:
+                # extend the serial block
+                block_ptr[-1] = self._level_ptr[ilev + 1]
+                continue
+            block_ptr += [self._level_ptr[ilev + 1]]
+            block_parallel += [parallel]
+
+        return (
+            np.array(block_ptr, dtype="int64"),
+            np.array(block_parallel, dtype="bool"),
+        )
+
     def _init_calc_method(self):
         if self._calc_method is None:
             self._calc_method = "numba"
@@ -363,14 +525,48 @@ class PRMSChannel(ConservativeProcess):
             warn(msg)
             self._calc_method = "numba"
 
+        if (
+            self._calc_method.lower() == "fortran"
+            and self._channel_routing == "level"
+        ):
+            msg = (
+                f"channel_routing='level' is not available with "
+                f"calc_method='fortran', using 'serial' for {self.name}"
+            )
+            warn(msg)
+            self._channel_routing = "serial"
+            self._routing_schedule = ()
+
         if self._calc_method.lower() == "numba":
             import numba as nb
 
             numba_msg = f"{self.name} jit compiling with numba "
-            # this method can not be parallelized (? true?)
+            # serial routing can not be parallelized, level routing can be
+            num_threads = get_num_threads(self._numba_num_threads, self.name)
+            nb_parallel = self._channel_routing == "level" and num_threads > 1
+            if nb_parallel:
+                numba_msg += f"and using {num_threads} threads"
             print(numba_msg, flush=True)
 
-            self._muskingum_mann = nb.njit(
+            input_type = nb.from_dtype(np.dtype(self._input_float_type))
+            self._lateral_inflow = jit_kernel(
+                self._lateral_inflow_loop,
+                nb.void(
+                    nb.int64[:],  # _hru_routed
+                    nb.int64[:],  # _hru_routed_segment
+                    input_type[:],  # sroff_vol
+                    input_type[:],  # ssres_flow_vol
+                    input_type[:],  # gwres_flow_vol
+                    nb.float64,  # s_per_time
+                    nb.float64[:],  # channel_sroff_vol
+                    nb.float64[:],  # channel_ssres_flow_vol
+                    nb.float64[:],  # channel_gwres_flow_vol
+                    nb.float64[:],  # seg_lateral_inflow
+                ),
+            )
+
+            self._muskingum_mann = jit_kernel(
+                self._muskingum_mann_numpy,
                 nb.types.UniTuple(nb.float64[:], 7)(
                     nb.int64[:],  # _segment_order
                     nb.int64[:],  # _tosegment
@@ -383,14 +579,64 @@ class PRMSChannel(ConservativeProcess):
                     nb.float64[:],  # _c1
                     nb.float64[:],  # _c2
                 ),
-                fastmath=True,
+                fastmath=fastmath_flags,
                 parallel=False,
-            )(self._muskingum_mann_numpy)
+            )
+
+            if self._channel_routing == "level":
+                muskingum_mann_levels = jit_kernel(
+                    self._muskingum_mann_levels_loop,
+                    nb.types.UniTuple(nb.float64[:], 7)(
+                        nb.int64[:],  # _segment_order
+                        nb.int64[:],  # _tosegment
+                        nb.float64[:],  # seg_lateral_inflow
+                        nb.float64[:],  # _seg_inflow0
+                        nb.float64[:],  # _outflow_ts
+                        nb.int64[:],  # _tsi
+                        nb.float64[:],  # _ts
+                        nb.float64[:],  # _c0
+                        nb.float64[:],  # _c1
+                        nb.float64[:],  # _c2
+                        nb.int64[:],  # block_ptr
+                        nb.boolean[:],  # block_parallel
+                        nb.int64[:],  # _level_segs
+                        nb.int64[:],  # _up_ptr
+                        nb.int64[:],  # _up_segs
+                    ),
+                    fastmath=fastmath_flags,
+                    parallel=nb_parallel,
+                )
+                self._muskingum_mann = threaded_kernel(
+                    muskingum_mann_levels, num_threads if nb_parallel else 1
+                )
+
+                if nb_parallel:
+                    min_segments = level_parallel_min_segments
+                else:
+                    min_segments = self.nsegment + 1
+                block_ptr, block_parallel = self._level_blocks(min_segments)
+                self._routing_schedule = (
+                    block_ptr,
+                    block_parallel,
+                    self._level_segs,
+                    self._up_ptr,
+                    self._up_segs,
+                )
 
         elif self._calc_method.lower() == "fortran":
+            self._lateral_inflow = self._lateral_inflow_numpy
             self._muskingum_mann = _calculate_fortran
 
+        elif self._channel_routing == "level":
+            self._lateral_inflow = self._lateral_inflow_numpy
+            self._muskingum_mann = self._muskingum_mann_levels_numpy
+            self._routing_schedule = (
+                self._level_segs,
+                self._level_schedule,
+            )
+
         else:
+            self._lateral_inflow = self._lateral_inflow_numpy
             self._muskingum_mann = self._muskingum_mann_numpy
 
     def _advance_variables(self) -> None:
@@ -403,34 +649,19 @@ class PRMSChannel(ConservativeProcess):
         # This could vary with timestep so leave here
         s_per_time = self.control.time_step_seconds
 
-        # WRITE a function for this?
         # calculate lateral flow term
-        self.seg_lateral_inflow[:] = 0.0
-        for ihru in range(self.nhru):
-            iseg = self._hru_segment[ihru]
-            if iseg < 0:
-                # This is bad, selective handling of fluxes is not cool,
-                # mass is being discarded in a way that has to be coordinated
-                # with other parts of the code.
-                # This code shuold be removed evenutally.
-                self.channel_sroff_vol[ihru] = zero
-                self.channel_ssres_flow_vol[ihru] = zero
-                self.channel_gwres_flow_vol[ihru] = zero
-                continue
-
-            else:
-                self.channel_sroff_vol[ihru] = self.sroff_vol[ihru]
-                self.channel_ssres_flow_vol[ihru] = self.ssres_flow_vol[ihru]
-                self.channel_gwres_flow_vol[ihru] = self.gwres_flow_vol[ihru]
-
-            # cubicfeet to cfs
-            lateral_inflow = (
-                self.channel_sroff_vol[ihru]
-                + self.channel_ssres_flow_vol[ihru]
-                + self.channel_gwres_flow_vol[ihru]
-            ) / (s_per_time)
-
-            self.seg_lateral_inflow[iseg] += lateral_inflow
+        self._lateral_inflow(
+            self._hru_routed,
+            self._hru_routed_segment,
+            self.sroff_vol,
+            self.ssres_flow_vol,
+            self.gwres_flow_vol,
+            float(s_per_time),
+            self.channel_sroff_vol,
+            self.channel_ssres_flow_vol,
+            self.channel_gwres_flow_vol,
+            self.seg_lateral_inflow,
+        )
 
         # solve muskingum_mann routing
 
@@ -453,6 +684,7 @@ class PRMSChannel(ConservativeProcess):
             self._c0,
             self._c1,
             self._c2,
+            *self._routing_schedule,
         )
 
         self.seg_stor_change[:] = (
@@ -465,6 +697,91 @@ class PRMSChannel(ConservativeProcess):
 
         return
 
+    @staticmethod
+    def _lateral_inflow_numpy(
+        hru_routed: np.ndarray,
+        hru_routed_segment: np.ndarray,
+        sroff_vol: np.ndarray,
+        ssres_flow_vol: np.ndarray,
+        gwres_flow_vol: np.ndarray,
+        s_per_time: float,
+        channel_sroff_vol: np.ndarray,
+        channel_ssres_flow_vol: np.ndarray,
+        channel_gwres_flow_vol: np.ndarray,
+        seg_lateral_inflow: np.ndarray,
+    ) -> None:
+        """Aggregate the HRU fluxes to segment lateral inflows (in place)
+
+        Args:
+            hru_routed: the indices of the HRUs routed to a segment
+            hru_routed_segment: the segment index of each routed HRU
+            sroff_vol: surface runoff volume of each HRU
+            ssres_flow_vol: interflow volume of each HRU
+            gwres_flow_vol: groundwater discharge volume of each HRU
+            s_per_time: seconds per time step
+            channel_sroff_vol: (out) surface runoff volume to the channel
+            channel_ssres_flow_vol: (out) interflow volume to the channel
+            channel_gwres_flow_vol: (out) groundwater discharge volume to
+                the channel
+            seg_lateral_inflow: (out) segment lateral inflow
+        """
+        # This is bad, selective handling of fluxes is not cool, mass is
+        # being discarded in a way that has to be coordinated with other
+        # parts of the code. This should be removed evenutally.
+        for channel_vol, vol in (
+            (channel_sroff_vol, sroff_vol),
+            (channel_ssres_flow_vol, ssres_flow_vol),
+            (channel_gwres_flow_vol, gwres_flow_vol),
+        ):
+            channel_vol[:] = zero
+            channel_vol[hru_routed] = vol[hru_routed]
+
+        # cubicfeet to cfs
+        lateral_inflow = (
+            channel_sroff_vol[hru_routed]
+            + channel_ssres_flow_vol[hru_routed]
+            + channel_gwres_flow_vol[hru_routed]
+        ) / s_per_time
+
+        # bincount sums in HRU order, as the loop below
+        seg_lateral_inflow[:] = np.bincount(
+            hru_routed_segment,
+            weights=lateral_inflow,
+            minlength=seg_lateral_inflow.shape[0],
+        )
+        return
+
+    @staticmethod
+    def _lateral_inflow_loop(
+        hru_routed: np.ndarray,
+        hru_routed_segment: np.ndarray,
+        sroff_vol: np.ndarray,
+        ssres_flow_vol: np.ndarray,
+        gwres_flow_vol: np.ndarray,
+        s_per_time: float,
+        channel_sroff_vol: np.ndarray,
+        channel_ssres_flow_vol: np.ndarray,
+        channel_gwres_flow_vol: np.ndarray,
+        seg_lateral_inflow: np.ndarray,
+    ) -> None:
+        """The loop version of _lateral_inflow_numpy, for numba."""
+        channel_sroff_vol[:] = zero
+        channel_ssres_flow_vol[:] = zero
+        channel_gwres_flow_vol[:] = zero
+        seg_lateral_inflow[:] = zero
+        for ii in range(hru_routed.shape[0]):
+            ihru = hru_routed[ii]
+            channel_sroff_vol[ihru] = sroff_vol[ihru]
+            channel_ssres_flow_vol[ihru] = ssres_flow_vol[ihru]
+            channel_gwres_flow_vol[ihru] = gwres_flow_vol[ihru]
+
+            # cubicfeet to cfs
+            seg_lateral_inflow[hru_routed_segment[ii]] += (
+                sroff_vol[ihru] + ssres_flow_vol[ihru] + gwres_flow_vol[ihru]
+            ) / s_per_time
+
+        return
+
     @staticmethod
     def _muskingum_mann_numpy(
         segment_order: np.ndarray,
@@ -601,3 +918,219 @@ class PRMSChannel(ConservativeProcess):
             outflow_ts,
             seg_current_sum,
         )
+
+    @staticmethod
+    def _muskingum_mann_levels_numpy(
+        segment_order: np.ndarray,
+        to_segment: np.ndarray,
+        seg_lateral_inflow: np.ndarray,
+        seg_inflow0: np.ndarray,
+        outflow_ts: np.ndarray,
+        tsi: np.ndarray,
+        ts: np.ndarray,
+        c0: np.ndarray,
+        c1: np.ndarray,
+        c2: np.ndarray,
+        level_segs: np.ndarray,
+        level_schedule: list,
+    ) -> Tuple[
+        np.ndarray,
+        np.ndarray,
+        np.ndarray,
+        np.ndarray,
+        np.ndarray,
+        np.ndarray,
+        np.ndarray,
+    ]:
+        """
+        Muskingum routing vectorized over the segments of each topological
+        level, see _muskingum_mann_numpy for the arguments and returns.
+
+        Args:
+            level_segs: the segments ordered by level, the permutation to
+                level order
+            level_schedule: for each level, the start and end of the level
+                in level order, a list over k of (positions in the level,
+                k-th upstream segments) and a list over hours of the segments
+                routed (all, by the Muskingum equation, with short travel
+                times) or None.
+        """
+        # permute to level order, each level is a contiguous slice
+        seg_lateral_inflow = seg_lateral_inflow[level_segs]
+        seg_inflow0 = seg_inflow0[level_segs]
+        outflow_ts = outflow_ts[level_segs]
+        ts = ts[level_segs]
+        c0 = c0[level_segs]
+        c1 = c1[level_segs]
+        c2 = c2[level_segs]
+
+        # initialize variables for the day
+        seg_inflow = seg_inflow0 * zero
+        seg_outflow = seg_inflow0 * zero
+        inflow_ts = seg_inflow0 * zero
+        seg_current_sum = seg_inflow0 * zero
+
+        for ihr in range(24):
+            for start, end, gathers, routed in level_schedule:
+                # the upstream segments are in previous levels and their
+                # outflows are summed in topological order
+                seg_upstream_inflow = np.zeros(end - start)
+                for pos_k, ups_k in gathers:
+                    seg_upstream_inflow[pos_k] += outflow_ts[ups_k]
+
+                seg_current_inflow = (
+                    seg_lateral_inflow[start:end] + seg_upstream_inflow
+                )
+                seg_inflow[start:end] += seg_current_inflow
+                inflow_ts[start:end] += seg_current_inflow
+                seg_current_sum[start:end] += seg_upstream_inflow
+
+                if routed[ihr] is not None:
+                    # segments routed on current hour
+                    pos, musk, short = routed[ihr]
+                    inflow_ts[pos] /= ts[pos]
+
+                    # Muskingum routing equation, or for travel times of 1
+                    # hour or less outflow is set equal to the inflow
+                    outflow_ts[musk] = (
+                        inflow_ts[musk] * c0[musk]
+                        + seg_inflow0[musk] * c1[musk]
+                        + outflow_ts[musk] * c2[musk]
+                    )
+                    outflow_ts[short] = inflow_ts[short]
+
+                    seg_inflow0[pos] = inflow_ts[pos]
+                    inflow_ts[pos] = 0.0
+
+                seg_outflow[start:end] += outflow_ts[start:end]
+
+        seg_outflow /= 24.0
+        seg_inflow /= 24.0
+
+        # permute back to segment order
+        results = []
+        for var in (
+            seg_current_sum / 24.0,
+            seg_inflow0,
+            seg_inflow,
+            seg_outflow,
+            inflow_ts,
+            outflow_ts,
+            seg_current_sum,
+        ):
+            result = np.empty_like(var)
+            result[level_segs] = var
+            results += [result]
+
+        return tuple(results)
+
+    @staticmethod
+    def _muskingum_mann_levels_loop(
+        segment_order: np.ndarray,
+        to_segment: np.ndarray,
+        seg_lateral_inflow: np.ndarray,
+        seg_inflow0: np.ndarray,
+        outflow_ts: np.ndarray,
+        tsi: np.ndarray,
+        ts: np.ndarray,
+        c0: np.ndarray,
+        c1: np.ndarray,
+        c2: np.ndarray,
+        block_ptr: np.ndarray,
+        block_parallel: np.ndarray,
+        level_segs: np.ndarray,
+        up_ptr: np.ndarray,
+        up_segs: np.ndarray,
+    ) -> Tuple[
+        np.ndarray,
+        np.ndarray,
+        np.ndarray,
+        np.ndarray,
+        np.ndarray,
+        np.ndarray,
+        np.ndarray,
+    ]:
+        """
+        Muskingum routing with prange over the segments of each topological
+        level, for numba. See _muskingum_mann_numpy for the arguments and
+        returns.
+
+        Args:
+            block_ptr: the start of each block of levels in level_segs
+            block_parallel: is each block routed in parallel or serially?
+            level_segs: the segments ordered by level
+            up_ptr: the start of the upstream segments of each segment in
+                up_segs
+            up_segs: the upstream segments of each segment
+        """
+        # initialize variables for the day
+        seg_inflow = seg_inflow0 * zero
+        seg_outflow = seg_inflow0 * zero
+        inflow_ts = seg_inflow0 * zero
+        seg_current_sum = seg_inflow0 * zero
+
+        for ihr in range(24):
+            for iblock in range(block_ptr.shape[0] - 1):
+                # a parallel block is one level of independent segments, a
+                # serial block is routed in level order by a single thread
+                block_start = block_ptr[iblock]
+                block_end = block_ptr[iblock + 1]
+                if block_parallel[iblock]:
+                    n_chunks = block_end - block_start
+                else:
+                    n_chunks = 1
+                for ichunk in prange(n_chunks):
+                    if block_parallel[iblock]:
+                        chunk_start = block_start + ichunk
+                        chunk_end = chunk_start + 1
+                    else:
+                        chunk_start = block_start
+                        chunk_end = block_end
+                    for ii in range(chunk_start, chunk_end):
+                        jseg = level_segs[ii]
+
+                        # the upstream segments are in previous levels
+                        upstream_inflow = 0.0
+                        for kk in range(up_ptr[jseg], up_ptr[jseg + 1]):
+                            upstream_inflow += outflow_ts[up_segs[kk]]
+
+                        seg_current_inflow = (
+                            seg_lateral_inflow[jseg] + upstream_inflow
+                        )
+                        seg_inflow[jseg] += seg_current_inflow
+                        inflow_ts[jseg] += seg_current_inflow
+                        seg_current_sum[jseg] += upstream_inflow
+
+                        remainder = (ihr + 1) % tsi[jseg]
+                        if remainder == 0:
+                            # segment routed on current hour
+                            inflow_ts[jseg] /= ts[jseg]
+
+                            if tsi[jseg] > 0:
+                                # Muskingum routing equation
+                                outflow_ts[jseg] = (
+                                    inflow_ts[jseg] * c0[jseg]
+                                    + seg_inflow0[jseg] * c1[jseg]
+                                    + outflow_ts[jseg] * c2[jseg]
+                                )
+                            else:
+                                outflow_ts[jseg] = inflow_ts[jseg]
+
+                            seg_inflow0[jseg] = inflow_ts[jseg]
+                            inflow_ts[jseg] = 0.0
+
+                        seg_outflow[jseg] += outflow_ts[jseg]
+
+        seg_outflow /= 24.0
+        seg_inflow /= 24.0
+        seg_upstream_inflow = seg_current_sum.copy() / 24.0
+
+        return (
+            seg_upstream_inflow,
+            seg_inflow0,
+            seg_inflow,
+            seg_outflow,
+            inflow_ts,
+            outflow_ts,
+            seg_current_sum,
+        )
@@ -1,13 +1,20 @@
-from typing import Literal
+from typing import Literal, Union
 from warnings import warn
 
 import numpy as np
+from numba.extending import register_jitable
 
 from ..base.adapter import adaptable, adapter_factory
 from ..base.conservative_process import ConservativeProcess
 from ..base.control import Control
-from ..constants import nan, numba_num_threads
+from ..constants import nan
 from ..parameters import Parameters
+from ..utils.numba_utils import (
+    fastmath_flags,
+    get_num_threads,
+    jit_kernel,
+    threaded_kernel,
+)
 
 try:
     from ..prms_groundwater_f import calc_groundwater as _calculate_fortran
@@ -42,6 +49,9 @@ class PRMSGroundwater(ConservativeProcess):
         budget_type: one of [None, "warn", "error"]
         calc_method: one of ["fortran", "numba", "numpy"]. None defaults to
             "numba".
+        numba_num_threads: the number of threads of the numba kernels, an
+            int or a dictionary of process names to ints. None defaults to the
+            NUMBA_NUM_THREADS environment variable.
         verbose: Print extra information or not?
 
     """
@@ -57,6 +67,7 @@ class PRMSGroundwater(ConservativeProcess):
         dprst_flag: bool = None,
         budget_type: Literal[None, "warn", "error"] = None,
         calc_method: Literal["fortran", "numba", "numpy"] = None,
+        numba_num_threads: Union[int, dict] = None,
         verbose: bool = None,
     ) -> None:
         super().__init__(
@@ -168,34 +179,46 @@ class PRMSGroundwater(ConservativeProcess):
             import numba as nb
 
             numba_msg = f"{self.name} jit compiling with numba "
-            nb_parallel = (numba_num_threads is not None) and (
-                numba_num_threads > 1
-            )
+            num_threads = get_num_threads(self._numba_num_threads, self.name)
+            nb_parallel = num_threads > 1
             if nb_parallel:
-                numba_msg += f"and using {numba_num_threads} threads"
+                numba_msg += f"and using {num_threads} threads"
             print(numba_msg, flush=True)
 
-            self._calculate_gw = nb.njit(
-                nb.types.UniTuple(nb.float64[:], 5)(
-                    nb.types.Array(nb.types.float64, 1, "C", readonly=True),
-                    nb.float64[:],
-                    nb.float64[:],
-                    nb.float64[:],
-                    nb.float64[:],
-                    nb.types.Array(nb.types.float64, 1, "C", readonly=True),
-                    nb.types.Array(nb.types.float64, 1, "C", readonly=True),
-                    nb.float64[:],
-                    nb.types.Array(nb.types.float64, 1, "C", readonly=True),
+            float_type = nb.from_dtype(np.dtype(self._float_type))
+            param_type = nb.types.Array(float_type, 1, "C", readonly=True)
+            self._calculate_gw = jit_kernel(
+                self._calculate_numpy,
+                nb.types.UniTuple(float_type[:], 5)(
+                    param_type,
+                    float_type[:],
+                    float_type[:],
+                    float_type[:],
+                    float_type[:],
+                    param_type,
+                    param_type,
+                    float_type[:],
+                    param_type,
                 ),
-                fastmath=True,
-                parallel=False,
-            )(self._calculate_numpy)
+                fastmath=fastmath_flags,
+                parallel=nb_parallel,
+            )
+            self._calculate_gw = threaded_kernel(
+                self._calculate_gw, num_threads
+            )
+            # the step kernel is compiled into the (serial) block kernel
+            self._calculate_gw_block = jit_kernel(
+                self._calculate_block_numpy, fastmath=fastmath_flags
+            )
 
         elif self._calc_method.lower() == "fortran":
             self._calculate_gw = _calculate_fortran
+            # the block is calculated a time step at a time
+            self._calculate_gw_block = None
 
         else:
             self._calculate_gw = self._calculate_numpy
+            self._calculate_gw_block = self._calculate_block_numpy
 
         return
 
@@ -224,6 +247,94 @@ class PRMSGroundwater(ConservativeProcess):
         )
         return
 
+    def _calculate_block(self, time_length, input_blocks, output_blocks):
+        if self._calculate_gw_block is None:
+            self._calculate_block_steps(
+                time_length, input_blocks, output_blocks
+            )
+            return
+
+        self._calculate_gw_block(
+            self.hru_area,
+            input_blocks["soil_to_gw"],
+            input_blocks["ssr_to_gw"],
+            input_blocks["dprst_seep_hru"],
+            self.gwres_stor,
+            self.gwflow_coef,
+            self.gwsink_coef,
+            self.gwres_stor_old,
+            self.hru_in_to_cf,
+            output_blocks["gwres_stor"],
+            output_blocks["gwres_flow"],
+            output_blocks["gwres_sink"],
+            output_blocks["gwres_stor_change"],
+            output_blocks["gwres_flow_vol"],
+            output_blocks["gwres_stor_old"],
+        )
+        # the state after the block
+        self.gwres_flow[:] = output_blocks["gwres_flow"][-1]
+        self.gwres_sink[:] = output_blocks["gwres_sink"][-1]
+        self.gwres_stor_change[:] = output_blocks["gwres_stor_change"][-1]
+        self.gwres_flow_vol[:] = output_blocks["gwres_flow_vol"][-1]
+        return
+
+    def _calculate_block_steps(self, time_length, input_blocks, output_blocks):
+        for tt in range(input_blocks["soil_to_gw"].shape[0]):
+            self._advance_variables()
+            for key, block in input_blocks.items():
+                self[key][:] = block[tt]
+            self._calculate(time_length)
+            for var, block in output_blocks.items():
+                block[tt] = self[var]
+        return
+
+    @staticmethod
+    def _calculate_block_numpy(
+        gwarea,
+        soil_to_gw,
+        ssr_to_gw,
+        dprst_seep_hru,
+        gwres_stor,
+        gwflow_coef,
+        gwsink_coef,
+        gwres_stor_old,
+        hru_in_to_cf,
+        gwres_stor_block,
+        gwres_flow_block,
+        gwres_sink_block,
+        gwres_stor_change_block,
+        gwres_flow_vol_block,
+        gwres_stor_old_block,
+    ):
+        """Loop _calculate_numpy over the time steps of the input blocks.
+
+        gwres_stor and gwres_stor_old are updated in place.
+        """
+        for tt in range(soil_to_gw.shape[0]):
+            # _advance_variables
+            gwres_stor_old[:] = gwres_stor
+            (
+                gwres_stor[:],
+                gwres_flow_block[tt, :],
+                gwres_sink_block[tt, :],
+                gwres_stor_change_block[tt, :],
+                gwres_flow_vol_block[tt, :],
+            ) = calculate_gw(
+                gwarea,
+                soil_to_gw[tt],
+                ssr_to_gw[tt],
+                dprst_seep_hru[tt],
+                gwres_stor,
+                gwflow_coef,
+                gwsink_coef,
+                gwres_stor_old,
+                hru_in_to_cf,
+            )
+            gwres_stor_block[tt, :] = gwres_stor
+            gwres_stor_old_block[tt, :] = gwres_stor_old
+
+        return
+
     @staticmethod
     def _calculate_numpy(
         gwarea,
@@ -270,3 +381,10 @@ class PRMSGroundwater(ConservativeProcess):
             gwres_stor_change,
             gwres_flow_vol,
         )
+
+
+# The block kernel calls the step kernel as a module global so that numba
+# compiles it into the block kernel, which can then be cached.
+calculate_gw = register_jitable(fastmath=fastmath_flags)(
+    PRMSGroundwater._calculate_numpy
+)
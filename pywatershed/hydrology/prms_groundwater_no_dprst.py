@@ -1,4 +1,6 @@
-from typing import Literal
+from typing import Literal, Union
+
+import numpy as np
 
 from ..base.adapter import adaptable
 from ..base.control import Control
@@ -32,6 +34,9 @@ class PRMSGroundwaterNoDprst(PRMSGroundwater):
         budget_type: one of [None, "warn", "error"]
         calc_method: one of ["fortran", "numba", "numpy"]. None defaults to
             "numba".
+        numba_num_threads: the number of threads of the numba kernels, an
+            int or a dictionary of process names to ints. None defaults to the
+            NUMBA_NUM_THREADS environment variable.
         verbose: Print extra information or not?
 
     """
@@ -45,6 +50,7 @@ class PRMSGroundwaterNoDprst(PRMSGroundwater):
         ssr_to_gw: adaptable,
         budget_type: Literal[None, "warn", "error"] = None,
         calc_method: Literal["fortran", "numba", "numpy"] = None,
+        numba_num_threads: Union[int, dict] = None,
         verbose: bool = None,
     ) -> None:
         self._dprst_flag = False
@@ -58,6 +64,7 @@ class PRMSGroundwaterNoDprst(PRMSGroundwater):
             dprst_seep_hru=None,
             budget_type=budget_type,
             calc_method=calc_method,
+            numba_num_threads=numba_num_threads,
             verbose=verbose,
         )
 
@@ -135,3 +142,11 @@ class PRMSGroundwaterNoDprst(PRMSGroundwater):
             self.hru_in_to_cf,
         )
         return
+
+    def _calculate_block(self, time_length, input_blocks, output_blocks):
+        zero_block = np.zeros_like(input_blocks["soil_to_gw"])
+        return super()._calculate_block(
+            time_length,
+            {**input_blocks, "dprst_seep_hru": zero_block},
+            output_blocks,
+        )
@@ -1,14 +1,16 @@
-from typing import Literal
+from typing import Literal, Union
 from warnings import warn
 
 import numpy as np
 from numba import prange
+from numba.extending import register_jitable
 
 from ..base.adapter import adaptable
 from ..base.conservative_process import ConservativeProcess
 from ..base.control import Control
-from ..constants import HruType, dnearzero, nearzero, numba_num_threads, zero
+from ..constants import HruType, dnearzero, nearzero, zero
 from ..parameters import Parameters
+from ..utils.numba_utils import get_num_threads, jit_kernel, threaded_kernel
 
 RAIN = 0
 SNOW = 1
@@ -68,6 +70,9 @@ class PRMSRunoff(ConservativeProcess):
         budget_type: one of [None, "warn", "error"]
         calc_method: one of ["numba", "numpy"]. None defaults to
             "numba".
+        numba_num_threads: the number of threads of the numba kernels, an
+            int or a dictionary of process names to ints. None defaults to the
+            NUMBA_NUM_THREADS environment variable.
         verbose: Print extra information or not?
     """
 
@@ -93,6 +98,7 @@ class PRMSRunoff(ConservativeProcess):
         dprst_flag: bool = None,
         budget_type: Literal[None, "warn", "error"] = None,
         calc_method: Literal["numba", "numpy"] = None,
+        numba_num_threads: Union[int, dict] = None,
         verbose: bool = None,
     ) -> None:
         super().__init__(
@@ -127,11 +133,12 @@ class PRMSRunoff(ConservativeProcess):
         # cdl -- todo:
         # this variable is calculated and stored by PRMS but does not seem
         # to be used widely
-        self.dprst_in = np.zeros(self.nhru, dtype=float)
-        self.dprst_vol_open_max = np.zeros(self.nhru, dtype=float)
-        self.dprst_vol_clos_max = np.zeros(self.nhru, dtype=float)
-        self.dprst_frac_clos = np.zeros(self.nhru, dtype=float)
-        self.dprst_vol_thres_open = np.zeros(self.nhru, dtype=float)
+        float_type = self._float_type
+        self.dprst_in = np.zeros(self.nhru, dtype=float_type)
+        self.dprst_vol_open_max = np.zeros(self.nhru, dtype=float_type)
+        self.dprst_vol_clos_max = np.zeros(self.nhru, dtype=float_type)
+        self.dprst_frac_clos = np.zeros(self.nhru, dtype=float_type)
+        self.dprst_vol_thres_open = np.zeros(self.nhru, dtype=float_type)
 
         return
 
@@ -398,24 +405,17 @@ class PRMSRunoff(ConservativeProcess):
             self._calc_method = "numba"
 
         if self._calc_method.lower() == "numba":
-            import numba as nb
-
             numba_msg = f"{self.name} jit compiling with numba "
-            nb_parallel = (numba_num_threads is not None) and (
-                numba_num_threads > 1
-            )
+            num_threads = get_num_threads(self._numba_num_threads, self.name)
+            nb_parallel = num_threads > 1
             if nb_parallel:
-                numba_msg += f"and using {numba_num_threads} threads"
+                numba_msg += f"and using {num_threads} threads"
             print(numba_msg, flush=True)
 
-            self._calculate_runoff = nb.njit(
-                self._calculate_numpy, parallel=nb_parallel
+            self._calculate_runoff = threaded_kernel(
+                jit_kernel(self._calculate_numpy, parallel=nb_parallel),
+                num_threads,
             )
-            self.check_capacity = nb.njit(self.check_capacity)
-            self.perv_comp = nb.njit(self.perv_comp)
-            self.compute_infil = nb.njit(self.compute_infil)
-            self.dprst_comp = nb.njit(self.dprst_comp)
-            self.imperv_et = nb.njit(self.imperv_et)
 
         else:
             self._calculate_runoff = self._calculate_numpy
@@ -514,11 +514,6 @@ class PRMSRunoff(ConservativeProcess):
             dprst_seep_rate_clos=self.dprst_seep_rate_clos,
             sroff=self.sroff,
             hru_impervstor=self.hru_impervstor,
-            check_capacity=self.check_capacity,
-            perv_comp=self.perv_comp,
-            compute_infil=self.compute_infil,
-            dprst_comp=self.dprst_comp,
-            imperv_et=self.imperv_et,
             through_rain=self.through_rain,
             dprst_flag=self._dprst_flag,
         )
@@ -602,12 +597,6 @@ class PRMSRunoff(ConservativeProcess):
         dprst_seep_rate_clos,
         sroff,
         hru_impervstor,
-        # functions at end
-        check_capacity,
-        perv_comp,
-        compute_infil,
-        dprst_comp,
-        imperv_et,
         through_rain,
         dprst_flag,
     ):
@@ -669,8 +658,6 @@ class PRMSRunoff(ConservativeProcess):
                 hruarea_imperv=hruarea_imperv,
                 sri=sri,
                 srp=srp,
-                check_capacity=check_capacity,
-                perv_comp=perv_comp,
                 through_rain=through_rain[i],
             )
 
@@ -835,8 +822,6 @@ class PRMSRunoff(ConservativeProcess):
         hruarea_imperv,
         sri,
         srp,
-        check_capacity,
-        perv_comp,
         through_rain,
     ):
         isglacier = False  # todo -- hardwired
@@ -1282,3 +1267,12 @@ class PRMSRunoff(ConservativeProcess):
                 imperv_evap = avail_et / imperv_frac
             imperv_stor = imperv_stor - imperv_evap
         return imperv_stor, imperv_evap
+
+
+# The kernels call the sub-kernels as module globals so numba compiles them
+# into the calling kernel and can cache it.
+check_capacity = register_jitable(PRMSRunoff.check_capacity)
+perv_comp = register_jitable(PRMSRunoff.perv_comp)
+compute_infil = register_jitable(PRMSRunoff.compute_infil)
+dprst_comp = register_jitable(PRMSRunoff.dprst_comp)
+imperv_et = register_jitable(PRMSRunoff.imperv_et)
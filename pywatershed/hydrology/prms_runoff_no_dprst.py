@@ -1,4 +1,4 @@
-from typing import Literal
+from typing import Literal, Union
 
 from ..base.adapter import adaptable
 from ..base.control import Control
@@ -62,6 +62,9 @@ class PRMSRunoffNoDprst(PRMSRunoff):
         budget_type: one of [None, "warn", "error"]
         calc_method: one of ["fortran", "numba", "numpy"]. None defaults to
             "numba".
+        numba_num_threads: the number of threads of the numba kernels, an
+            int or a dictionary of process names to ints. None defaults to the
+            NUMBA_NUM_THREADS environment variable.
         verbose: Print extra information or not?
     """
 
@@ -86,6 +89,7 @@ class PRMSRunoffNoDprst(PRMSRunoff):
         intcp_changeover: adaptable,
         budget_type: Literal[None, "warn", "error"] = None,
         calc_method: Literal["numba", "numpy"] = None,
+        numba_num_threads: Union[int, dict] = None,
         verbose: bool = None,
     ) -> None:
         self._dprst_flag = False
@@ -111,6 +115,7 @@ class PRMSRunoffNoDprst(PRMSRunoff):
             dprst_flag=False,
             budget_type=budget_type,
             calc_method=calc_method,
+            numba_num_threads=numba_num_threads,
             verbose=verbose,
         )
 
@@ -295,11 +300,6 @@ class PRMSRunoffNoDprst(PRMSRunoff):
             dprst_seep_rate_clos=zero_array.copy(),
             sroff=self.sroff,
             hru_impervstor=self.hru_impervstor,
-            check_capacity=self.check_capacity,
-            perv_comp=self.perv_comp,
-            compute_infil=self.compute_infil,
-            dprst_comp=self.dprst_comp,
-            imperv_et=self.imperv_et,
             through_rain=self.through_rain,
             dprst_flag=self._dprst_flag,
         )
@@ -1,8 +1,9 @@
-from typing import Literal
+from typing import Literal, Union
 from warnings import warn
 
 import numpy as np
 from numba import prange
+from numba.extending import register_jitable
 
 from ..base.adapter import adaptable
 from ..base.conservative_process import ConservativeProcess
@@ -14,11 +15,16 @@ from ..constants import (
     inch2cm,
     nan,
     nearzero,
-    numba_num_threads,
     one,
     zero,
 )
 from ..parameters import Parameters
+from ..utils.numba_utils import (
+    fastmath_flags,
+    get_num_threads,
+    jit_kernel,
+    threaded_kernel,
+)
 
 # These are constants used like variables (on self) in PRMS6
 # They dont appear on any LHS, so it seems they are constants
@@ -113,6 +119,9 @@ class PRMSSnow(ConservativeProcess):
         budget_type: one of [None, "warn", "error"]
         calc_method: one of ["fortran", "numba", "numpy"]. None defaults to
             "numba".
+        numba_num_threads: the number of threads of the numba kernels, an
+            int or a dictionary of process names to ints. None defaults to the
+            NUMBA_NUM_THREADS environment variable.
         verbose: Print extra information or not?
     """
 
@@ -138,6 +147,7 @@ class PRMSSnow(ConservativeProcess):
         transp_on: adaptable,
         budget_type: Literal[None, "warn", "error"] = None,
         calc_method: Literal["numba", "numpy"] = None,
+        numba_num_threads: Union[int, dict] = None,
         verbose: bool = None,
     ) -> "PRMSSnow":
         super().__init__(
@@ -352,37 +362,37 @@ class PRMSSnow(ConservativeProcess):
 
             mask_pkweq_gt_zero = self.pkwater_equiv > zero
 
-            self.pk_depth = np.where(
+            self.pk_depth[:] = np.where(
                 mask_pkweq_gt_zero,
                 self.pkwater_equiv * self.deninv,
                 self.pk_depth,
             )
 
             with np.errstate(invalid="ignore"):
-                self.pk_den = np.where(
+                self.pk_den[:] = np.where(
                     mask_pkweq_gt_zero & (self.pk_depth > dnearzero),
                     self.pkwater_equiv / self.pk_depth,
                     self.pk_den,
                 )
 
-            self.pk_ice = np.where(
+            self.pk_ice[:] = np.where(
                 mask_pkweq_gt_zero, self.pkwater_equiv, self.pk_ice
             )
 
-            self.freeh2o = np.where(
+            self.freeh2o[:] = np.where(
                 mask_pkweq_gt_zero,
                 self.pk_ice * self.freeh2o_cap,
                 self.freeh2o,
             )
 
-            self.ai = np.where(
+            self.ai[:] = np.where(
                 mask_pkweq_gt_zero,
                 self.pkwater_equiv,
                 self.ai,
             )
 
             mask_ai_gt_snarea_thresh = self.ai > self.snarea_thresh
-            self.ai = np.where(
+            self.ai[:] = np.where(
                 mask_pkweq_gt_zero & mask_ai_gt_snarea_thresh,
                 self.snarea_thresh,
                 self.ai,
@@ -390,7 +400,7 @@ class PRMSSnow(ConservativeProcess):
 
             mask_ai_gt_zero = self.ai > dnearzero
             with np.errstate(invalid="ignore"):
-                self.frac_swe = np.where(
+                self.frac_swe[:] = np.where(
                     mask_ai_gt_zero,
                     np.minimum(self.pkwater_equiv / self.ai, 1),
                     self.frac_swe,
@@ -429,37 +439,21 @@ class PRMSSnow(ConservativeProcess):
             self._calc_method = "numba"
 
         if self._calc_method.lower() == "numba":
-            import numba as nb
-
             numba_msg = f"{self.name} jit compiling with numba "
-            nb_parallel = (numba_num_threads is not None) and (
-                numba_num_threads > 1
-            )
+            num_threads = get_num_threads(self._numba_num_threads, self.name)
+            nb_parallel = num_threads > 1
             if nb_parallel:
-                numba_msg += f"and using {numba_num_threads} threads"
+                numba_msg += f"and using {num_threads} threads"
             print(numba_msg, flush=True)
 
-            self._calculate_snow = nb.njit(
-                fastmath=True, parallel=nb_parallel
-            )(self._calculate_numpy)
-
-            fns = [
-                "_calc_calin",
-                "_calc_caloss",
-                "_calc_ppt_to_pack",
-                "_calc_sca_deplcrv",
-                "_calc_snalbedo",
-                "_calc_snowbal",
-                "_calc_snowcov",
-                "_calc_snowevap",
-                "_calc_step_4",
-            ]
-            for fn in fns:
-                setattr(
-                    self,
-                    fn,
-                    nb.njit(fastmath=True)(getattr(self, fn)),
-                )
+            self._calculate_snow = threaded_kernel(
+                jit_kernel(
+                    self._calculate_numpy,
+                    fastmath=fastmath_flags,
+                    parallel=nb_parallel,
+                ),
+                num_threads,
+            )
 
         else:
             self._calculate_snow = self._calculate_numpy
@@ -516,15 +510,6 @@ class PRMSSnow(ConservativeProcess):
             albset_sna=self.albset_sna,
             albset_snm=self.albset_snm,
             amlt_init=amlt_init,
-            calc_calin=self._calc_calin,
-            calc_caloss=self._calc_caloss,
-            calc_ppt_to_pack=self._calc_ppt_to_pack,
-            calc_sca_deplcrv=self._calc_sca_deplcrv,
-            calc_snalbedo=self._calc_snalbedo,
-            calc_snowbal=self._calc_snowbal,
-            calc_snowcov=self._calc_snowcov,
-            calc_snowevap=self._calc_snowevap,
-            calc_step_4=self._calc_step_4,
             cecn_coef=self.cecn_coef,
             cov_type=self.cov_type,
             covden_sum=self.covden_sum,
@@ -615,15 +600,6 @@ class PRMSSnow(ConservativeProcess):
         albset_sna,
         albset_snm,
         amlt_init,
-        calc_calin,
-        calc_caloss,
-        calc_ppt_to_pack,
-        calc_snalbedo,
-        calc_sca_deplcrv,
-        calc_snowbal,
-        calc_snowcov,
-        calc_snowevap,
-        calc_step_4,
         cecn_coef,
         cov_type,
         covden_sum,
@@ -810,8 +786,6 @@ class PRMSSnow(ConservativeProcess):
                 pst[jj],
                 snowmelt[jj],
             ) = calc_ppt_to_pack(
-                calc_calin=calc_calin,
-                calc_caloss=calc_caloss,
                 den_max=den_max[jj],
                 denmaxinv=denmaxinv[jj],
                 freeh2o=freeh2o[jj],
@@ -870,7 +844,6 @@ class PRMSSnow(ConservativeProcess):
                     pksv=pksv[jj],
                     pkwater_equiv=pkwater_equiv[jj],
                     pst=pst[jj],
-                    calc_sca_deplcrv=calc_sca_deplcrv,
                     scrv=scrv[jj],
                     snarea_curve=snarea_curve_2d[hru_deplcrv[jj] - 1, :],
                     snarea_thresh=snarea_thresh[jj],
@@ -937,9 +910,6 @@ class PRMSSnow(ConservativeProcess):
                     snowmelt[jj],
                 ) = calc_step_4(
                     trd[jj],
-                    calc_calin=calc_calin,
-                    calc_caloss=calc_caloss,
-                    calc_snowbal=calc_snowbal,
                     canopy_covden=canopy_covden[jj],
                     albedo=albedo[jj],
                     cecn_coef=cecn_coef[current_month - 1, jj],
@@ -1188,8 +1158,6 @@ class PRMSSnow(ConservativeProcess):
 
     @staticmethod
     def _calc_ppt_to_pack(
-        calc_calin,
-        calc_caloss,
         den_max,
         denmaxinv,
         freeh2o,
@@ -1836,7 +1804,6 @@ class PRMSSnow(ConservativeProcess):
     @staticmethod
     def _calc_snowcov(
         ai,
-        calc_sca_deplcrv,
         frac_swe,
         hru_deplcrv,
         iasw,
@@ -2421,9 +2388,6 @@ class PRMSSnow(ConservativeProcess):
     @staticmethod
     def _calc_step_4(
         trd,
-        calc_calin,
-        calc_caloss,
-        calc_snowbal,
         canopy_covden,
         albedo,
         cecn_coef,  # control.current_month
@@ -2610,8 +2574,6 @@ class PRMSSnow(ConservativeProcess):
                 sw=sw,
                 temp=temp,
                 trd=trd,
-                calc_calin=calc_calin,
-                calc_caloss=calc_caloss,
                 canopy_covden=canopy_covden,
                 den_max=den_max,
                 denmaxinv=denmaxinv,
@@ -2671,8 +2633,6 @@ class PRMSSnow(ConservativeProcess):
                 sw=sw,
                 temp=temp,
                 trd=trd,
-                calc_calin=calc_calin,
-                calc_caloss=calc_caloss,
                 canopy_covden=canopy_covden,
                 den_max=den_max,
                 denmaxinv=denmaxinv,
@@ -2725,8 +2685,6 @@ class PRMSSnow(ConservativeProcess):
         sw,
         temp,
         trd,
-        calc_calin,
-        calc_caloss,
         canopy_covden,
         den_max,
         denmaxinv,
@@ -3246,3 +3204,17 @@ class PRMSSnow(ConservativeProcess):
             ai,
             frac_swe,
         )
+
+
+# The kernels call the sub-kernels as module globals so numba compiles them
+# into the calling kernel and can cache it.
+_jitable = register_jitable(fastmath=fastmath_flags)
+calc_calin = _jitable(PRMSSnow._calc_calin)
+calc_caloss = _jitable(PRMSSnow._calc_caloss)
+calc_ppt_to_pack = _jitable(PRMSSnow._calc_ppt_to_pack)
+calc_sca_deplcrv = _jitable(PRMSSnow._calc_sca_deplcrv)
+calc_snalbedo = _jitable(PRMSSnow._calc_snalbedo)
+calc_snowbal = _jitable(PRMSSnow._calc_snowbal)
+calc_snowcov = _jitable(PRMSSnow._calc_snowcov)
+calc_snowevap = _jitable(PRMSSnow._calc_snowevap)
+calc_step_4 = _jitable(PRMSSnow._calc_step_4)
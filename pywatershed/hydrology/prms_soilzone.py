@@ -1,8 +1,9 @@
-from typing import Literal
+from typing import Literal, Union
 from warnings import warn
 
 import numpy as np
 from numba import prange
+from numba.extending import register_jitable
 
 from ..base.adapter import adaptable, adapter_factory
 from ..base.conservative_process import ConservativeProcess
@@ -13,11 +14,16 @@ from ..constants import (
     SoilType,
     nan,
     nearzero,
-    numba_num_threads,
     one,
     zero,
 )
 from ..parameters import Parameters
+from ..utils.numba_utils import (
+    fastmath_flags,
+    get_num_threads,
+    jit_kernel,
+    threaded_kernel,
+)
 
 ONETHIRD = 1 / 3
 TWOTHIRDS = 2 / 3
@@ -62,6 +68,9 @@ class PRMSSoilzone(ConservativeProcess):
         budget_type: one of [None, "warn", "error"]
         calc_method: one of ["fortran", "numba", "numpy"]. None defaults to
             "numba".
+        numba_num_threads: the number of threads of the numba kernels, an
+            int or a dictionary of process names to ints. None defaults to the
+            NUMBA_NUM_THREADS environment variable.
         adjust_parameters: one of ["warn", "error", "no"]. Default is "warn",
             the code edits the parameters and issues a warning. If "error" is
             selected the the code issues warnings about all edited parameters
@@ -90,6 +99,7 @@ class PRMSSoilzone(ConservativeProcess):
         dprst_flag: bool = None,
         budget_type: Literal[None, "warn", "error"] = None,
         calc_method: Literal["numba", "numpy"] = None,
+        numba_num_threads: Union[int, dict] = None,
         adjust_parameters: Literal["warn", "error", "no"] = "warn",
         verbose: bool = None,
     ) -> "PRMSSoilzone":
@@ -537,29 +547,20 @@ class PRMSSoilzone(ConservativeProcess):
             self._calc_method = "numba"
 
         if self._calc_method.lower() == "numba":
-            import numba as nb
-
             numba_msg = f"{self.name} jit compiling with numba "
-            nb_parallel = (numba_num_threads is not None) and (
-                numba_num_threads > 1
-            )
+            num_threads = get_num_threads(self._numba_num_threads, self.name)
+            nb_parallel = num_threads > 1
             if nb_parallel:
-                numba_msg += f"and using {numba_num_threads} threads"
+                numba_msg += f"and using {num_threads} threads"
             print(numba_msg, flush=True)
 
-            self._calculate_soilzone = nb.njit(
-                fastmath=True, parallel=nb_parallel
-            )(self._calculate_numpy)
-
-            self._compute_gwflow = nb.njit(fastmath=True)(self._compute_gwflow)
-            self._compute_interflow = nb.njit(fastmath=True)(
-                self._compute_interflow
-            )
-            self._compute_soilmoist = nb.njit(fastmath=True)(
-                self._compute_soilmoist
-            )
-            self._compute_szactet = nb.njit(fastmath=True)(
-                self._compute_szactet
+            self._calculate_soilzone = threaded_kernel(
+                jit_kernel(
+                    self._calculate_numpy,
+                    fastmath=fastmath_flags,
+                    parallel=nb_parallel,
+                ),
+                num_threads,
             )
 
         else:
@@ -617,10 +618,6 @@ class PRMSSoilzone(ConservativeProcess):
             _soil2gw_flag=self._soil2gw_flag,
             cap_infil_tot=self.cap_infil_tot,
             cap_waterin=self.cap_waterin,
-            compute_gwflow=self._compute_gwflow,
-            compute_interflow=self._compute_interflow,
-            compute_soilmoist=self._compute_soilmoist,
-            compute_szactet=self._compute_szactet,
             cov_type=self.cov_type,
             current_time=self.control.current_time,
             dprst_evap_hru=self.dprst_evap_hru,
@@ -704,10 +701,6 @@ class PRMSSoilzone(ConservativeProcess):
         _soil2gw_flag,
         cap_infil_tot,
         cap_waterin,
-        compute_gwflow,
-        compute_interflow,
-        compute_soilmoist,
-        compute_szactet,
         cov_type,
         current_time,
         dprst_evap_hru,
@@ -1443,3 +1436,12 @@ class PRMSSoilzone(ConservativeProcess):
             potet_lower,
             et,  # -> perv_actet
         )
+
+
+# The kernel calls the sub-kernels as module globals so numba compiles them
+# into it and can cache it.
+_jitable = register_jitable(fastmath=fastmath_flags)
+compute_gwflow = _jitable(PRMSSoilzone._compute_gwflow)
+compute_interflow = _jitable(PRMSSoilzone._compute_interflow)
+compute_soilmoist = _jitable(PRMSSoilzone._compute_soilmoist)
+compute_szactet = _jitable(PRMSSoilzone._compute_szactet)
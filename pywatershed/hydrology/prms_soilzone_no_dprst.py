@@ -1,4 +1,4 @@
-from typing import Literal
+from typing import Literal, Union
 
 from ..base.adapter import adaptable
 from ..base.control import Control
@@ -43,6 +43,9 @@ class PRMSSoilzoneNoDprst(PRMSSoilzone):
         budget_type: one of [None, "warn", "error"]
         calc_method: one of ["fortran", "numba", "numpy"]. None defaults to
             "numba".
+        numba_num_threads: the number of threads of the numba kernels, an
+            int or a dictionary of process names to ints. None defaults to the
+            NUMBA_NUM_THREADS environment variable.
         adjust_parameters: one of ["warn", "error", "no"]. Default is "warn",
             the code edits the parameters and issues a warning. If "error" is
             selected the the code issues warnings about all edited parameters
@@ -68,6 +71,7 @@ class PRMSSoilzoneNoDprst(PRMSSoilzone):
         snowcov_area: adaptable,
         budget_type: Literal[None, "warn", "error"] = None,
         calc_method: Literal["numba", "numpy"] = None,
+        numba_num_threads: Union[int, dict] = None,
         adjust_parameters: Literal["warn", "error", "no"] = "warn",
         verbose: bool = None,
     ) -> "PRMSSoilzone":
@@ -91,6 +95,7 @@ class PRMSSoilzoneNoDprst(PRMSSoilzone):
             dprst_flag=False,
             budget_type=budget_type,
             calc_method=calc_method,
+            numba_num_threads=numba_num_threads,
             adjust_parameters=adjust_parameters,
             verbose=verbose,
         )
@@ -264,10 +269,6 @@ class PRMSSoilzoneNoDprst(PRMSSoilzone):
             _soil2gw_flag=self._soil2gw_flag,
             cap_infil_tot=self.cap_infil_tot,
             cap_waterin=self.cap_waterin,
-            compute_gwflow=self._compute_gwflow,
-            compute_interflow=self._compute_interflow,
-            compute_soilmoist=self._compute_soilmoist,
-            compute_szactet=self._compute_szactet,
             cov_type=self.cov_type,
             current_time=self.control.current_time,
             dprst_evap_hru=zero_array.copy(),
@@ -1,4 +1,9 @@
+import hashlib
 import json
+import os
+import pathlib as pl
+import tempfile
+import warnings
 from copy import deepcopy
 
 import numpy as np
@@ -6,7 +11,7 @@ import numpy as np
 from ..base import meta
 from ..base.parameters import Parameters
 from ..constants import fileish, ft2_per_acre, inches_per_foot, ndoy
-from ..utils.prms5_file_util import PrmsFile
+from ..version import __version__
 
 # TODO:
 # PRMS uses "ndays"for the number of days in "year" defined as 366.
@@ -48,6 +53,73 @@ class JSONParameterEncoder(json.JSONEncoder):
             return super(JSONParameterEncoder, self).default(obj)
 
 
+def parameter_file_cache_key(parameter_file: fileish) -> str:
+    """The content hash of a PRMS parameter file.
+
+    The pywatershed version is included in the hash so that changes to the
+    parser invalidate cached parameters.
+
+    Args:
+        parameter_file: parameter file path
+
+    Returns:
+        A hexadecimal string.
+    """
+    sha = hashlib.sha256(__version__.encode())
+    with pl.Path(parameter_file).open("rb") as ff:
+        for block in iter(lambda: ff.read(2**20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _load_parameter_cache(cache_file: pl.Path) -> dict:
+    if not cache_file.exists():
+        return None
+    try:
+        with np.load(cache_file) as cached:
+            param_dict = {}
+            for name in cached.files:
+                value = cached[name]
+                if value.ndim == 0:
+                    # dimensions
+                    value = value.item()
+                elif value.dtype.kind == "U":
+                    # character parameters are object arrays of str
+                    value = value.astype(object)
+                param_dict[name] = value
+    except Exception:
+        warnings.warn(f"Reparsing invalid parameter cache: {cache_file}")
+        return None
+    return param_dict
+
+
+def _save_parameter_cache(cache_file: pl.Path, param_dict: dict) -> None:
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_file = tempfile.mkstemp(
+        suffix=".npz", prefix=".parameters_", dir=cache_file.parent
+    )
+    os.close(fd)
+    try:
+        with open(tmp_file, "wb") as ff:
+            np.savez(
+                ff,
+                **{
+                    name: (
+                        value.astype(str)
+                        if isinstance(value, np.ndarray)
+                        and value.dtype == object
+                        else value
+                    )
+                    for name, value in param_dict.items()
+                },
+            )
+        os.replace(tmp_file, cache_file)
+    finally:
+        if pl.Path(tmp_file).exists():
+            os.remove(tmp_file)
+    return None
+
+
 def _json_load(json_filename):
     pars = json.load(open(json_filename))
     # need to convert lists to numpy arrays
@@ -126,19 +198,42 @@ class PrmsParameters(Parameters):
         return params
 
     @staticmethod
-    def load(parameter_file: fileish) -> "PrmsParameters":
+    def load(
+        parameter_file: fileish, cache_dir: fileish = None
+    ) -> "PrmsParameters":
         """Load parameters from a PRMS parameter file
 
         Args:
             parameter_file: parameter file path
+            cache_dir: optional directory of a cache of parsed parameter
+                files. The parsed values are stored in and loaded from a
+                .npz file named by the content hash of the parameter file
+                (see parameter_file_cache_key), so that loading the same
+                file again skips parsing. The default, None, does not use a
+                cache.
 
         Returns:
             PrmsParameters: full PRMS parameter dictionary
 
         """
-        data = PrmsFile(parameter_file, "parameter").get_data()
+        # utils imports parameters, import it when used
+        from ..utils.prms5_file_util import PrmsFile
+
+        cache_file = None
+        param_dict = None
+        if cache_dir is not None:
+            key = parameter_file_cache_key(parameter_file)
+            cache_file = pl.Path(cache_dir) / f"parameters_{key}.npz"
+            param_dict = _load_parameter_cache(cache_file)
+
+        if param_dict is None:
+            data = PrmsFile(parameter_file, "parameter").get_data()
+            param_dict = data["parameter"]["parameters"]
+            if cache_file is not None:
+                _save_parameter_cache(cache_file, param_dict)
+
         params = PrmsParameters._process_file_input(
-            data["parameter"]["parameters"],
+            param_dict,
             # data["parameter"]["parameter_dimensions"],
         )
 
@@ -1,7 +1,13 @@
-from .cbh_utils import cbh_file_to_netcdf
+from .cbh_utils import (
+    cbh_file_to_memmap,
+    cbh_file_to_netcdf,
+    cbh_files_to_netcdf,
+)
 from .control import ControlVariables, compare_control_files
 from .csv_utils import CsvFile
+from .memmap_utils import MemmapRead, netcdf_to_memmap
 from .netcdf_utils import NetCdfRead, NetCdfWrite
+from .numba_utils import jit_kernel, precompile
 from .prms5_file_util import PrmsFile
 from .prms5util import (
     Soltab,
@@ -15,12 +21,18 @@ from .utils import timer
 from .optional_import import import_optional_dependency  # isort:skip
 
 __all__ = (
+    "cbh_file_to_memmap",
     "cbh_file_to_netcdf",
+    "cbh_files_to_netcdf",
     "ControlVariables",
     "compare_control_files",
     "CsvFile",
+    "MemmapRead",
+    "netcdf_to_memmap",
     "NetCdfRead",
     "NetCdfWrite",
+    "jit_kernel",
+    "precompile",
     "PrmsFile",
     "Soltab",
     "load_prms_output",
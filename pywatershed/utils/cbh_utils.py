@@ -1,5 +1,8 @@
 import math
+import multiprocessing as mp
+import os
 import pathlib as pl
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from typing import Union
 
@@ -9,6 +12,7 @@ import pandas as pd
 
 from ..base import meta
 from ..parameters import PrmsParameters
+from .memmap_utils import write_memmap
 
 zero = np.zeros((1))[0]
 one = np.ones((1))[0]
@@ -29,9 +33,9 @@ hash_line = "##############"
 hash_line_official = "########################################"
 
 
-def _cbh_file_to_df(
+def _cbh_file_header(
     the_file: Union[str, pl.Path], params: PrmsParameters = None
-) -> pd.DataFrame:
+) -> tuple:
     # Only take cbh files that contain single variables
     # JLM: this can be substantially simplified as
     # we are only reading NHM CBH files now.
@@ -100,6 +104,25 @@ def _cbh_file_to_df(
     assert len(data.columns) == len(col_names), msg
     # JLM: is the above sufficient?
 
+    return wh_hash_line, col_names, dtype_dict
+
+
+def _cbh_data_to_df(data: pd.DataFrame) -> pd.DataFrame:
+    date_cols = ["Y", "m", "d", "H", "M", "S"]
+    data["date"] = pd.to_datetime(
+        data.Y + "-" + data.m.str.zfill(2) + "-" + data.d.str.zfill(2)
+    )
+    # JLM TODO: Set datetime resolution to hours? or mins. Could do days but
+    # might look forward a bit.
+    data = data.drop(columns=set(date_cols))
+    data = data.set_index("date")
+    return data
+
+
+def _cbh_file_to_df(
+    the_file: Union[str, pl.Path], params: PrmsParameters = None
+) -> pd.DataFrame:
+    wh_hash_line, col_names, dtype_dict = _cbh_file_header(the_file, params)
     data = pd.read_csv(
         the_file,
         names=col_names,
@@ -108,16 +131,65 @@ def _cbh_file_to_df(
         delim_whitespace=True,
         dtype=dtype_dict,
     )
+    return _cbh_data_to_df(data)
 
-    data["date"] = pd.to_datetime(
-        data.Y + "-" + data.m.str.zfill(2) + "-" + data.d.str.zfill(2)
-    )
-    # JLM TODO: Set datetime resolution to hours? or mins. Could do days but
-    # might look forward a bit.
-    data = data.drop(columns=set(date_cols))
-    data = data.set_index("date")
 
-    return data
+def _cbh_file_blocks(
+    the_file: Union[str, pl.Path],
+    params: PrmsParameters = None,
+    block_n_times: int = None,
+):
+    """Iterate over the rows of a CBH file in blocks of block_n_times."""
+    if block_n_times is None:
+        yield _cbh_file_to_df(the_file, params)
+        return
+
+    wh_hash_line, col_names, dtype_dict = _cbh_file_header(the_file, params)
+    with pd.read_csv(
+        the_file,
+        names=col_names,
+        index_col=False,
+        skiprows=wh_hash_line + 1,
+        delim_whitespace=True,
+        dtype=dtype_dict,
+        chunksize=block_n_times,
+    ) as reader:
+        for data in reader:
+            yield _cbh_data_to_df(data)
+
+
+def cbh_files_to_df_blocks(
+    files: Union[str, pl.Path, dict, list],
+    params: PrmsParameters = None,
+    block_n_times: int = None,
+):
+    """Iterate over CBH files in blocks of time.
+
+    Args:
+        files: a CBH file or a dict or list of CBH files of the same times
+        params: the PrmsParameters of the domain, for the nhm_id
+        block_n_times: the number of times of each block. The default,
+            None, reads the files whole.
+
+    Yields:
+        A DataFrame of the variables of the files for each block of times,
+        as given by cbh_files_to_df for the whole files.
+    """
+    if isinstance(files, (str, pl.Path)):
+        files = [files]
+    elif isinstance(files, dict):
+        files = list(files.values())
+    elif not isinstance(files, list):
+        raise ValueError(
+            f'"files" argument of type {type(files)} not accepted.'
+        )
+
+    file_blocks = [_cbh_file_blocks(ff, params, block_n_times) for ff in files]
+    for dfs in zip(*file_blocks):
+        if len(dfs) == 1:
+            yield dfs[0]
+        else:
+            yield pd.concat(dfs, axis=1)
 
 
 def _cbh_files_to_df(
@@ -204,9 +276,14 @@ def cbh_file_to_netcdf(
     chunk_sizes: dict = None,
     time_units="days since 1979-01-01 00:00:00",
     time_calendar="standard",
+    block_n_times: int = 365,
 ) -> None:
     """Convert PRMS native CBH files to NetCDF format for pywatershed
 
+    The CBH file is read in blocks of block_n_times rows, each written to
+    the unlimited time dimension of the NetCDF file before the next is
+    read, so the memory used is bounded by the size of a block.
+
     Args:
         input_file: the CBH file to read
         parameters: the Parameters object of PRMS parameters for this domain
@@ -220,6 +297,8 @@ def cbh_file_to_netcdf(
         chunk_sizes: along each dimension, default {"time": 30, "hru": 0},
         time_units: default "days since 1979-01-01 00:00:00",
         time_calendar: default"standard",
+        block_n_times: the number of times read and written at once. None
+            reads the whole file before writing.
     """
 
     if rename_vars is None:
@@ -229,8 +308,6 @@ def cbh_file_to_netcdf(
     if chunk_sizes is None:
         chunk_sizes = {"time": 30, "nhm_id": 0}
 
-    np_dict = cbh_files_to_np_dict(input_file, parameters)
-
     # Default time chunk is for a read pattern of ~monthly at a time.
 
     ds = nc4.Dataset(nc_file, "w", clobber=clobber)
@@ -238,6 +315,53 @@ def cbh_file_to_netcdf(
     for key, val in global_atts.items():
         ds.setncattr(key, val)
 
+    blocks = cbh_files_to_df_blocks(input_file, parameters, block_n_times)
+    itime = 0
+    for iblock, block_df in enumerate(blocks):
+        np_dict = cbh_df_to_np_dict(block_df)
+        del block_df
+        if iblock == 0:
+            var_names_out = _cbh_netcdf_init(
+                ds,
+                np_dict,
+                output_vars,
+                zlib,
+                complevel,
+                rename_vars,
+                chunk_sizes,
+                time_units,
+            )
+
+        n_block = cbh_n_time(np_dict)
+        ds.variables["time"][itime : itime + n_block] = nc4.date2num(
+            np_dict["time"].astype(datetime), time_units
+        )
+        for vv, var_name_out in var_names_out.items():
+            ds.variables[var_name_out][itime : itime + n_block, :] = np_dict[
+                vv
+            ]
+        itime += n_block
+
+    ds.close()
+    print(f"Wrote netcdf file: {nc_file}")
+    return
+
+
+def _cbh_netcdf_init(
+    ds: nc4.Dataset,
+    np_dict: dict,
+    output_vars: list,
+    zlib: bool,
+    complevel: int,
+    rename_vars: dict,
+    chunk_sizes: dict,
+    time_units: str,
+) -> dict:
+    """Define the dimensions and variables of a CBH NetCDF file.
+
+    Returns:
+        The NetCDF variable names by CBH variable name.
+    """
     # Dimensions
     # None for the len argument gives an unlimited dim
     ds.createDimension("time", None)  # cbh_n_time(np_dict))
@@ -245,8 +369,6 @@ def cbh_file_to_netcdf(
 
     # Dim Variables
     time = ds.createVariable("time", "f4", ("time",))
-
-    time[:] = nc4.date2num(np_dict["time"].astype(datetime), time_units)
     time.units = time_units
     # time.calendar = time_calendar
 
@@ -276,6 +398,7 @@ def cbh_file_to_netcdf(
     if output_vars is not None:
         var_list = [var for var in var_list if var in output_vars]
 
+    var_names_out = {}
     for vv in var_list:
         vv_meta = meta.get_vars(vv)[vv]
         vv_type = vv_meta["type"]
@@ -295,8 +418,133 @@ def cbh_file_to_netcdf(
             if att in ["_FillValue", "type", "dimensions"]:
                 continue
             var.setncattr(att, val)
-        ds.variables[var_name_out][:, :] = np_dict[vv]
+        var_names_out[vv] = var_name_out
 
-    ds.close()
-    print(f"Wrote netcdf file: {nc_file}")
-    return
+    return var_names_out
+
+
+def _cbh_file_to_netcdf_worker(
+    input_file, params_data: dict, nc_file, kwargs: dict
+) -> None:
+    params = None
+    if params_data is not None:
+        params = PrmsParameters.from_dict(params_data)
+    cbh_file_to_netcdf(input_file, params, nc_file, **kwargs)
+    return None
+
+
+def cbh_files_to_netcdf(
+    input_files: dict,
+    parameters: PrmsParameters,
+    nc_files: dict,
+    max_workers: int = None,
+    **kwargs,
+) -> list:
+    """Convert several CBH files to NetCDF files in parallel processes.
+
+    Each CBH file is converted by cbh_file_to_netcdf, streaming in blocks
+    of time, in a worker process of a ProcessPoolExecutor.
+
+    Args:
+        input_files: the CBH files to read by name, e.g.
+            {"prcp": "prcp.cbh", "tmax": "tmax.cbh", "tmin": "tmin.cbh"}
+        parameters: the Parameters object of PRMS parameters for this domain
+        nc_files: the NetCDF output file of each name in input_files
+        max_workers: the maximum number of worker processes, defaults to
+            the number of files or of cpus if fewer.
+        **kwargs: the other arguments of cbh_file_to_netcdf.
+
+    Returns:
+        A list of the NetCDF files written.
+    """
+    if set(input_files.keys()) != set(nc_files.keys()):
+        msg = "input_files and nc_files must have the same keys"
+        raise ValueError(msg)
+
+    if max_workers is None:
+        max_workers = min(len(input_files), os.cpu_count())
+    max_workers = max(1, max_workers)
+
+    # the files only use the nhm_id of the parameters, passed to the workers
+    # as a (picklable) dictionary
+    params_data = None
+    if parameters is not None and "nhm_id" in parameters.parameters:
+        params_data = parameters.subset(["nhm_id"]).to_dd().data
+
+    ctx = mp.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx) as pool:
+        futures = [
+            pool.submit(
+                _cbh_file_to_netcdf_worker,
+                input_files[name],
+                params_data,
+                nc_files[name],
+                kwargs,
+            )
+            for name in input_files.keys()
+        ]
+        for future in futures:
+            future.result()
+
+    return [nc_files[name] for name in input_files.keys()]
+
+
+def cbh_file_to_memmap(
+    input_file: Union[str, pl.Path],
+    parameters: PrmsParameters,
+    output_dir: Union[str, pl.Path],
+    clobber: bool = True,
+    output_vars: list = None,
+    rename_vars: dict = None,
+) -> list:
+    """Convert PRMS native CBH files to memmap stores for pywatershed
+
+    See :mod:`pywatershed.utils.memmap_utils` for the store format.
+
+    Args:
+        input_file: the CBH file to read
+        parameters: the Parameters object of PRMS parameters for this domain
+        output_dir: the directory of the stores, one per variable
+        clobber: Overwrite existing stores?
+        output_vars: Subset of variables in the CBH to write?
+        rename_vars: a dictionary for mapping CBH variable names
+
+    Returns:
+        A list of the paths of the .npy files written.
+    """
+
+    if rename_vars is None:
+        rename_vars = {}
+
+    np_dict = cbh_files_to_np_dict(input_file, parameters)
+    hru_name = "hru_ind" if "hru_ind" in np_dict.keys() else "nhm_id"
+
+    var_list = set(np_dict.keys()).difference({"time", "hru_ind", "nhm_id"})
+    if output_vars is not None:
+        var_list = [var for var in var_list if var in output_vars]
+
+    npy_files = []
+    for vv in sorted(var_list):
+        vv_meta = meta.get_vars(vv)[vv]
+        var_name_out = vv
+        if vv in rename_vars.keys():
+            var_name_out = rename_vars[vv]
+        attrs = {
+            att: val
+            for att, val in vv_meta.items()
+            if att not in ["_FillValue", "type", "dimensions"]
+        }
+        npy_files += [
+            write_memmap(
+                output_dir,
+                var_name_out,
+                np_dict[vv].astype(vv_meta["type"]),
+                ("time", "nhm_id"),
+                time=np_dict["time"],
+                coords={hru_name: np_dict[hru_name]},
+                attrs=attrs,
+                clobber=clobber,
+            )
+        ]
+
+    return npy_files
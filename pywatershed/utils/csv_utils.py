@@ -1,5 +1,6 @@
-import datetime as dt
+import os
 import pathlib as pl
+from concurrent.futures import ThreadPoolExecutor
 from typing import Union
 
 import netCDF4 as nc4
@@ -11,12 +12,40 @@ from ..base import meta
 fileish = Union[str, pl.PosixPath, dict]
 
 
+def _read_csv_file(path: pl.Path) -> tuple:
+    """Read a PRMS csv output file with the pandas C parser
+
+    Returns:
+        (dates, ids, values): the datetime64 dates of the rows, the ids of
+            the columns and the values as a 2-D (time, id) float64 array
+
+    """
+    try:
+        df = pd.read_csv(
+            path,
+            engine="c",
+            skipinitialspace=True,
+            index_col=0,
+            float_precision="round_trip",
+        )
+    except Exception:
+        raise IOError(f"pandas could not parse...'{path}'")
+    dates = pd.to_datetime(df.index, format="%Y-%m-%d").values
+    ids = [str(idx).strip() for idx in df.columns]
+    return dates, ids, df.to_numpy(dtype=np.float64)
+
+
 class CsvFile:
     """CSV file object
     path: a string, pathlib.Path or dict. The key of the dict can be used
           to rename the variable in the recarray and upon output to Netcdf.
           The value of the dict should be a string or a pathlib.Path. Only
           dicts of len 1 are allowed currently.
+    max_workers: the maximum number of threads reading the csv files,
+          defaults to the number of files or of cpus if fewer.
+
+    The files are read column-wise: the dates are parsed in bulk and the
+    values of each file are held as a 2-D (time, id) array.
 
     """
 
@@ -24,13 +53,18 @@ class CsvFile:
         self,
         path: fileish = None,
         convert: bool = False,
+        max_workers: int = None,
     ) -> "CsvFile":
         self.paths = {}
         if path is not None:
             self._add_path(path)
         self.convert = convert
+        self.max_workers = max_workers
         self._variables = None
         self._coordinates = None
+        self._dates = None
+        self._ids = None
+        self._values = None
         self._data = None
         self.meta = meta
 
@@ -79,17 +113,59 @@ class CsvFile:
         self._lazy_data_evaluation()
         return self._variables
 
+    @property
+    def dates(self) -> np.ndarray:
+        """Get the dates of the csv output data
+
+        Returns:
+            dates: numpy datetime64 array of the dates
+
+        """
+        self._lazy_data_evaluation()
+        return self._dates
+
     @property
     def data(self) -> np.recarray:
         """Get csv output data as a numpy recarray
 
+        The recarray is assembled from the 2-D arrays of the variables on
+        first access, see get_variable_data.
+
         Returns:
             data : numpy recarray containing all of the csv data
 
         """
         self._lazy_data_evaluation()
+        if self._data is None:
+            dtype = [("date", object)]
+            names = []
+            for variable_name, values in self._values.items():
+                ids = self._ids[variable_name]
+                for idx in ids:
+                    names.append(f"{variable_name}_{idx}")
+                    dtype.append((names[-1], values.dtype))
+            data = np.zeros(len(self._dates), dtype=dtype)
+            data["date"][:] = self._dates.astype("datetime64[us]").tolist()
+            for variable_name, values in self._values.items():
+                ids = self._ids[variable_name]
+                for icol, idx in enumerate(ids):
+                    data[f"{variable_name}_{idx}"][:] = values[:, icol]
+            self._data = data
         return self._data
 
+    def get_variable_data(self, variable_name: str) -> np.ndarray:
+        """Get the csv output data of a variable
+
+        Args:
+            variable_name: the name of the variable
+
+        Returns:
+            values: 2-D (time, id) numpy array of the variable
+
+        """
+        self._lazy_data_evaluation()
+        return self._values[variable_name]
+
     def add_path(
         self,
         path: fileish,
@@ -105,6 +181,8 @@ class CsvFile:
         """
 
         self._add_path(path)
+        # the files are (re)read on the next access of the data
+        self._values = None
 
     def to_dataframe(self) -> pd.DataFrame:
         """Get the csv output data as a pandas dataframe
@@ -114,7 +192,14 @@ class CsvFile:
 
         """
         self._lazy_data_evaluation()
-        df = pd.DataFrame(self._data).set_index("date")
+        columns = {}
+        for variable_name, values in self._values.items():
+            ids = self._ids[variable_name]
+            for icol, idx in enumerate(ids):
+                columns[f"{variable_name}_{idx}"] = values[:, icol]
+        df = pd.DataFrame(
+            columns, index=pd.DatetimeIndex(self._dates, name="date")
+        )
         return df
 
     def to_netcdf(
@@ -151,21 +236,17 @@ class CsvFile:
 
         # Dimensions
         # None for the len argument gives an unlimited dim
-        ntimes = self._data.shape[0]
+        ntimes = len(self._dates)
         ds.createDimension("time", ntimes)
         for key, value in self._coordinates.items():
             ds.createDimension(key, len(value))
 
         # Dim Variables
         time = ds.createVariable("time", "f4", ("time",))
-        start_date = self._data["date"][0].strftime("%Y-%m-%d %H:%M:%S")
+        start_date = pd.Timestamp(self._dates[0]).strftime("%Y-%m-%d %H:%M:%S")
         time_units = f"days since {start_date}"
         time.units = time_units
-        time[:] = nc4.date2num(
-            self._data["date"].astype(dt.datetime),
-            units=time_units,
-            calendar="standard",
-        )
+        time[:] = (self._dates - self._dates[0]) / np.timedelta64(1, "D")
 
         for key, value in self._coordinates.items():
             coord_id = ds.createVariable(key, "i4", (key))
@@ -189,9 +270,6 @@ class CsvFile:
                 dim_name = "nhm_id"
                 dtype = np.float32
 
-            ids = self._coordinates[dim_name]
-            nids = len(ids)
-
             dims = ("time", dim_name)
             chunk_sizes_var = [chunk_sizes[vv] for vv in dims]
 
@@ -214,11 +292,9 @@ class CsvFile:
                         continue
                     ds.variables[variable_name].setncattr(key, val)
 
-            arr = np.zeros((ntimes, nids), dtype=dtype)
-            for idx, on_id in enumerate(ids):
-                key = f"{variable_name}_{on_id}"
-                arr[:, idx] = self._data[key][:]
-            ds.variables[variable_name][:, :] = arr
+            ds.variables[variable_name][:, :] = self._values[
+                variable_name
+            ].astype(dtype, copy=False)
 
         ds.close()
         print(f"Wrote netcdf file: {name}")
@@ -240,84 +316,66 @@ class CsvFile:
             raise TypeError("path must be a string or pathlib.Path object")
 
     def _lazy_data_evaluation(self):
-        if self._data is None:
+        if self._values is None:
             self._get_data()
 
-    def _get_data(self) -> None:
-        """Read csv data into a single numpy recarray
-
-        Returns:
-            None
-
-        """
-
-        def str2date(x):
-            return dt.datetime.strptime(x.decode("utf-8"), "%Y-%m-%d")
-
-        all_data = []
-        ntimes = 0
-        dtype = [("date", dt.datetime)]
-        for variable_name, path in self.paths.items():
-            if path.exists():
-                try:
-                    arr = np.genfromtxt(
-                        path,
-                        dtype=None,
-                        names=True,
-                        delimiter=",",
-                        converters={0: str2date},
-                    )
-                except:  # noqa: E722
-                    raise IOError(f"numpy could not parse...'{path}'")
-
-            if self._variables is None:
-                self._variables = [variable_name]
-            else:
-                self._variables.append(variable_name)
-
-            # determine the variable type
-            if self.meta.is_available(variable_name):
-                variable_type = meta.meta_numpy_type(
-                    self.meta.find_variables(variable_name)[variable_name]
-                )
-                if (
-                    "nsegment"
-                    in self.meta.get_dimensions(variable_name)[variable_name]
-                ):
-                    coordinate_name = "nhm_seg"
-                else:
-                    coordinate_name = "nhm_id"
+    def _variable_type(self, variable_name: str) -> tuple:
+        # the numpy type and coordinate name of a variable
+        if self.meta.is_available(variable_name):
+            variable_type = meta.meta_numpy_type(
+                self.meta.find_variables(variable_name)[variable_name]
+            )
+            if (
+                "nsegment"
+                in self.meta.get_dimensions(variable_name)[variable_name]
+            ):
+                coordinate_name = "nhm_seg"
             else:
-                variable_type = np.float32
                 coordinate_name = "nhm_id"
+        else:
+            variable_type = np.float32
+            coordinate_name = "nhm_id"
+        return variable_type, coordinate_name
 
-            # set coordinates
-            if self._coordinates is None:
-                self._coordinates = {}
-            if coordinate_name not in list(self._coordinates.keys()):
-                self._coordinates[coordinate_name] = [
-                    idx for idx in arr.dtype.names[1:]
-                ]
-
-            column_names = [
-                f"{variable_name}_{idx.strip()}" for idx in arr.dtype.names[1:]
-            ]
-            arr.dtype.names = ["date"] + column_names
+    def _get_data(self) -> None:
+        """Read the csv files into a 2-D (time, id) array per variable
 
-            # add additional column names to the dtype
-            for name in column_names:
-                dtype.append((name, variable_type))
+        The files are read in parallel threads. Variables of shorter files
+        are padded with zeros to the longest file.
 
-            all_data.append(arr)
+        Returns:
+            None
 
-            # reset ntimes, if necessary
-            ntimes = max(arr.shape[0], ntimes)
+        """
+        paths = self.paths
+        max_workers = self.max_workers
+        if max_workers is None:
+            max_workers = min(len(paths), os.cpu_count())
+        max_workers = max(1, max_workers)
+        if max_workers == 1 or len(paths) < 2:
+            results = [_read_csv_file(path) for path in paths.values()]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                results = list(pool.map(_read_csv_file, paths.values()))
+
+        self._variables = []
+        self._coordinates = {}
+        self._dates = None
+        self._ids = {}
+        self._values = {}
+        ntimes = max([len(dates) for dates, _, _ in results], default=0)
+        for variable_name, (dates, ids, values) in zip(paths.keys(), results):
+            self._variables.append(variable_name)
+            variable_type, coordinate_name = self._variable_type(variable_name)
+            # the coordinates are set by the first file on them
+            if coordinate_name not in self._coordinates.keys():
+                self._coordinates[coordinate_name] = ids
+            if len(dates) == ntimes and self._dates is None:
+                self._dates = dates
+            self._ids[variable_name] = ids
+            arr = np.zeros((ntimes, len(ids)), dtype=variable_type)
+            arr[: len(dates)] = values
+            self._values[variable_name] = arr
 
-        self._data = np.zeros(ntimes, dtype=dtype)
-        for idx, arr in enumerate(all_data):
-            if idx == 0:
-                i0 = 0
-            else:
-                i0 = 1
-            for name in arr.dtype.names[i0:]:
-                self._data[name][:] = arr[name][:]
+        self._data = None
+        return
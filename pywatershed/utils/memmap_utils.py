@@ -0,0 +1,380 @@
+"""Memory-mapped raw binary stores for input (forcing) data.
+
+A memmap store holds one variable in two files in a directory:
+
+* ``{variable}.npy``: the data, time-major (time or doy is the first
+  dimension) and C-contiguous, in the numpy ``.npy`` format.
+* ``{variable}.json``: a small sidecar with the dimension names, the time (or
+  doy) coordinate, the spatial coordinates and the variable attributes.
+
+Reading the ``.npy`` with ``numpy.load(mmap_mode="r")`` avoids the HDF5
+decompression of NetCDF inputs and lets the operating system page cache
+share the forcings between concurrent model processes on the same node.
+Each time step is a contiguous row of the file.
+"""
+
+import json
+import pathlib as pl
+from typing import Union
+
+import numpy as np
+
+from ..base.accessor import Accessor
+from ..utils.netcdf_utils import NetCdfRead
+from ..utils.time_utils import datetime_doy
+
+fileish = Union[str, pl.Path]
+
+time_dims = ("time", "doy")
+
+
+def _to_json_value(val):
+    if isinstance(val, (np.ndarray, np.generic)):
+        return val.tolist()
+    return val
+
+
+def _write_sidecar(
+    sidecar_file: pl.Path,
+    variable: str,
+    dims: tuple,
+    dtype: str,
+    shape: tuple,
+    time: np.ndarray = None,
+    doy: np.ndarray = None,
+    coords: dict = None,
+    attrs: dict = None,
+) -> None:
+    sidecar = {
+        "variable": variable,
+        "dims": list(dims),
+        "dtype": str(dtype),
+        "shape": list(shape),
+    }
+    if dims[0] == "time":
+        sidecar["time"] = np.datetime_as_string(
+            np.asarray(time).astype("datetime64[s]")
+        ).tolist()
+    else:
+        sidecar["doy"] = np.asarray(doy).tolist()
+    sidecar["coords"] = {
+        kk: np.ma.getdata(vv).tolist() for kk, vv in (coords or {}).items()
+    }
+    sidecar["attrs"] = {
+        kk: _to_json_value(vv) for kk, vv in (attrs or {}).items()
+    }
+    with open(sidecar_file, "w") as file_open:
+        json.dump(sidecar, file_open, indent=1, default=str)
+    return
+
+
+def _check_time_dims(variable: str, dims: tuple, time, doy) -> None:
+    if dims[0] not in time_dims:
+        msg = (
+            f"The first dimension of '{variable}' must be one of {time_dims} "
+            f"for a memmap store, got dims {dims}"
+        )
+        raise ValueError(msg)
+    if dims[0] == "time" and time is None:
+        raise ValueError(f"time is required for '{variable}'")
+    if dims[0] == "doy" and doy is None:
+        raise ValueError(f"doy is required for '{variable}'")
+    return
+
+
+def write_memmap(
+    output_dir: fileish,
+    variable: str,
+    data: np.ndarray,
+    dims: tuple,
+    time: np.ndarray = None,
+    doy: np.ndarray = None,
+    coords: dict = None,
+    attrs: dict = None,
+    clobber: bool = True,
+) -> pl.Path:
+    """Write a variable to a memmap store.
+
+    Args:
+        output_dir: the directory of the store
+        variable: the name of the variable, the file stem of the store
+        data: the data with the time (or doy) dimension first
+        dims: the dimension names of data
+        time: np.datetime64 times, required when dims[0] is "time"
+        doy: days of year, required when dims[0] is "doy"
+        coords: optional dictionary of spatial coordinate arrays
+        attrs: optional dictionary of variable attributes
+        clobber: overwrite an existing store?
+
+    Returns:
+        The path to the .npy file of the store.
+    """
+    dims = tuple(dims)
+    _check_time_dims(variable, dims, time, doy)
+    output_dir = pl.Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    npy_file = output_dir / f"{variable}.npy"
+    if npy_file.exists() and not clobber:
+        raise FileExistsError(f"{npy_file} exists and clobber is False")
+
+    data = np.ascontiguousarray(np.ma.getdata(data))
+    np.save(npy_file, data)
+    _write_sidecar(
+        npy_file.with_suffix(".json"),
+        variable,
+        dims,
+        data.dtype,
+        data.shape,
+        time=time,
+        doy=doy,
+        coords=coords,
+        attrs=attrs,
+    )
+    return npy_file
+
+
+def netcdf_to_memmap(
+    nc_file: fileish,
+    output_dir: fileish,
+    variables: list = None,
+    clobber: bool = True,
+    n_times_chunk: int = 365,
+) -> list:
+    """Convert the time-varying variables of a NetCDF file to memmap stores.
+
+    The data are copied n_times_chunk times at a time so the memory used is
+    bounded for large files.
+
+    Args:
+        nc_file: the NetCDF file to convert
+        output_dir: the directory of the stores
+        variables: optional subset of variables to convert, default is all
+          the variables with a first dimension of "time" or "doy"
+        clobber: overwrite existing stores?
+        n_times_chunk: the number of times to copy at once
+
+    Returns:
+        A list of the paths of the .npy files written.
+    """
+    output_dir = pl.Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    nc_read = NetCdfRead(nc_file)
+    ds = nc_read.dataset
+    time = doy = None
+    if "time" in ds.variables:
+        time = nc_read.times
+    if "doy" in ds.variables:
+        doy = np.ma.getdata(ds.variables["doy"][:])
+
+    if variables is None:
+        variables = [
+            vv
+            for vv in nc_read.variables
+            if len(ds.variables[vv].dimensions)
+            and ds.variables[vv].dimensions[0] in time_dims
+            and vv not in time_dims
+        ]
+
+    npy_files = []
+    for vv in variables:
+        nc_var = ds.variables[vv]
+        dims = nc_var.dimensions
+        _check_time_dims(vv, dims, time, doy)
+        npy_file = output_dir / f"{vv}.npy"
+        if npy_file.exists() and not clobber:
+            raise FileExistsError(f"{npy_file} exists and clobber is False")
+
+        mmap = np.lib.format.open_memmap(
+            npy_file, mode="w+", dtype=nc_var.dtype, shape=nc_var.shape
+        )
+        for start in range(0, nc_var.shape[0], n_times_chunk):
+            end = start + n_times_chunk
+            mmap[start:end] = np.ma.getdata(nc_var[start:end])
+        mmap.flush()
+        del mmap
+
+        coords = {
+            dd: ds.variables[dd][:]
+            for dd in dims[1:]
+            if dd in ds.variables.keys()
+        }
+        coords = {**nc_read.spatial_ids, **coords}
+        attrs = {
+            aa: nc_var.getncattr(aa)
+            for aa in nc_var.ncattrs()
+            if aa != "_FillValue"
+        }
+        _write_sidecar(
+            npy_file.with_suffix(".json"),
+            vv,
+            dims,
+            nc_var.dtype,
+            nc_var.shape,
+            time=time,
+            doy=doy,
+            coords=coords,
+            attrs=attrs,
+        )
+        npy_files += [npy_file]
+
+    nc_read.close()
+    return npy_files
+
+
+class MemmapRead(Accessor):
+    """Memmap store reader (for input/forcing data)
+
+    The data are memory-mapped read-only, nothing is read from disk until it
+    is accessed and the data of a time step is a contiguous row.
+
+    Args:
+      name: the .npy file of the memmap store to open
+      start_time: optional np.datetime64 which is the start of the simulation
+      end_time: optional np.datetime64 which is the end of the simulation
+    """
+
+    def __init__(
+        self,
+        name: fileish,
+        start_time: np.datetime64 = None,
+        end_time: np.datetime64 = None,
+    ) -> "MemmapRead":
+        self.name = "MemmapRead"
+        self._npy_file = pl.Path(name)
+        self._start_time = start_time
+        self._end_time = end_time
+
+        with open(self._npy_file.with_suffix(".json"), "r") as file_open:
+            self._sidecar = json.load(file_open)
+
+        self._variable = self._sidecar["variable"]
+        self._dims = tuple(self._sidecar["dims"])
+        self._mmap = np.load(self._npy_file, mmap_mode="r")
+
+        if self._dims[0] == "time":
+            self._time = np.array(self._sidecar["time"], dtype="datetime64[s]")
+            if self._start_time is None:
+                self._start_index = 0
+            else:
+                wh_start = np.where(self._time == self._start_time)
+                self._start_index = wh_start[0][0]
+
+            if self._end_time is None:
+                self._end_index = self._time.shape[0] - 1
+            else:
+                wh_end = np.where(self._time == self._end_time)
+                self._end_index = wh_end[0][0]
+
+            self._time = self._time[self._start_index : (self._end_index + 1)]
+
+        else:
+            self._doy = np.array(self._sidecar["doy"])
+            self._start_index = 0
+            self._end_index = self._doy.shape[0] - 1
+
+        self._ntimes = self._end_index - self._start_index + 1
+        self._data = self._mmap[self._start_index : (self._end_index + 1)]
+
+        self._spatial_ids = {
+            kk: np.array(vv) for kk, vv in self._sidecar["coords"].items()
+        }
+        return
+
+    def close(self) -> None:
+        """Drop the references to the memory map."""
+        self._data = None
+        self._mmap = None
+        return
+
+    @property
+    def variable(self) -> str:
+        """The name of the variable in the store."""
+        return self._variable
+
+    @property
+    def dims(self) -> tuple:
+        """The dimension names of the variable."""
+        return self._dims
+
+    @property
+    def attrs(self) -> dict:
+        """The attributes of the variable."""
+        return self._sidecar["attrs"]
+
+    @property
+    def ntimes(self) -> int:
+        """The number of times between start_time and end_time."""
+        return self._ntimes
+
+    @property
+    def times(self) -> np.ndarray:
+        """The times (or days of year) between start_time and end_time."""
+        if hasattr(self, "_time"):
+            return self._time
+        return self._doy
+
+    @property
+    def spatial_ids(self) -> dict:
+        """The spatial coordinates of the variable."""
+        return self._spatial_ids
+
+    @property
+    def data(self) -> np.memmap:
+        """A zero-copy view of the data between start_time and end_time."""
+        return self._data
+
+    def get_data(self, itime_step: int = None) -> np.ndarray:
+        """Get the data, all times or one time step, as zero-copy views
+
+        Args:
+            itime_step: time step to return. If itime_step is None all of the
+              data between start_time and end_time are returned
+
+        Returns:
+            arr: a read-only view of the data
+        """
+        if itime_step is None:
+            return self._data
+
+        if itime_step >= self._ntimes:
+            raise ValueError(
+                f"requested time step {itime_step} but only "
+                + f"{self._ntimes} time steps are available."
+            )
+        return self._data[itime_step]
+
+    def get_time_window(self, istart: int, iend: int) -> np.ndarray:
+        """Get the data for a window of time steps as a zero-copy view
+
+        Args:
+            istart: the first time step of the window
+            iend: the time step after the last time step of the window
+
+        Returns:
+            arr: a read-only view of the data for the window
+        """
+        if iend > self._ntimes:
+            raise ValueError(
+                f"requested time steps to {iend} but only "
+                + f"{self._ntimes} time steps are available."
+            )
+        return self._data[istart:iend]
+
+    def get_time_step_data(
+        self,
+        itime_step: int,
+        current_time: np.datetime64 = None,
+    ) -> np.ndarray:
+        """Get the data at a simulation time step
+
+        Args:
+            itime_step: the zero-based simulation time step
+            current_time: the current time, used by day of year (doy) stores
+
+        Returns:
+            arr: a read-only view of the data for the time step
+        """
+        if self._dims[0] == "doy":
+            return self.get_data(datetime_doy(current_time) - 1)
+        return self.get_data(itime_step)
@@ -1,5 +1,8 @@
 import datetime as dt
 import pathlib as pl
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from math import ceil
 from typing import Union
 
@@ -15,6 +18,11 @@ listish = Union[list, tuple]
 arrayish = Union[list, tuple, np.ndarray]
 ATOL = np.finfo(np.float32).eps
 
+# The HDF5 library underlying netCDF4 is generally not built thread-safe.
+# Any netCDF4 call that may run concurrently with a background thread (e.g.
+# the buffered writer below) is serialized through this lock.
+nc4_lock = threading.RLock()
+
 # JLM TODO: the implied time dimension seems like a bad idea, it should be
 #    an argument.
 
@@ -40,6 +48,11 @@ class NetCdfRead(Accessor):
         _load_n_time_batches are None, then no time batching is used. This has
         proven an inefficient pattern. The time batching is not implemented for
         DOY (cyclic) variables, only for variables with time dimension "time".
+      prefetch: optional boolean to read the next time batch of each variable
+        on a background thread as soon as the current batch is loaded, so the
+        read overlaps with computation on the current batch. This only has an
+        effect when time batching is used with more than one batch. Default
+        is False.
     """
 
     def __init__(
@@ -50,12 +63,16 @@ class NetCdfRead(Accessor):
         nc_read_vars: list = None,
         load_n_times: int = None,
         load_n_time_batches: int = 1,
+        prefetch: bool = False,
     ) -> "NetCdfRead":
         self.name = "NetCdfRead"
         self._nc_file = name
         self._nc_read_vars = nc_read_vars
         self._start_time = start_time
         self._end_time = end_time
+        self._prefetch = prefetch
+        self._prefetch_executor = None
+        self._prefetched = {}
 
         if (load_n_times is not None) and (load_n_time_batches is not None):
             msg = "Can only specify one of load_n_times or load_ntime_batches"
@@ -73,8 +90,13 @@ class NetCdfRead(Accessor):
         self.close()
 
     def close(self):
-        if self.dataset.isopen():
-            self.dataset.close()
+        if self._prefetch_executor is not None:
+            self._prefetch_executor.shutdown(wait=True)
+            self._prefetch_executor = None
+            self._prefetched = {}
+        with nc4_lock:
+            if self.dataset.isopen():
+                self.dataset.close()
 
     def _open_nc_file(self):
         self.dataset = nc4.Dataset(self._nc_file, "r")
@@ -118,6 +140,7 @@ class NetCdfRead(Accessor):
                     self._ntimes / self._load_n_time_batches
                 )
                 self._data_loaded = {}
+                self._batch_loaded = {}
 
             elif self._load_n_times is not None:
                 # Use ceil to account for the remainder batch
@@ -127,6 +150,7 @@ class NetCdfRead(Accessor):
                     self._ntimes / self._load_n_times
                 )
                 self._data_loaded = {}
+                self._batch_loaded = {}
 
             # Note that if neither _load variables is specified, then no time
             # batching is used
@@ -286,9 +310,10 @@ class NetCdfRead(Accessor):
             )
 
         if itime_step is None:
-            return self.dataset[variable][
-                self._start_index : (self._end_index + 1), :
-            ]
+            with nc4_lock:
+                return self.dataset[variable][
+                    self._start_index : (self._end_index + 1), :
+                ]
 
         else:
             if itime_step >= self._ntimes:
@@ -298,47 +323,118 @@ class NetCdfRead(Accessor):
                 )
 
             if hasattr(self, "_data_loaded"):
-                # load when needed, at the beginning of each batch
-                batch_index = itime_step % self._load_n_times
-                if batch_index == 0:
-                    ith_batch = itime_step // self._load_n_times
+                # load when needed: the batch is cached by its index so
+                # that all consumers of a (shared) reader use one copy
+                ith_batch, batch_index = divmod(itime_step, self._load_n_times)
+                if self._batch_loaded.get(variable) != ith_batch:
                     # print(
                     #     f"load batch "
                     #     f"#{ith_batch}/{self._load_n_time_batches-1}: "
                     #     f"{variable}"
                     # )
-                    start_ind = self._start_index + (
-                        ith_batch * self._load_n_times
+                    self._data_loaded[variable] = self._load_batch(
+                        variable, ith_batch
                     )
-                    end_ind = start_ind + self._load_n_times
-                    self._data_loaded[variable] = self.dataset[variable][
-                        start_ind:end_ind, :
-                    ]
+                    self._batch_loaded[variable] = ith_batch
+                    if self._prefetch:
+                        self._prefetch_batch(variable, ith_batch + 1)
 
                 return self._data_loaded[variable][batch_index, :]
 
             else:
                 # no time batching
-                return self.dataset[variable][itime_step, :]
+                with nc4_lock:
+                    return self.dataset[variable][itime_step, :]
 
-    def advance(
-        self, variable: str, current_time: np.datetime64 = None
+    def get_time_window(
+        self,
+        variable: str,
+        istart: int,
+        iend: int,
     ) -> np.ndarray:
-        """Get the data for a variable for the next time step
+        """Get data for a variable for a window of time steps
+
+        The window is read from file and is not cached (or time batched).
 
         Args:
             variable: variable name
+            istart: the first time step of the window
+            iend: the time step after the last time step of the window
 
         Returns:
-            arr: numpy array with the data for a variable for the current
-                time step
+            arr: numpy array with the data for a variable for the window
+        """
+        if variable not in self._nc_read_vars:
+            raise ValueError(
+                f"'{variable}' not in list of available variables"
+            )
+        if iend > self._ntimes:
+            raise ValueError(
+                f"requested time steps to {iend} but only "
+                + f"{self._ntimes} time steps are available."
+            )
+        with nc4_lock:
+            return self.dataset[variable][
+                (self._start_index + istart) : (self._start_index + iend), :
+            ]
+
+    def _read_batch(self, variable: str, ith_batch: int) -> np.ndarray:
+        start_ind = self._start_index + (ith_batch * self._load_n_times)
+        end_ind = start_ind + self._load_n_times
+        with nc4_lock:
+            return self.dataset[variable][start_ind:end_ind, :]
+
+    def _load_batch(self, variable: str, ith_batch: int) -> np.ndarray:
+        """Get a time batch, from a pending prefetch if there is one."""
+        future = self._prefetched.pop(variable, None)
+        if future is not None:
+            future_batch, future = future
+            if future_batch == ith_batch:
+                return future.result()
+            # not the batch expected, wait so reads do not pile up
+            _ = future.result()
+
+        return self._read_batch(variable, ith_batch)
+
+    def _prefetch_batch(self, variable: str, ith_batch: int) -> None:
+        """Start reading a time batch on the background thread."""
+        if (ith_batch * self._load_n_times) >= self._ntimes:
+            return
+        if self._prefetch_executor is None:
+            thread_name = f"NetCdfRead({pl.Path(self._nc_file).name})"
+            self._prefetch_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=thread_name
+            )
+        self._prefetched[variable] = (
+            ith_batch,
+            self._prefetch_executor.submit(
+                self._read_batch, variable, ith_batch
+            ),
+        )
+        return
+
+    def get_time_step_data(
+        self,
+        variable: str,
+        itime_step: int,
+        current_time: np.datetime64 = None,
+    ) -> np.ndarray:
+        """Get the data for a variable at a simulation time step
+
+        Unlike advance, this does not track time on the reader, so multiple
+        consumers can share one reader.
+
+        Args:
+            variable: variable name
+            itime_step: the zero-based simulation time step
+            current_time: the current time, used by day of year (doy) files
+
+        Returns:
+            arr: numpy array with the data for a variable for the time step
 
         """
         if "time" in self.dataset.variables:
-            arr = self.get_data(
-                variable,
-                itime_step=self._itime_step[variable],
-            )
+            arr = self.get_data(variable, itime_step=itime_step)
 
         if "doy" in self.dataset.variables:
             arr = self.get_data(
@@ -346,11 +442,140 @@ class NetCdfRead(Accessor):
                 itime_step=datetime_doy(current_time) - 1,
             )
 
+        return arr
+
+    def advance(
+        self, variable: str, current_time: np.datetime64 = None
+    ) -> np.ndarray:
+        """Get the data for a variable for the next time step
+
+        Args:
+            variable: variable name
+
+        Returns:
+            arr: numpy array with the data for a variable for the current
+                time step
+
+        """
+        arr = self.get_time_step_data(
+            variable, self._itime_step[variable], current_time
+        )
         self._itime_step[variable] += 1
 
         return arr
 
 
+class NetCdfReadPool:
+    """A process-wide registry of NetCdfRead instances shared by file
+
+    Opening a NetCdfRead decodes the full time axis and reads the spatial ids
+    of the file. When several adapters read from the same file (different
+    variables in one file or the same variable used by several processes),
+    acquiring readers from this pool gives them one open handle, one decoded
+    time index, and one cache of time batches. Readers are reference counted:
+    each acquire must be matched by a release and a reader is closed when its
+    last reference is released.
+
+    Readers are keyed on the resolved file path, its modification time, and
+    the NetCdfRead arguments, so only readers that would be identical are
+    shared.
+
+    Example:
+    --------
+
+    >>> from pywatershed.utils.netcdf_utils import netcdf_read_pool
+    >>> reader = netcdf_read_pool.acquire("prcp.nc")
+    >>> data = reader.get_data("prcp", itime_step=0)
+    >>> netcdf_read_pool.release(reader)
+
+    """
+
+    def __init__(self):
+        self._readers = {}
+        self._n_refs = {}
+        # reentrant: garbage collection while a reader is opened under the
+        # lock can release another reader from an adapter's __del__
+        self._lock = threading.RLock()
+        return
+
+    @staticmethod
+    def _key(name: fileish, **kwargs) -> tuple:
+        path = pl.Path(name).resolve()
+        return (
+            str(path),
+            path.stat().st_mtime_ns,
+            *((kk, str(kwargs[kk])) for kk in sorted(kwargs.keys())),
+        )
+
+    def acquire(self, name: fileish, **kwargs) -> NetCdfRead:
+        """Get a shared NetCdfRead for a file, opening it if necessary.
+
+        Args:
+            name: the netcdf file path
+            **kwargs: keyword arguments to NetCdfRead
+
+        Returns:
+            A NetCdfRead instance which must be passed to release when no
+            longer used.
+        """
+        key = self._key(name, **kwargs)
+        with self._lock:
+            if key not in self._readers.keys():
+                self._readers[key] = NetCdfRead(name, **kwargs)
+                self._n_refs[key] = 0
+            self._n_refs[key] += 1
+            return self._readers[key]
+
+    def release(self, reader: NetCdfRead) -> None:
+        """Release a reference to a reader, closing it on the last one.
+
+        Args:
+            reader: a NetCdfRead obtained from acquire
+        """
+        with self._lock:
+            key = self._find_key(reader)
+            if key is None:
+                return
+            self._n_refs[key] -= 1
+            if self._n_refs[key] > 0:
+                return
+            del self._n_refs[key]
+            del self._readers[key]
+
+        reader.close()
+        return
+
+    def close(self) -> None:
+        """Close all readers in the pool, regardless of references."""
+        with self._lock:
+            readers = list(self._readers.values())
+            self._readers = {}
+            self._n_refs = {}
+
+        for reader in readers:
+            reader.close()
+        return
+
+    def n_refs(self, reader: NetCdfRead) -> int:
+        """The number of references to a reader in the pool."""
+        key = self._find_key(reader)
+        if key is None:
+            return 0
+        return self._n_refs[key]
+
+    def __len__(self) -> int:
+        return len(self._readers)
+
+    def _find_key(self, reader: NetCdfRead):
+        for key, pool_reader in self._readers.items():
+            if pool_reader is reader:
+                return key
+        return None
+
+
+netcdf_read_pool = NetCdfReadPool()
+
+
 class NetCdfWrite(Accessor):
     """Output the csv output data to a netcdf file
 
@@ -362,6 +587,22 @@ class NetCdfWrite(Accessor):
             (default is True)
         complevel: compression level (default is 4)
         chunk_sizes: dictionary defining chunk sizes for the data
+        buffer_n_times: optional integer number of time steps to buffer in
+            memory for each variable before writing to file. The default,
+            None, writes each time step to file as it is added. When
+            specified, data passed to add_data and add_simulation_time are
+            copied into a preallocated ring buffer of two blocks of
+            buffer_n_times per variable and full blocks are written as
+            contiguous [t0:t1, :] slabs by a background thread while the
+            other block fills. Unless chunk_sizes is passed, the time chunk
+            size is set to buffer_n_times so each block write fills whole
+            chunks. Time steps must be added sequentially in this mode.
+            close() flushes any partial block and drains the writer.
+        n_members: optional number of ensemble members stacked along the
+            spatial dimension of the data, e.g. by an EnsembleModel. The
+            variables are written with a "member" dimension,
+            (time, member, spatial), and the coordinates are those of a
+            single member. Defaults to None, no member dimension.
     """
 
     def __init__(
@@ -375,8 +616,22 @@ class NetCdfWrite(Accessor):
         clobber: bool = True,
         zlib: bool = True,
         complevel: int = 4,
-        chunk_sizes: dict = {"time": 1, "hruid": 0},
+        chunk_sizes: dict = None,
+        buffer_n_times: int = None,
+        n_members: int = None,
     ):
+        if buffer_n_times is not None and buffer_n_times < 1:
+            msg = f"buffer_n_times must be positive, got: {buffer_n_times}"
+            raise ValueError(msg)
+        self._buffer_n_times = buffer_n_times
+        self._n_members = n_members
+
+        if chunk_sizes is None:
+            if buffer_n_times is None:
+                chunk_sizes = {"time": 1, "hruid": 0}
+            else:
+                chunk_sizes = {"time": buffer_n_times, "hruid": 0}
+
         if isinstance(variables, dict):
             group_variables = []
             for group, vars in variables.items():
@@ -482,6 +737,8 @@ class NetCdfWrite(Accessor):
             self.dataset.createDimension("one", 1)
         if nreservoirs_coordinate:
             self.dataset.createDimension("grand_id", self.nreservoirs)
+        if n_members is not None:
+            self.dataset.createDimension("member", n_members)
 
         if nhru_coordinate:
             self.hruid = self.dataset.createVariable(
@@ -501,6 +758,15 @@ class NetCdfWrite(Accessor):
                 "grand_id", "i4", ("grand_id")
             )
             self.grandid[:] = coordinates["grand_id"]
+        if n_members is not None:
+            self.memberid = self.dataset.createVariable(
+                "member", "i4", ("member")
+            )
+            self.memberid[:] = np.arange(n_members)
+
+        chunksizes = tuple(chunk_sizes.values())
+        if n_members is not None:
+            chunksizes = (chunksizes[0], n_members, *chunksizes[1:])
 
         self.variables = {}
         for var_name, group_var_name in zip(variables, group_variables):
@@ -529,20 +795,28 @@ class NetCdfWrite(Accessor):
             else:
                 time_dim = "time"
 
+            if n_members is None:
+                var_dims = (time_dim, spatial_coordinate)
+            else:
+                var_dims = (time_dim, "member", spatial_coordinate)
+
             self.variables[var_name] = self.dataset.createVariable(
                 group_var_name,
                 variabletype,
-                (time_dim, spatial_coordinate),
+                var_dims,
                 fill_value=nc4.default_fillvals[variabletype],
                 zlib=zlib,
                 complevel=complevel,
-                chunksizes=tuple(chunk_sizes.values()),
+                chunksizes=chunksizes,
             )
             for key, val in var_meta[var_name].items():
                 if isinstance(val, dict):
                     continue
                 self.variables[var_name].setncattr(key, val)
 
+        if self._buffer_n_times is not None:
+            self._init_buffers()
+
         return
 
     def __del__(self):
@@ -550,12 +824,136 @@ class NetCdfWrite(Accessor):
         return
 
     def close(self):
-        if self.dataset.isopen():
-            self.dataset.close()
+        if self._buffer_n_times is not None:
+            self._drain_buffers()
+        with nc4_lock:
+            if self.dataset.isopen():
+                self.dataset.close()
+        return
+
+    def _init_buffers(self):
+        """Allocate the ring buffers and start the writer thread."""
+        n_blocks = 2
+        self._buffer_vars = {}
+        if hasattr(self, "time"):
+            self._buffer_vars["time"] = self.time
+        for var_name, var in self.variables.items():
+            if var.dimensions[0] == "time":
+                self._buffer_vars[var_name] = var
+
+        self._buffers = {}
+        self._buffer_last_itime = {}
+        self._buffer_block_free = {}
+        for name, var in self._buffer_vars.items():
+            self._buffers[name] = np.zeros(
+                (n_blocks, self._buffer_n_times, *var.shape[1:]),
+                dtype=var.dtype,
+            )
+            self._buffer_last_itime[name] = -1
+            self._buffer_block_free[name] = [
+                threading.Event() for bb in range(n_blocks)
+            ]
+            for event in self._buffer_block_free[name]:
+                event.set()
+
+        self._writer_error = None
+        self._write_queue = queue.Queue()
+        self._writer = threading.Thread(
+            target=self._buffer_writer,
+            name=f"NetCdfWrite({self.dataset.filepath()})",
+            daemon=True,
+        )
+        self._writer.start()
+        return
+
+    def _buffer_writer(self):
+        """Write queued blocks to file, run on the writer thread."""
+        while True:
+            item = self._write_queue.get()
+            if item is None:
+                self._write_queue.task_done()
+                return
+            name, iblock, t0, t1 = item
+            try:
+                if self._writer_error is None:
+                    block = self._buffers[name][iblock, 0 : (t1 - t0)]
+                    with nc4_lock:
+                        self._buffer_vars[name][t0:t1] = block
+            except Exception as error:
+                self._writer_error = error
+            finally:
+                self._buffer_block_free[name][iblock].set()
+                self._write_queue.task_done()
+
+    def _check_writer_error(self):
+        if self._writer_error is not None:
+            error = self._writer_error
+            self._writer_error = None
+            raise RuntimeError(
+                f"Buffered write to {self.dataset.filepath()} failed"
+            ) from error
+
+    def _buffer_data(self, name: str, itime_step: int, data) -> None:
+        """Copy data for a time step in to the ring buffer for name.
+
+        Full blocks are handed to the writer thread.
+        """
+        self._check_writer_error()
+        if itime_step != self._buffer_last_itime[name] + 1:
+            msg = (
+                f"Buffered output of '{name}' requires sequential time steps:"
+                f" got {itime_step} after {self._buffer_last_itime[name]}"
+            )
+            raise ValueError(msg)
+
+        n_times = self._buffer_n_times
+        irow = itime_step % n_times
+        iblock = (itime_step // n_times) % 2
+        if irow == 0:
+            # do not overwrite a block still being written
+            self._buffer_block_free[name][iblock].wait()
+
+        self._buffers[name][iblock, irow] = data
+        self._buffer_last_itime[name] = itime_step
+
+        if irow == n_times - 1:
+            self._submit_block(name, itime_step)
+
+        return
+
+    def _submit_block(self, name: str, itime_step: int) -> None:
+        n_times = self._buffer_n_times
+        iblock = (itime_step // n_times) % 2
+        t0 = itime_step - (itime_step % n_times)
+        t1 = itime_step + 1
+        self._buffer_block_free[name][iblock].clear()
+        self._write_queue.put((name, iblock, t0, t1))
+        return
+
+    def _drain_buffers(self) -> None:
+        """Submit partial blocks, wait on the writer, and stop it."""
+        if not hasattr(self, "_writer") or not self._writer.is_alive():
             return
+        for name, last_itime in self._buffer_last_itime.items():
+            if last_itime < 0:
+                continue
+            if (last_itime % self._buffer_n_times) != (
+                self._buffer_n_times - 1
+            ):
+                self._submit_block(name, last_itime)
+
+        self._write_queue.put(None)
+        self._writer.join()
+        self._check_writer_error()
+        return
 
     def add_simulation_time(self, itime_step: int, simulation_time: float):
-        self.time[itime_step] = nc4.date2num(simulation_time, self.time.units)
+        time_val = nc4.date2num(simulation_time, self.time.units)
+        if self._buffer_n_times is not None:
+            self._buffer_data("time", itime_step, time_val)
+        else:
+            with nc4_lock:
+                self.time[itime_step] = time_val
         return
 
     def add_data(
@@ -572,8 +970,14 @@ class NetCdfWrite(Accessor):
         """
         if name not in self.variables.keys():
             raise KeyError(f"{name} not a valid variable name")
+        if self._n_members is not None:
+            current = np.reshape(current, (self._n_members, -1))
+        if self._buffer_n_times is not None and name in self._buffers:
+            self._buffer_data(name, itime_step, current)
+            return
         var = self.variables[name]
-        var[itime_step, :] = current[:]
+        with nc4_lock:
+            var[itime_step, :] = current[:]
         return
 
     def add_all_data(
@@ -582,11 +986,15 @@ class NetCdfWrite(Accessor):
         data: np.ndarray,
         time_data: np.ndarray,
         time_coord: str = "time",
+        itime_start: int = 0,
     ) -> None:
         """Add data to a NetCDF variable
 
         Args:
             name:
+            itime_start: the time index of the first time of data. Data may
+              be added in consecutive windows of time this way. The time
+              units are set by the window starting at time index 0.
 
         Returns:
 
@@ -594,20 +1002,25 @@ class NetCdfWrite(Accessor):
         if name not in self.variables.keys():
             raise KeyError(f"{name} not a valid variable name")
 
-        if time_coord == "time":
-            start_date = (
-                time_data[0].astype(dt.datetime).strftime("%Y-%m-%d %H:%M:%S")
-            )
-            self[time_coord].units = f"days since {start_date}"
-            self[time_coord][:] = nc4.date2num(
-                time_data.astype(dt.datetime),
-                units=self[time_coord].units,
-                calendar="standard",
-            )
-        else:
-            # currently just doy
-            self[time_coord][:] = time_data
+        itime_end = itime_start + data.shape[0]
+        with nc4_lock:
+            if time_coord == "time":
+                if itime_start == 0:
+                    start_date = (
+                        time_data[0]
+                        .astype(dt.datetime)
+                        .strftime("%Y-%m-%d %H:%M:%S")
+                    )
+                    self[time_coord].units = f"days since {start_date}"
+                self[time_coord][itime_start:itime_end] = nc4.date2num(
+                    time_data.astype(dt.datetime),
+                    units=self[time_coord].units,
+                    calendar="standard",
+                )
+            else:
+                # currently just doy
+                self[time_coord][itime_start:itime_end] = time_data
 
-        self.variables[name][:, :] = data[:, :]
+            self.variables[name][itime_start:itime_end, :] = data[:, :]
 
         return
@@ -0,0 +1,315 @@
+"""Numba compilation of the process kernels.
+
+The kernels of the processes are compiled with numba when a process is
+instantiated with calc_method="numba". The compiled kernels are shared by all
+instances in a Python process and written to numba's on-disk cache, so a new
+Python process loads them instead of compiling them again. The cache is
+written next to the source files (``__pycache__``) when that is writable,
+otherwise to numba's user-wide cache directory (see the NUMBA_CACHE_DIR
+environment variable).
+
+Kernels calling other functions must call them as module globals (e.g.
+decorated with ``numba.extending.register_jitable``), numba can not cache a
+kernel taking compiled functions as arguments.
+
+The kernels looping over HRUs (or segments of a channel level) with
+``numba.prange`` are compiled with ``parallel=True`` when a process runs on
+more than one thread. The number of threads is the ``numba_num_threads``
+option of the process (or of Control, optionally a dictionary by process
+name), defaulting to the NUMBA_NUM_THREADS environment variable. The
+iterations write only their own HRU (segment) and the kernels have no
+reductions. The kernels are compiled with the fast math flags of
+fastmath_flags, which do not change the floating point operations of the
+source, so the serial and parallel kernels give identical results whatever
+the number of threads.
+"""
+
+import tempfile
+import types
+from typing import Union
+from warnings import warn
+
+import numpy as np
+
+from ..constants import ft2_per_acre, inches_per_foot, numba_num_threads
+
+# (function, signature, options): dispatcher
+_kernels = {}
+
+# The types of the parameters loaded from files
+param_types = {"I": np.int64, "F": np.float64}
+
+# The fast math flags of the kernels. Contraction to fused multiply-adds,
+# reassociation, reciprocal approximations and approximate functions depend
+# on how the loops of a kernel are compiled (e.g. the fusion of array
+# expressions of parallel kernels) and are left out.
+fastmath_flags = {"nnan", "ninf", "nsz"}
+
+
+def _renamed_function(func: types.FunctionType, qualname: str):
+    renamed = types.FunctionType(
+        func.__code__,
+        func.__globals__,
+        func.__name__,
+        func.__defaults__,
+        func.__closure__,
+    )
+    renamed.__qualname__ = qualname
+    renamed.__module__ = func.__module__
+    renamed.__kwdefaults__ = func.__kwdefaults__
+    return renamed
+
+
+def jit_kernel(
+    func: types.FunctionType,
+    signature=None,
+    cache: bool = True,
+    **options,
+):
+    """Compile a kernel with numba, once per Python process.
+
+    Args:
+        func: the (numpy/python) function of the kernel
+        signature: optional numba signature, compiling the kernel eagerly
+        cache: write the compiled kernel to numba's on-disk cache?
+        **options: numba.njit options, e.g. fastmath and parallel
+
+    Returns:
+        The numba dispatcher of the kernel.
+    """
+    import numba as nb
+
+    # sets of options (fastmath flags) are hashed as frozensets
+    key = (
+        func,
+        str(signature),
+        cache,
+        tuple(
+            sorted(
+                (name, frozenset(value) if isinstance(value, set) else value)
+                for name, value in options.items()
+            )
+        ),
+    )
+    if key in _kernels.keys():
+        return _kernels[key]
+
+    if options.get("parallel", False):
+        # numba's cache is keyed on the function and not the compiler
+        # options: the parallel kernel gets its own cache entries.
+        func = _renamed_function(func, f"{func.__qualname__}_parallel")
+
+    if signature is None:
+        dispatcher = nb.njit(cache=cache, **options)(func)
+    else:
+        dispatcher = nb.njit(signature, cache=cache, **options)(func)
+
+    _kernels[key] = dispatcher
+    return dispatcher
+
+
+def get_num_threads(
+    num_threads: Union[int, dict, None],
+    process_name: str,
+) -> int:
+    """Get the number of numba threads of a process.
+
+    Args:
+        num_threads: the numba_num_threads option, an int, a dictionary of
+          process names to ints or None
+        process_name: the name of the process
+
+    Returns:
+        The number of threads, the kernels of the process are parallel when
+        it is greater than one.
+    """
+    import numba as nb
+
+    if isinstance(num_threads, dict):
+        num_threads = num_threads.get(process_name, None)
+    if num_threads is None:
+        num_threads = numba_num_threads
+
+    if num_threads > nb.config.NUMBA_NUM_THREADS:
+        msg = (
+            f"numba_num_threads={num_threads} for {process_name} is more than "
+            f"the {nb.config.NUMBA_NUM_THREADS} threads of numba (set by the "
+            "NUMBA_NUM_THREADS environment variable), the parallel kernels "
+            f"run on {nb.config.NUMBA_NUM_THREADS} threads"
+        )
+        warn(msg, RuntimeWarning)
+
+    return num_threads
+
+
+def threaded_kernel(kernel, num_threads: int):
+    """Run a parallel kernel on a number of numba threads.
+
+    The number of threads numba uses is set before each call as processes
+    with different numba_num_threads run one after another.
+
+    Args:
+        kernel: the numba dispatcher of the kernel
+        num_threads: the number of threads, at most the NUMBA_NUM_THREADS of
+          numba. The kernel is returned as is when it is not greater than one
+
+    Returns:
+        The kernel or a function setting the number of threads and calling
+        the kernel.
+    """
+    if num_threads <= 1:
+        return kernel
+
+    import numba as nb
+
+    num_threads = min(num_threads, nb.config.NUMBA_NUM_THREADS)
+
+    def kernel_on_threads(*args, **kwargs):
+        nb.set_num_threads(num_threads)
+        return kernel(*args, **kwargs)
+
+    return kernel_on_threads
+
+
+def _precompile_parameters(process_class) -> "Parameters":  # noqa: F821
+    # A one HRU and one segment domain of the metadata default values: the
+    # parameters have the types (and so the kernels the specializations) of
+    # parameters loaded from files.
+    from ..base import meta
+    from ..base.parameters import Parameters
+
+    dims = {
+        "nhru": 1,
+        "nsegment": 1,
+        "nmonth": 12,
+        "ndoy": 366,
+        "ndeplval": 11,
+    }
+    param_meta = meta.get_params(process_class.get_parameters())
+    coords = {"doy": np.arange(dims["ndoy"], dtype=np.int64) + 1}
+    data_vars = {}
+    metadata = {"doy": {"dims": ("ndoy",)}}
+    for name, pmeta in param_meta.items():
+        if name in coords.keys() or name == "hru_in_to_cf":
+            continue
+        shape = tuple(dims[dd] for dd in pmeta["dims"])
+        dtype = param_types[pmeta["type"]]
+        value = pmeta["default"]
+        # some defaults are flags outside of the valid range
+        for bound, compare in [("minimum", max), ("maximum", min)]:
+            if isinstance(pmeta.get(bound), (int, float)):
+                value = compare(value, pmeta[bound])
+        data_vars[name] = np.full(shape, value, dtype=dtype)
+        metadata[name] = {"dims": pmeta["dims"]}
+
+    # derived parameter, see PrmsParameters
+    if "hru_in_to_cf" in param_meta.keys():
+        data_vars["hru_in_to_cf"] = (
+            data_vars["hru_area"] * ft2_per_acre / inches_per_foot
+        )
+        metadata["hru_in_to_cf"] = {"dims": ("nhru",)}
+
+    return Parameters(
+        dims=dims,
+        coords=coords,
+        data_vars=data_vars,
+        metadata=metadata,
+        validate=False,
+    )
+
+
+def precompile(
+    process_classes: list = None,
+    options: dict = None,
+) -> None:
+    """Compile the numba kernels of processes and cache them on disk.
+
+    Each process is run for a time step on a synthetic one HRU (and one
+    segment) domain with calc_method="numba". The first model run in a new
+    Python process then loads the compiled kernels from numba's cache
+    instead of compiling them, e.g. after installing pywatershed::
+
+        python -c "import pywatershed; pywatershed.precompile()"
+
+    Args:
+        process_classes: the process classes to compile, default is all the
+          processes with numba kernels
+        options: optional Control options changing the kernels compiled,
+          e.g. {"channel_routing": "level"}
+
+    Returns:
+        None
+    """
+    from ..base import meta
+    from ..base.control import Control
+    from ..hydrology import (
+        PRMSCanopy,
+        PRMSChannel,
+        PRMSGroundwater,
+        PRMSGroundwaterNoDprst,
+        PRMSRunoff,
+        PRMSRunoffNoDprst,
+        PRMSSnow,
+        PRMSSoilzone,
+        PRMSSoilzoneNoDprst,
+    )
+    from .memmap_utils import write_memmap
+
+    if process_classes is None:
+        process_classes = [
+            PRMSCanopy,
+            PRMSSnow,
+            PRMSRunoff,
+            PRMSRunoffNoDprst,
+            PRMSSoilzone,
+            PRMSSoilzoneNoDprst,
+            PRMSGroundwater,
+            PRMSGroundwaterNoDprst,
+            PRMSChannel,
+        ]
+
+    start_time = np.datetime64("2000-01-01T00:00:00")
+    time_step = np.timedelta64(24, "h")
+    # with budgets on, the budget kernel is compiled too
+    options = {
+        "budget_type": "warn",
+        **(options or {}),
+        "calc_method": "numba",
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for process_class in process_classes:
+            parameters = _precompile_parameters(process_class)
+            inputs = {}
+            for name, vmeta in meta.get_vars(
+                process_class.get_inputs()
+            ).items():
+                shape = tuple(parameters.dims[dd] for dd in vmeta["dims"])
+                data = np.zeros(shape, dtype=vmeta["type"])
+                if len(shape) == 1:
+                    inputs[name] = data
+                else:
+                    # doy inputs (e.g. soltab_horad_potsw)
+                    inputs[name] = write_memmap(
+                        tmp_dir,
+                        name,
+                        data,
+                        ("doy", *vmeta["dims"][1:]),
+                        doy=np.arange(data.shape[0]) + 1,
+                    )
+
+            control = Control(
+                start_time, start_time + time_step, time_step, options=options
+            )
+            process = process_class(
+                control=control,
+                discretization=None,
+                parameters=parameters,
+                **inputs,
+            )
+            control.advance()
+            process.advance()
+            process.calculate(1.0)
+            del process
+
+    return
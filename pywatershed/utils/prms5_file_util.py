@@ -160,42 +160,50 @@ class PrmsFile:
         return variable_dict
 
     def _get_dimensions_parameters(self):
-        dimensions_dict = {}
-        parameters_dict = {}
-        parameter_dimensions_dict = {}
-        parameters_full_dict = {}
-        parameter_dimensions_full_dict = {}
-        while True:
-            current_position = self.file_object.tell()
-            line = self._get_line()
-            if line == "** Dimensions **":
-                dimensions_start = current_position
-            elif line == "** Parameters **":
-                parameters_start = current_position
-                break
+        # The file is read at once and the values of each parameter are
+        # converted by numpy in a single call, instead of line by line.
+        lines = self.file_object.read().splitlines()
+        self.file_object.close()
+
+        dimensions_start = self._find_line(lines, "** Dimensions **")
+        parameters_start = self._find_line(lines, "** Parameters **")
+        blocks = [
+            iline
+            for iline, line in enumerate(lines)
+            if line[:4] == "####" and line.rstrip() == "####"
+        ]
 
         # read dimensions data
-        self.file_object.seek(dimensions_start)
-        while self.file_object.tell() < parameters_start:
-            dim_temp = self._get_next_variable()
-            if dim_temp is None:
-                break
-            else:
-                for key, value in dim_temp.items():
-                    dimensions_dict[rename_dims(key)] = value
+        dimensions_dict = {}
+        for iline in blocks:
+            if iline < dimensions_start or iline > parameters_start:
+                continue
+            name = lines[iline + 1].split()[0]
+            try:
+                value = int(lines[iline + 2].split()[0])
+            except (IndexError, ValueError):
+                raise ValueError(
+                    f"Error on line {iline + 3} in PRMS "
+                    + f"input file '{self.file_path}'."
+                )
+            dimensions_dict[rename_dims(name)] = value
 
         # read parameter data
-        self.file_object.seek(parameters_start)
         self.section = PrmsFileSection.PARAMETER
         self.dimensions = dimensions_dict
-        while True:
-            par_temp = self._get_next_variable()
-            if par_temp is None:
-                break
-            else:
-                for key, value in par_temp.items():
-                    parameters_dict[key] = value[0]
-                    parameter_dimensions_dict[key] = value[1]
+        parameters_dict = {}
+        parameter_dimensions_dict = {}
+        for iline in blocks:
+            if iline < parameters_start:
+                continue
+            name = lines[iline + 1].split()[0]
+            (
+                parameters_dict[name],
+                parameter_dimensions_dict[name],
+            ) = self._parse_parameter_lines(lines, iline + 2)
+
+        parameters_full_dict = {}
+        parameter_dimensions_full_dict = {}
 
         # fill dictionaries that will be returned
         for key, value in dimensions_dict.items():
@@ -226,6 +234,78 @@ class PrmsFile:
         parameters_dict = {}
         return parameters_dict
 
+    def _find_line(self, lines: list, line: str) -> int:
+        for iline, file_line in enumerate(lines):
+            if file_line.rstrip() == line:
+                return iline
+        raise ValueError(
+            f"'{line}' not found in PRMS input file '{self.file_path}'."
+        )
+
+    def _parse_parameter_lines(self, lines: list, iline: int) -> tuple:
+        """Parse the lines of a parameter after its name
+
+        Args:
+            lines: the lines of the file
+            iline: the index of the line of the number of dimensions
+
+        Returns:
+            arr: numpy array that contains the data for a parameter
+            dim_names: the dimension names of the parameter
+
+        """
+        try:
+            num_dims = int(lines[iline].split()[0])
+            dim_names = [
+                rename_dims(lines[iline + 1 + idx].split()[0])
+                for idx in range(num_dims)
+            ]
+            shape = tuple(self.dimensions[dd] for dd in dim_names[::-1])
+            dim_names = tuple(dim_names[::-1])
+            iline += 1 + num_dims
+            len_array = int(lines[iline].split()[0])
+            data_type = int(lines[iline + 1].split()[0])
+        except (IndexError, ValueError):
+            raise ValueError(
+                f"Error on line {iline + 1} in PRMS "
+                + f"input file '{self.file_path}'."
+            )
+
+        values = lines[iline + 2 : iline + 2 + len_array]
+        if len(values) != len_array:
+            raise ValueError(
+                f"Missing values after line {iline + 2} in PRMS "
+                + f"input file '{self.file_path}'."
+            )
+        if data_type == PrmsDataType.INTEGER.value:
+            arr = self._convert_values(values, int)
+        elif data_type == PrmsDataType.FLOAT.value:
+            arr = self._convert_values(values, float)
+        elif data_type == PrmsDataType.CHARACTER.value:
+            arr = np.zeros(len_array, dtype=np.chararray)
+            arr[:] = [value.split()[0] for value in values]
+        else:
+            raise ValueError(
+                f"data type ({data_type}) can only be "
+                + f"int ({PrmsDataType.INTEGER.value}), "
+                + f"float ({PrmsDataType.FLOAT.value}), "
+                + f"or character ({PrmsDataType.CHARACTER.value}). "
+                + f"Error on line {iline + 2} in PRMS "
+                + f"input file '{self.file_path}'."
+            )
+
+        if len(shape) == 2:
+            arr = arr.reshape(shape)
+        return arr, dim_names
+
+    @staticmethod
+    def _convert_values(values: list, dtype: type) -> np.ndarray:
+        try:
+            return np.array(values, dtype=dtype)
+        except ValueError:
+            # lines with more than the value
+            return np.array([value.split()[0] for value in values], dtype)
+
     def _get_line(self) -> str:
         line = self.file_object.readline()
         if line == "":